@@ -10,6 +10,29 @@ HAVE FUN WITH YOUR DATA ANALYSIS!
 """
 
 # LOGBOOK
+# 20261017 -- update : Range maximum index of RIXS planes for RIXS_normalization(), RIXS_normalization_batch() method
+# 20261017 -- update : Adaptive interpolation grids (interp_npt_1eV = (min, max)), non-uniform axes in the areas, ET remap and integration
+# 20261017 -- update : Tiled out-of-core RIXS_data() and RIXS_integration() under a RAM budget (memory_MB option)
+# 20261017 -- update : Bulk loader and optional energy transfer regridding of RIXS_data_constantET()
+# 20261017 -- update : Cumulative trapezoid area index of XANES stacks, XANESAreaIndex class, XANES_area_index() method
+# 20261017 -- update : Batch XANES peak finding with cached wavelets, find_peaks_batch() function, XANES_find_peaks_batch() method
+# 20261017 -- update : One-pass dose series (strided, sliding window, cumulative), Radiation_damage_series() method
+# 20261017 -- update : Scan metadata catalog for grid planning and scan queries, ScanCatalog class, catalog() method
+# 20261017 -- update : Byte-offset scan index sidecar (.idx) with memory-mapped column reads, SpecIndex class
+# 20261017 -- update : HDF5 archive of processed planes with lazy read-back, RIXSArchive class, fixed savetxt of RIXS_data()
+# 20261017 -- update : Binary formats (npy, npz, h5) and faster text writer for saveFile(), loadFile() function
+# 20261017 -- update : Opt-in per-stage timing of the processing methods, StageTimer class, enable_timing() method
+# 20261017 -- update : Lazy imports of matplotlib/scipy/silx, plot option of RIXS_cut and RIXS_integration
+# 20261017 -- update : Batch RIXS cuts with interpolators cached on the plane, RIXS_cuts() method
+# 20261017 -- update : RIXSPlane class, RIXS planes keep 1d axes instead of full meshgrids, as_RIXS_plane() function
+# 20261017 -- update : Streaming in-place RIXS_merge() with weights and NaN-aware counts
+# 20261017 -- update : Live incremental accumulation while the SPEC file grows, XANES_live() and RIXS_live() methods
+# 20261017 -- update : Persistent on-disk cache of RIXS planes, PlaneCache class
+# 20261017 -- update : Parallel scan loading (executor option), load_columns() method
+# 20261017 -- update : Batched incident energy interpolation of scan stacks, scan_stack() method, interp_stack() function
+# 20261017 -- update : Separable emission energy interpolation replacing interp2d, resample_axis() function
+# 20261017 -- update : Vectorized EE -> ET remapping, RIXS_EE_to_ET() function
+# 20261017 -- update : LRU column cache for SPEC data columns, scan_column() and cache_info() methods
 # 20170622 -- update : Choice of concen.correc in RIXS planes, RIXS_data_constant_ET() method, Normalization plotting 
 # 20170615 -- update : RIXS_normalization() method
 # 20170613 -- update : skip problematic scans
@@ -27,14 +50,1548 @@ HAVE FUN WITH YOUR DATA ANALYSIS!
 
 # 2. XANES plotter, XANES KeV, eV choice and change other XANES method units to eV
 
+# matplotlib, scipy and silx are imported where they are used (see open_spec()),
+# importing DataAnalysis for a headless computation does not load any plotting module
 import numpy as np
-import matplotlib.pyplot as plt
-from silx.io.specfile import SpecFile
-import scipy.interpolate as interp
-import scipy.ndimage as nd
 import os
-from scipy import signal
-from matplotlib import cm
+import re
+import bisect
+from collections import OrderedDict
+import threading
+import functools
+import hashlib
+import json
+import mmap
+import tempfile
+import time
+import weakref
+import zlib
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+
+# np.trapz is called np.trapezoid since numpy 2.0
+trapezoid = getattr(np, 'trapezoid', None) or np.trapz
+
+class ColumnCache(object):
+    '''
+    LRU cache of SPEC data columns, so that every column of a scan is parsed only once
+
+    Parameters
+    ----------
+    maxsize_MB : the memory budget of the cache in MB, default: 256 MB
+                 the least recently used columns are dropped once the budget is exceeded
+                 0 -----> nothing is cached
+    '''
+
+    def __init__(self, maxsize_MB = 256):
+        self.maxsize = int(maxsize_MB * 1024**2)
+        self.currsize = 0
+        self.hits = 0
+        self.misses = 0
+        self._columns = OrderedDict()
+
+    def __len__(self):
+        return len(self._columns)
+
+    def __contains__(self, key):
+        return key in self._columns
+
+    def get(self, key):
+        """
+        Return the cached column for key = (scan index, column label), None if not cached
+        """
+        column = self._columns.get(key)
+        if column is None:
+            self.misses += 1
+            return None
+        # Mark the column as the most recently used one
+        self._columns.move_to_end(key)
+        self.hits += 1
+        return column
+
+    def put(self, key, column):
+        """
+        Store a column, evicting the least recently used columns when the budget is exceeded
+        """
+        if key in self._columns or column.nbytes > self.maxsize:
+            return
+        # Cached columns are shared by all the callers, so they must not be modified in place
+        column.flags.writeable = False
+        self._columns[key] = column
+        self.currsize += column.nbytes
+        while self.currsize > self.maxsize:
+            old_key, old_column = self._columns.popitem(last = False)
+            self.currsize -= old_column.nbytes
+
+    def clear(self):
+        """
+        Drop all the cached columns, the hit/miss counters are kept
+        """
+        self._columns.clear()
+        self.currsize = 0
+
+    def info(self):
+        """
+        Return a dict with the cache statistics
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'columns': len(self._columns),
+                'currsize': self.currsize, 'maxsize': self.maxsize}
+
+
+class PlaneCache(object):
+    '''
+    Persistent on-disk cache of processed RIXS planes, one uncompressed .npz file per plane
+    A plane is found again from the SPEC file path, its size and modification time,
+    the method name and all the processing parameters
+
+    Parameters
+    ----------
+    folder : the cache folder, default: ~/.cache/DataAnalysis
+    maxsize_MB : the size limit of the cache folder in MB, default: 2048 MB
+                 the least recently used planes are deleted once the limit is exceeded
+    '''
+
+    def __init__(self, folder = None, maxsize_MB = 2048):
+        if folder is None:
+            folder = os.path.join(os.path.expanduser('~'), '.cache', 'DataAnalysis')
+        self.folder = folder
+        self.maxsize = int(maxsize_MB * 1024**2)
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+    def file_name(self, path, file_stat, method, params):
+        # <SPEC file>_<SPEC file version>_<processing>.npz
+        path_key = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:16]
+        stat_key = hashlib.sha1(repr(tuple(file_stat)).encode()).hexdigest()[:8]
+        params_key = hashlib.sha1(json.dumps([method, params], sort_keys = True, default = str).encode()).hexdigest()[:16]
+        return os.path.join(self.folder, '%s_%s_%s.npz' % (path_key, stat_key, params_key))
+
+    def invalidate(self, path, file_stat):
+        """
+        Delete the planes of a SPEC file computed from an older version of the file (e.g, before it grew)
+        """
+        path_key, stat_key = os.path.basename(self.file_name(path, file_stat, None, None)).split('_')[:2]
+        for name in os.listdir(self.folder):
+            if name.startswith(path_key + '_') and not name.startswith(path_key + '_' + stat_key + '_'):
+                self.remove(os.path.join(self.folder, name))
+
+    def get(self, path, file_stat, method, params):
+        """
+        Return the cached RIXSPlane, None if it is not cached
+        """
+        self.invalidate(path, file_stat)
+        file_name = self.file_name(path, file_stat, method, params)
+        try:
+            with np.load(file_name) as cached:
+                meta = json.loads(str(cached['meta']))
+                dataArray = RIXSPlane(cached['incident'], cached['emission'], cached['intensity'], 
+                                      choice = meta['choice'], unit = meta['unit'], 
+                                      adaptive = meta.get('adaptive', (False, False)))
+        except (IOError, OSError, KeyError, ValueError):
+            return None
+        # The modification time of the cache file records its last use
+        os.utime(file_name, None)
+        return dataArray
+
+    def put(self, path, file_stat, method, params, dataArray):
+        """
+        Save a RIXSPlane (or a data ndarray [XX, YY, intensity]) into the cache
+        """
+        plane = as_RIXS_plane(dataArray)
+        file_name = self.file_name(path, file_stat, method, params)
+        meta = {'path': os.path.abspath(path), 'file_stat': list(file_stat), 
+                'method': method, 'params': params, 'created': time.time(), 
+                'choice': plane.choice, 'unit': plane.unit, 'adaptive': list(plane.adaptive)}
+        # Write into a temporary file first so that an interrupted write never leaves a broken plane
+        tmp_name = file_name[:-len('.npz')] + '.tmp.npz'
+        np.savez(tmp_name, incident = plane.incident, emission = plane.emission, intensity = plane.intensity, 
+                 meta = json.dumps(meta, default = str))
+        os.replace(tmp_name, file_name)
+        self.evict()
+
+    def entries(self):
+        """
+        List the cached planes, least recently used first
+
+        Returns
+        -------
+        out : list of dict(file, size, last_used, path, file_stat, method, params, created)
+        """
+        entries = []
+        for name in os.listdir(self.folder):
+            if not name.endswith('.npz') or name.endswith('.tmp.npz'):
+                continue
+            file_name = os.path.join(self.folder, name)
+            try:
+                stat = os.stat(file_name)
+                with np.load(file_name) as cached:
+                    entry = json.loads(str(cached['meta']))
+            except (IOError, OSError, KeyError, ValueError):
+                continue
+            entry.update({'file': file_name, 'size': stat.st_size, 'last_used': stat.st_mtime})
+            entries.append(entry)
+        entries.sort(key = lambda entry: entry['last_used'])
+        return entries
+
+    def info(self):
+        """
+        Return dict(planes, currsize, maxsize), the sizes are in bytes
+        """
+        sizes = [os.path.getsize(os.path.join(self.folder, name)) 
+                 for name in os.listdir(self.folder) if name.endswith('.npz')]
+        return {'planes': len(sizes), 'currsize': sum(sizes), 'maxsize': self.maxsize}
+
+    def evict(self):
+        """
+        Delete the least recently used planes until the cache is below its size limit
+        """
+        files = []
+        for name in os.listdir(self.folder):
+            if name.endswith('.npz') and not name.endswith('.tmp.npz'):
+                file_name = os.path.join(self.folder, name)
+                stat = os.stat(file_name)
+                files.append((stat.st_mtime, stat.st_size, file_name))
+        files.sort()
+        currsize = sum(size for last_used, size, file_name in files)
+        for last_used, size, file_name in files:
+            if currsize <= self.maxsize:
+                break
+            self.remove(file_name)
+            currsize -= size
+
+    def remove(self, file_name):
+        try:
+            os.remove(file_name)
+        except OSError:
+            pass
+
+    def clear(self, path = None):
+        """
+        Delete all the cached planes, or only the ones of the SPEC file path
+        """
+        for entry in self.entries():
+            if path is None or entry['path'] == os.path.abspath(path):
+                self.remove(entry['file'])
+
+
+class RIXSArchive(object):
+    '''
+    HDF5 archive of the processed RIXS planes of a session, one group per plane with the axes,
+    the chunked and compressed intensity and the processing parameters
+    The planes are read back lazily (see ArchivedPlane): a cut or a ROI only reads the chunks it needs
+
+    Parameters
+    ----------
+    path : the HDF5 file, e.g, 'session.h5'
+    mode : 'a'(default) read and write, created if needed, 'r' read only, 'w' overwrite
+    chunk : the chunk shape of the intensity, default (64, 64)
+    compression : 'gzip'(default) or None (no compression, fastest reading)
+
+    Usage
+    -----
+    with RIXSArchive('session.h5') as archive:
+        archive.put('cmpd7_ET', plane, params = {'firstScan': 70, 'lastScan': 145})
+        archive['cmpd7_ET'].cut('CIE', [6539, 6540])
+    '''
+
+    def __init__(self, path, mode = 'a', chunk = (64, 64), compression = 'gzip'):
+        import h5py
+        self.path = path
+        self.file = h5py.File(path, mode)
+        self.chunk = tuple(chunk)
+        self.compression = compression
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def close(self):
+        if self.file:
+            self.file.close()
+
+    def names(self):
+        """
+        Return the names of the archived planes
+        """
+        return list(self.file.keys())
+
+    def __contains__(self, name):
+        return name in self.file
+
+    def __len__(self):
+        return len(self.file)
+
+    def __getitem__(self, name):
+        return ArchivedPlane(self.file[name])
+
+    def put(self, name, dataArray, params = None, overwrite = True):
+        """
+        Archive a RIXSPlane (or a data ndarray [XX, YY, intensity])
+
+        Parameters
+        ----------
+        name : the name of the plane in the archive
+        params : dict of the processing parameters, saved with the plane
+        overwrite : default True, False -----> ValueError if the name is already used
+        """
+        plane = as_RIXS_plane(dataArray)
+        intensity = self.create(name, plane.incident, plane.emission, plane.choice, plane.unit, params, 
+                                plane.intensity.dtype, overwrite, plane.adaptive)
+        if plane.intensity.size:
+            intensity[...] = plane.intensity
+        self.file.flush()
+
+    def create(self, name, incident, emission, choice = 'EE', unit = 'eV', params = None, dtype = float, 
+               overwrite = True, adaptive = (False, False)):
+        """
+        Create a plane whose intensity is written afterwards, e.g, tile by tile (see RIXS_data(memory_MB = ...))
+
+        Parameters
+        ----------
+        name : the name of the plane in the archive
+        incident, emission : the 1d axes of the plane
+        params : dict of the processing parameters, saved with the plane
+        dtype : the type of the intensity, default float
+        overwrite : default True, False -----> ValueError if the name is already used
+        adaptive : (incident, emission) True for an axis made by adaptive_grid() (see RIXSPlane)
+
+        Returns
+        -------
+        out : the intensity h5py dataset, shape (len(emission), len(incident)), chunked and compressed
+        """
+        if name in self.file:
+            if not overwrite:
+                raise ValueError('%s is already in %s' % (name, self.path))
+            del self.file[name]
+        group = self.file.create_group(name)
+        group.create_dataset('incident', data = np.asarray(incident, dtype = float))
+        group.create_dataset('emission', data = np.asarray(emission, dtype = float))
+        shape = (len(emission), len(incident))
+        chunk = tuple(min(c, n) for c, n in zip(self.chunk, shape)) if shape[0]*shape[1] else None
+        intensity = group.create_dataset('intensity', shape = shape, dtype = dtype, chunks = chunk,
+                                         compression = self.compression, shuffle = self.compression is not None)
+        group.attrs['choice'] = choice
+        group.attrs['unit'] = unit
+        group.attrs['adaptive'] = np.array(adaptive, dtype = bool)
+        group.attrs['params'] = json.dumps(params if params is not None else {}, default = str)
+        group.attrs['created'] = time.time()
+        return intensity
+
+    def get(self, name):
+        """
+        Return the whole plane as a RIXSPlane (read into memory)
+        """
+        return self[name].load()
+
+    def params(self, name):
+        """
+        Return the processing parameters of a plane
+        """
+        return json.loads(self.file[name].attrs['params'])
+
+    def remove(self, name):
+        """
+        Remove a plane from the archive (HDF5 does not give the space back until the file is repacked)
+        """
+        del self.file[name]
+
+
+class ArchivedPlane(object):
+    '''
+    RIXS plane of a RIXSArchive, the axes are in memory and the intensity stays in the HDF5 file
+    plane.roi(), plane.cut() and plane.intensity[i0:i1, j0:j1] only read the chunks they need
+    '''
+
+    def __init__(self, group):
+        self.group = group
+        self.incident = group['incident'][()]
+        self.emission = group['emission'][()]
+        self.intensity = group['intensity']
+        self.choice = str(group.attrs['choice'])
+        self.unit = str(group.attrs['unit'])
+        self.adaptive = tuple(bool(axis_adaptive) for axis_adaptive in group.attrs.get('adaptive', (False, False)))
+
+    @property
+    def shape(self):
+        return (3,) + self.intensity.shape
+
+    @property
+    def params(self):
+        return json.loads(self.group.attrs['params'])
+
+    def load(self):
+        """
+        Return the whole plane as a RIXSPlane
+        """
+        return RIXSPlane(self.incident, self.emission, self.intensity[()], choice = self.choice, unit = self.unit, 
+                         adaptive = self.adaptive)
+
+    def axis_index(self, axis_values, energy_range):
+        # Slice of the points of a sorted axis inside energy_range (in eV)
+        scale = 1000. if self.unit == 'KeV' else 1.
+        low, high = sorted(energy_range)
+        if axis_values[0] <= axis_values[-1]:
+            return slice(np.searchsorted(axis_values, low/scale, 'left'), np.searchsorted(axis_values, high/scale, 'right'))
+        # Decreasing axis
+        reverse = axis_values[::-1]
+        return slice(axis_values.size - np.searchsorted(reverse, high/scale, 'right'),
+                     axis_values.size - np.searchsorted(reverse, low/scale, 'left'))
+
+    def roi(self, incident_range = None, emission_range = None):
+        """
+        Read a region of the plane
+
+        Parameters
+        ----------
+        incident_range : (e1, e2) incident energy range in eV, default None -----> whole axis
+        emission_range : (e1, e2) emission energy/energy transfer range in eV, default None -----> whole axis
+
+        Returns
+        -------
+        out : RIXSPlane of the region
+        """
+        columns = self.axis_index(self.incident, incident_range) if incident_range is not None else slice(None)
+        rows = self.axis_index(self.emission, emission_range) if emission_range is not None else slice(None)
+        return RIXSPlane(self.incident[columns], self.emission[rows], self.intensity[rows, columns],
+                         choice = self.choice, unit = self.unit, adaptive = self.adaptive)
+
+    def cut(self, choice, cut_energies):
+        """
+        CIE, CET, CEE cuts with linear interpolation, only the two rows/columns around each cut are read
+
+        Parameters
+        ----------
+        choice: 'CIE', 'CET' or 'CEE' (as in RIXS_cut)
+        cut_energies: the energy or the list of energies (eV) to cut
+
+        Returns
+        -------
+        out : data ndarray [incident energy/energy transfer, cut1 intensity, cut2 intensity, ...] (energies in eV)
+        """
+        scale = 1000. if self.unit == 'KeV' else 1.
+        cut_energies = np.atleast_1d(np.asarray(cut_energies, dtype = float))/scale
+        if choice == 'CIE':
+            axis, axis_values, other_axis = 1, self.incident, self.emission
+        elif choice in ('CET', 'CEE'):
+            axis, axis_values, other_axis = 0, self.emission, self.incident
+        else:
+            raise ValueError("the cut should be 'CIE', 'CET' or 'CEE'")
+        order = np.argsort(axis_values, kind = 'stable')
+        sorted_values = axis_values[order]
+        # The two neighbouring points of each cut (clamped to the axis edges)
+        upper = np.clip(np.searchsorted(sorted_values, cut_energies), 1, max(sorted_values.size - 1, 1))
+        needed = np.unique(order[np.concatenate([upper - 1, upper])].clip(0, axis_values.size - 1))
+        if axis == 0:
+            lines = self.intensity[needed, :]
+        else:
+            lines = self.intensity[:, needed]
+        # NaN would spread into the interpolated cut, as in RIXS_cuts()
+        lines = np.nan_to_num(lines)
+        cut_intensity = np.moveaxis(resample_axis(axis_values[needed], lines, cut_energies, axis = axis), axis, 0)
+        return np.vstack([other_axis*scale, cut_intensity])
+
+
+class RIXSPlane(object):
+    '''
+    RIXS plane: 1d incident energy axis, 1d emission energy (or energy transfer) axis and one intensity array
+    The meshgrids are only made when they are asked for, 
+    and a RIXSPlane can still be used as the former [XX, YY, intensity] data ndarray:
+        XX, YY, intensity = plane
+        plane[0][0,:], plane[1][:,0], plane[2]
+        np.array(plane) -----> the full (3, emission points, incident points) ndarray
+
+    Parameters
+    ----------
+    incident : 1d ndarray, the incident energy axis
+    emission : 1d ndarray, the emission energy axis ('EE') or the energy transfer axis ('ET')
+    intensity : 2d ndarray of shape (len(emission), len(incident))
+    choice : 'EE' or 'ET', the kind of the y axis
+    unit : 'eV' or 'KeV', the unit of the axes
+    dtype : the storage type of the intensity, default None -----> kept as it is, 
+            e.g, np.float32 to halve the memory of the plane
+    writable : default True -----> plane[2] and the unpacked intensity can be modified in place, as the 
+               former data ndarray (plane[2][mask] = 0)
+               False -----> they are read only views
+    adaptive : (incident, emission), default (False, False), True for an axis made by adaptive_grid()
+               -----> integrated against its energies by RIXS_integration(), the other axes are summed 
+               point by point (see point_axis())
+
+    The data derived from the intensity (interpolators, column maxima) are cached on the plane.
+    plane.intensity is a read only view, once plane[2] or the unpacked intensity of a writable plane 
+    has been handed out, the cache is checked against a checksum of the intensity, so it is built again 
+    after an in place modification. Otherwise the intensity is changed with plane[2] = new_intensity, 
+    plane.with_intensity(new_intensity), or plane.invalidate() after modifying the array the plane was made from
+    '''
+    __slots__ = ('incident', 'emission', 'intensity', 'choice', 'unit', 'writable', 'exposed', 'adaptive', 'cache')
+
+    def __init__(self, incident, emission, intensity, choice = 'EE', unit = 'eV', dtype = None, writable = True, 
+                 adaptive = (False, False)):
+        self.incident = np.asarray(incident, dtype = float)
+        self.emission = np.asarray(emission, dtype = float)
+        self.writable = writable
+        # True once a writable intensity has been handed out (see writable_intensity())
+        self.exposed = False
+        self.adaptive = tuple(bool(axis_adaptive) for axis_adaptive in adaptive)
+        self.intensity = read_only(np.asarray(intensity, dtype = dtype))
+        if self.intensity.shape != (len(self.emission), len(self.incident)):
+            raise ValueError('intensity should have the shape (len(emission), len(incident))')
+        self.choice = choice
+        self.unit = unit
+        # Data derived from the plane (e.g, interpolators), dropped when the plane is modified with plane[k] = ...,
+        # when the handed out intensity changed (see checked_cache()) or with plane.invalidate()
+        self.cache = {}
+
+    @property
+    def XX(self):
+        # Read only view, no memory is used for the grid
+        return np.broadcast_to(self.incident, self.intensity.shape)
+
+    @property
+    def YY(self):
+        return np.broadcast_to(self.emission[:, np.newaxis], self.intensity.shape)
+
+    @property
+    def shape(self):
+        return (3,) + self.intensity.shape
+
+    @property
+    def dtype(self):
+        return self.intensity.dtype
+
+    def meshgrid(self):
+        """
+        Return the full (writable) grids XX, YY
+        """
+        return np.meshgrid(self.incident, self.emission)
+
+    def __len__(self):
+        return 3
+
+    def __iter__(self):
+        yield self.XX
+        yield self.YY
+        yield self.writable_intensity()
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return (self.XX, self.YY, self.writable_intensity())[index]
+        return np.asarray(self)[index]
+
+    def writable_intensity(self):
+        """
+        Return the intensity for plane[2] and the unpacking, a writable view of the plane intensity
+        (as the former data ndarray) unless the plane or the array it was made from is read only.
+        From then on the cache is checked against a checksum of the intensity (see checked_cache())
+        """
+        if not self.writable:
+            return self.intensity
+        view = self.intensity.view()
+        try:
+            view.flags.writeable = True
+        except ValueError:
+            # e.g, a read only memory map or a column of the column cache
+            return self.intensity
+        self.exposed = True
+        return view
+
+    def __setitem__(self, index, value):
+        # plane[0] = XX, plane[1] = YY, plane[2] = intensity, as with the former data ndarray
+        value = np.asarray(value)
+        self.cache = {}
+        # A new axis is not an adaptive_grid() axis any more
+        if index == 0:
+            self.incident = np.array(np.broadcast_to(value, self.intensity.shape)[0, :], dtype = float)
+            self.adaptive = (False, self.adaptive[1])
+        elif index == 1:
+            self.emission = np.array(np.broadcast_to(value, self.intensity.shape)[:, 0], dtype = float)
+            self.adaptive = (self.adaptive[0], False)
+        elif index == 2:
+            self.intensity = read_only(np.array(np.broadcast_to(value, self.intensity.shape), dtype = self.intensity.dtype))
+            self.exposed = False
+        else:
+            raise IndexError('RIXSPlane index should be 0, 1 or 2')
+
+    def __array__(self, dtype = None, copy = None):
+        XX, YY = self.meshgrid()
+        return np.array([XX, YY, self.intensity], dtype = dtype)
+
+    def __repr__(self):
+        return 'RIXSPlane(%s, %s, %d x %d, %s)' % (self.choice, self.unit, len(self.emission), 
+                                                     len(self.incident), self.intensity.dtype)
+
+    def copy(self):
+        return RIXSPlane(self.incident.copy(), self.emission.copy(), self.intensity.copy(), self.choice, self.unit, 
+                         writable = self.writable, adaptive = self.adaptive)
+
+    def astype(self, dtype):
+        return RIXSPlane(self.incident, self.emission, self.intensity.astype(dtype), self.choice, self.unit, 
+                         writable = self.writable, adaptive = self.adaptive)
+
+    def with_intensity(self, intensity):
+        """
+        Return a plane with the same axes and a new intensity (e.g, plane.with_intensity(np.clip(plane[2], 0, None)))
+        """
+        return RIXSPlane(self.incident, self.emission, intensity, self.choice, self.unit, writable = self.writable, 
+                         adaptive = self.adaptive)
+
+    def invalidate(self):
+        """
+        Drop the data derived from the intensity (interpolators, column maxima), 
+        e.g, after modifying in place the array a read only plane was made from
+        """
+        self.cache = {}
+
+    def checked_cache(self):
+        """
+        Return the cache of the derived data, emptied first if the handed out intensity 
+        changed since the cache was filled (CRC32 checksum of the intensity)
+        """
+        if self.exposed:
+            checksum = zlib.crc32(np.ascontiguousarray(self.intensity))
+            if self.cache.get('checksum') != checksum:
+                self.cache = {'checksum': checksum}
+        return self.cache
+
+    def filled_intensity(self):
+        """
+        Return the intensity with NaN replaced by 0 (computed once and cached on the plane)
+        """
+        cache = self.checked_cache()
+        if 'filled_intensity' not in cache:
+            cache['filled_intensity'] = read_only(np.nan_to_num(self.intensity))
+        return cache['filled_intensity']
+
+    def interpolator(self, axis, kind = 'linear'):
+        """
+        Return the interpolator along one axis of the plane (built once and cached on the plane)
+
+        Parameters
+        ----------
+        axis : 0 -----> along the emission energy/energy transfer axis (CET, CEE cuts)
+               1 -----> along the incident energy axis (CIE cuts)
+        kind : 'linear'(default) or 'cubic'
+        """
+        key = ('interpolator', axis, kind)
+        cache = self.checked_cache()
+        if key not in cache:
+            axis_values = self.emission if axis == 0 else self.incident
+            cache[key] = PlaneInterpolator(axis_values, self.filled_intensity(), axis, kind)
+        return cache[key]
+
+    def range_max(self, incident_range = None):
+        """
+        Maximum of the intensity (NaN ignored) for incident energy windows, same as np.nanmax of the cropped plane
+        The maximum of each column and their RangeMaxIndex are built once and cached on the plane,
+        then each window is answered in O(1) (e.g, a slider over the pre-edge range of RIXS_normalization())
+        The index is built again when the intensity is replaced (plane[2] = ..., plane.intensity = ...), 
+        modified in place (writable plane) or after plane.invalidate()
+
+        Parameters
+        ----------
+        incident_range : (e1, e2) in the unit of the plane, or a list of (e1, e2)
+                         default None -----> the whole plane
+
+        Returns
+        -------
+        out : float for one (e1, e2), 1d ndarray for a list of (e1, e2)
+        """
+        cache = self.checked_cache()
+        if 'range_max' not in cache or cache['range_max'][0] is not self.intensity:
+            # Columns sorted by incident energy, so a window is a range of columns
+            order = np.argsort(self.incident, kind = 'stable')
+            column_max = np.fmax.reduce(self.intensity, axis = 0) if self.intensity.size else np.full(self.incident.size, np.nan)
+            cache['range_max'] = (self.intensity, self.incident[order], RangeMaxIndex(column_max[order]))
+        sorted_incident, index = cache['range_max'][1:]
+        if incident_range is None:
+            incident_range = (-np.inf, np.inf)
+        incident_range = np.asarray(incident_range, dtype = float)
+        single = incident_range.ndim == 1
+        incident_range = np.atleast_2d(incident_range)
+        first = np.searchsorted(sorted_incident, incident_range[:, 0], 'left')
+        last = np.searchsorted(sorted_incident, incident_range[:, 1], 'right')
+        maxima = index(first, last)
+        return float(maxima[0]) if single else maxima
+
+    def to_unit(self, unit):
+        """
+        Return the plane with the axes in unit ('eV' or 'KeV'), the intensity array is shared
+        """
+        if unit == self.unit:
+            return self
+        scale = 1000. if unit == 'eV' else 0.001
+        return RIXSPlane(self.incident*scale, self.emission*scale, self.intensity, self.choice, unit, 
+                         writable = self.writable, adaptive = self.adaptive)
+
+
+class PlaneInterpolator(object):
+    '''
+    Interpolator along one axis of a RIXS plane, see RIXSPlane.interpolator()
+    interpolator(energies) -----> ndarray (len(energies), points of the other axis)
+
+    Parameters
+    ----------
+    axis_values : 1d ndarray, the energies along axis
+    intensity : 2d ndarray without NaN
+    axis : the axis of intensity to interpolate along
+    kind : 'linear' or 'cubic'
+    '''
+
+    def __init__(self, axis_values, intensity, axis, kind = 'linear'):
+        self.axis_values = np.asarray(axis_values, dtype = float)
+        self.intensity = np.moveaxis(intensity, axis, 0)
+        self.kind = kind
+        if kind == 'cubic':
+            from scipy.interpolate import CubicSpline
+            order = np.argsort(self.axis_values)
+            self.spline = CubicSpline(self.axis_values[order], self.intensity[order], axis = 0)
+        elif kind != 'linear':
+            raise ValueError("kind should be 'linear' or 'cubic'")
+
+    def __call__(self, energies):
+        energies = np.atleast_1d(np.asarray(energies, dtype = float))
+        if self.kind == 'cubic':
+            # Energies outside of the axis take the edge value
+            return self.spline(np.clip(energies, self.axis_values.min(), self.axis_values.max()))
+        return resample_axis(self.axis_values, self.intensity, energies, axis = 0)
+
+
+class XANESAreaIndex(object):
+    '''
+    Cumulative trapezoid index of a stack of XANES spectra on a common incident energy grid
+    Built once, then any number of energy window areas and tail normalizations are answered
+    with a binary search on the energy axis, for all the spectra at once (nothing is printed)
+    Same areas as XANES_area() and XANES_normalize() (trapezoid rule with dx = 1, i.e, in points,
+    a non-uniform grid is integrated against its energies in 0.05 eV steps, see point_axis())
+
+    Parameters
+    ----------
+    XANES_stack : data ndarray [incident energy, intensity 1, intensity 2, ...] (energy in KeV)
+                  e.g, XANES_data output or the Radiation_damage_series() output
+    '''
+
+    def __init__(self, XANES_stack):
+        XANES_stack = np.asarray(XANES_stack, dtype = float)
+        self.energy = XANES_stack[0]
+        self.intensity = np.atleast_2d(XANES_stack[1:])
+        if self.energy.size > 1 and self.energy[0] > self.energy[-1]:
+            # Increasing energy axis for the binary search
+            self.energy = self.energy[::-1]
+            self.intensity = self.intensity[:, ::-1]
+        # Area of each trapezoid, a window with a NaN point gives NaN (as np.trapz)
+        segments = (self.intensity[:, 1:] + self.intensity[:, :-1])/2.0
+        points = point_axis(self.energy)
+        if points is not None:
+            segments *= np.diff(points)
+        nan_segments = np.isnan(segments)
+        self.cumulative = np.zeros(self.intensity.shape)
+        np.cumsum(np.where(nan_segments, 0, segments), axis = 1, out = self.cumulative[:, 1:])
+        self.nan_count = np.zeros(self.intensity.shape, dtype = int)
+        np.cumsum(nan_segments, axis = 1, out = self.nan_count[:, 1:])
+
+    def __len__(self):
+        return self.intensity.shape[0]
+
+    def area(self, energy_ranges):
+        """
+        Areas of energy windows
+
+        Parameters
+        ----------
+        energy_ranges : (e1, e2) in eV, or a list of (e1, e2)
+
+        Returns
+        -------
+        out : 1d ndarray (one area per spectrum) for one (e1, e2)
+              2d ndarray (spectra, energy windows) for a list of (e1, e2)
+        """
+        energy_ranges = np.asarray(energy_ranges, dtype = float)
+        single = energy_ranges.ndim == 1
+        energy_ranges = np.atleast_2d(energy_ranges)
+        first = np.searchsorted(self.energy, energy_ranges[:, 0]/1000, 'left')
+        last = np.maximum(np.searchsorted(self.energy, energy_ranges[:, 1]/1000, 'right') - 1, first)
+        # Empty windows (outside of the energy axis) have no area
+        first = np.minimum(first, self.energy.size - 1)
+        last = np.minimum(last, self.energy.size - 1)
+        areas = self.cumulative[:, last] - self.cumulative[:, first]
+        areas[(self.nan_count[:, last] - self.nan_count[:, first]) > 0] = np.nan
+        return areas[:, 0] if single else areas
+
+    def tail_area(self, normalized_starting_energy = None):
+        """
+        Area from normalized_starting_energy (eV) to the end of the spectra, default None -----> whole area
+        """
+        if normalized_starting_energy is None:
+            normalized_starting_energy = self.energy[0]*1000
+        return self.area((normalized_starting_energy, np.inf))
+
+    def normalize(self, normalized_starting_energy = None, scale = 1):
+        """
+        Normalize the spectra to the area from normalized_starting_energy (eV) to the end, as XANES_normalize()
+        scale = 20 -----> same as normalize_toArea()
+
+        Returns
+        -------
+        out : data ndarray [incident energy, normalized intensity 1, normalized intensity 2, ...]
+        """
+        tail_area = self.tail_area(normalized_starting_energy)
+        return np.vstack([self.energy, scale*self.intensity/tail_area[:, np.newaxis]])
+
+
+class RangeMaxIndex(object):
+    '''
+    Sparse table of a 1d array for O(1) range maximum queries (NaN ignored, as np.nanmax)
+    Level k keeps the maximum of the 2**k values starting at each index, 
+    a range is covered by two overlapping blocks of the same level
+    Built in O(n log n), e.g, on the column maxima of a RIXS plane (see RIXSPlane.range_max())
+
+    Parameters
+    ----------
+    values : 1d ndarray
+    '''
+
+    def __init__(self, values):
+        values = np.asarray(values, dtype = float)
+        self.size = values.size
+        level_number = max(self.size, 1).bit_length()
+        self.table = np.full((level_number, self.size), np.nan)
+        self.table[0] = values
+        width = 1
+        for level in range(1, level_number):
+            previous = self.table[level - 1, :self.size - width + 1]
+            np.fmax(previous[:-width], previous[width:], out = self.table[level, :self.size - 2*width + 1])
+            width *= 2
+
+    def __len__(self):
+        return self.size
+
+    def __call__(self, first, last):
+        """
+        Maximum of values[first:last], first and last can be ndarrays (one maximum per range)
+        NaN for the ranges without a value, ValueError for an empty range (as np.nanmax)
+        """
+        first = np.asarray(first)
+        last = np.asarray(last)
+        if np.any(last <= first) or np.any(first < 0) or np.any(last > self.size):
+            raise ValueError('empty or invalid range for the maximum')
+        level = np.frexp(last - first)[1] - 1
+        return np.fmax(self.table[level, first], self.table[level, last - (1 << level)])
+
+
+class TimingSpan(object):
+    '''
+    One timed stage, opened by StageTimer.span() as a context manager
+    The size of the arrays produced by the stage can be recorded with span.size = array.size
+    '''
+    __slots__ = ('timer', 'name', 'size', 'start')
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+        self.size = 0
+
+    def __enter__(self):
+        self.timer.open(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.timer.close(self, time.perf_counter() - self.start)
+        return False
+
+
+class NoSpan(object):
+    '''
+    Span used when the timing is disabled, it does nothing
+    '''
+    size = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NO_SPAN = NoSpan()
+
+
+class StageTimer(object):
+    '''
+    Per-stage timing of the processing methods, see DataAnalysis.enable_timing()
+    A stage opened inside another one is named after it, e.g, 'RIXS_data/emission_interp'
+
+    Parameters
+    ----------
+    callback : default None, otherwise called at the end of each stage as callback(name, elapsed, size)
+               elapsed -----> wall time in s, size -----> number of elements of the arrays of the stage
+    '''
+
+    def __init__(self, callback = None):
+        self.callback = callback
+        self.stages = OrderedDict()
+        self.opened = []
+
+    def span(self, name):
+        return TimingSpan(self, name)
+
+    def open(self, span):
+        self.opened.append(span.name)
+        span.name = '/'.join(self.opened)
+
+    def close(self, span, elapsed):
+        self.opened.pop()
+        stage = self.stages.get(span.name)
+        if stage is None:
+            stage = self.stages[span.name] = {'calls': 0, 'total_s': 0., 'max_s': 0., 'size': 0}
+        stage['calls'] += 1
+        stage['total_s'] += elapsed
+        stage['max_s'] = max(stage['max_s'], elapsed)
+        stage['size'] = max(stage['size'], span.size)
+        if self.callback is not None:
+            self.callback(span.name, elapsed, span.size)
+
+    def report(self):
+        """
+        Returns
+        -------
+        out : OrderedDict {stage name: dict(calls, total_s, mean_s, max_s, size)}, in the order the stages ended
+              size -----> largest number of elements of the arrays of the stage
+        """
+        report = OrderedDict()
+        for name, stage in self.stages.items():
+            report[name] = dict(stage, mean_s = stage['total_s']/stage['calls'])
+        return report
+
+    def table(self):
+        """
+        The report as a text table
+        """
+        lines = ['%-40s %6s %10s %10s %12s' % ('stage', 'calls', 'total [s]', 'mean [s]', 'size')]
+        for name, stage in self.report().items():
+            lines.append('%-40s %6d %10.4f %10.4f %12d' % (name, stage['calls'], stage['total_s'], 
+                                                          stage['mean_s'], stage['size']))
+        return '\n'.join(lines)
+
+    def reset(self):
+        self.stages.clear()
+
+
+def timed(method):
+    """
+    Time a DataAnalysis method as one stage named after it, when the timing is enabled
+    """
+    name = method.__name__
+
+    @functools.wraps(method)
+    def timed_method(self, *args, **kwargs):
+        if self.timer is None:
+            return method(self, *args, **kwargs)
+        with self.timer.span(name):
+            return method(self, *args, **kwargs)
+    return timed_method
+
+
+class LiveScans(object):
+    '''
+    Base class of the live accumulators (see DataAnalysis.XANES_live() and DataAnalysis.RIXS_live())
+    It keeps track of the scans already used, and interpolates only the new scans on the common energy axis
+    '''
+
+    def __init__(self, dataAnalysis, firstScan, lastScan = None, skipScan = [], energy_range = None, 
+                 interp_npt_1eV = 20, channel = 'det_dtc', hold_last = False):
+        self.dataAnalysis = dataAnalysis
+        self.firstScan = firstScan
+        self.lastScan = lastScan
+        self.skipScan = list(skipScan)
+        self.channel = channel
+        self.hold_last = hold_last
+        self.next_scan = firstScan
+        self.scanList = []
+        # The last scan of the file may still be measured: its number of folded points is kept,
+        # and it is folded again when it grows
+        self.open_scan = None
+        self.open_points = 0
+
+        # The common energy axis is fixed once, from the energy range or from the first scan
+        if energy_range is None:
+            catalog = dataAnalysis.catalog([firstScan])
+            incident_Energy_min = round(catalog.incident_first[firstScan]*10000+1)/10000
+            incident_Energy_max = round(catalog.incident_last[firstScan]*10000-1)/10000
+        else:
+            incident_Energy_min = energy_range[0]/1000
+            incident_Energy_max = energy_range[1]/1000
+        incident_Energy_interp_npt = int(round((incident_Energy_max - incident_Energy_min)*1000) * interp_npt_1eV)
+        self.incident_Energy_interp = np.linspace(incident_Energy_min, incident_Energy_max, incident_Energy_interp_npt)
+
+    def new_scans(self):
+        """
+        Return the complete scans appended to the SPEC file since the previous update
+        """
+        # Reopen the SPEC file if it grew
+        self.dataAnalysis.check_file()
+        scan_number = self.dataAnalysis.scan_count()
+        if self.hold_last:
+            scan_number -= 1
+        if self.lastScan is not None:
+            scan_number = min(scan_number, self.lastScan + 1)
+        labels = ('arr_hdh_ene', self.channel, 'I02')
+        scanList = []
+        for n in range(self.next_scan, scan_number):
+            if n in self.skipScan:
+                continue
+            # The other scans (e.g, a concentration correction scan) are not used
+            scan_labels = self.dataAnalysis.scan_labels(n)
+            if all(label in scan_labels for label in labels):
+                scanList.append(n)
+        self.next_scan = max(self.next_scan, scan_number)
+        return scanList
+
+    def scan_points(self, scan):
+        return len(self.dataAnalysis.scan_column(scan, 'arr_hdh_ene'))
+
+    def update(self):
+        """
+        Fold the scans appended to the SPEC file since the previous update
+        A last scan folded while it was still measured is taken out and folded again with its new points
+
+        Returns
+        -------
+        out : the number of new or grown scans
+        """
+        scanList = self.new_scans()
+        if self.open_scan is not None and self.scan_points(self.open_scan) > self.open_points:
+            self.remove_scan(self.open_scan)
+            self.scanList.remove(self.open_scan)
+            scanList.insert(0, self.open_scan)
+        if scanList:
+            self.add_scans(scanList)
+            self.scanList.extend(scanList)
+            last = scanList[-1]
+            if not self.hold_last and last == self.dataAnalysis.scan_count() - 1:
+                self.open_scan = last
+                self.open_points = self.scan_points(last)
+            else:
+                self.open_scan = None
+        return len(scanList)
+
+
+class LiveXANES(LiveScans):
+    '''
+    Running sum and count of the interpolated XANES scans, see DataAnalysis.XANES_live()
+    '''
+
+    def __init__(self, dataAnalysis, firstScan, lastScan = None, skipScan = [], energy_range = None, 
+                 interp_npt_1eV = 20, method = 'average', channel = 'det_dtc', hold_last = False):
+        LiveScans.__init__(self, dataAnalysis, firstScan, lastScan, skipScan, energy_range, 
+                           interp_npt_1eV, channel, hold_last)
+        self.method = method
+        self.inten_sum = np.zeros(len(self.incident_Energy_interp))
+        self.inten_count = np.zeros(len(self.incident_Energy_interp), dtype = int)
+
+    def add_scans(self, scanList):
+        energy_stack, inten_stack, offsets = self.dataAnalysis.scan_stack(scanList, self.channel)
+        XANES_inten_array = interp_stack(energy_stack, inten_stack, offsets, self.incident_Energy_interp, 
+                                         fill_value = np.nan)
+        # NaN (outside of the energy range of a scan) is ignored, as in XANES_data
+        measured = ~np.isnan(XANES_inten_array)
+        self.inten_sum += np.where(measured, XANES_inten_array, 0).sum(axis = 0)
+        self.inten_count += measured.sum(axis = 0)
+        # The last scan may still grow (see LiveScans.update())
+        self.last_row = XANES_inten_array[-1]
+
+    def remove_scan(self, scan):
+        # Only the last folded scan is taken out
+        measured = ~np.isnan(self.last_row)
+        self.inten_sum -= np.where(measured, self.last_row, 0)
+        self.inten_count -= measured
+
+    def data(self):
+        """
+        Return the current data ndarray [incident_Energy_interp, XANES_merge_inten], as XANES_data
+        """
+        if self.method == 'sum':
+            XANES_merge_inten = self.inten_sum.copy()
+        else:
+            with np.errstate(invalid = 'ignore', divide = 'ignore'):
+                XANES_merge_inten = np.where(self.inten_count > 0, self.inten_sum / self.inten_count, np.nan)
+        return np.array([self.incident_Energy_interp, XANES_merge_inten])
+
+
+class LiveRIXS(LiveScans):
+    '''
+    RIXS plane built scan by scan (one emission energy per scan), see DataAnalysis.RIXS_live()
+    '''
+
+    def __init__(self, *args, **kwargs):
+        LiveScans.__init__(self, *args, **kwargs)
+        self.emission_Energy = []
+        self.inten_rows = []
+
+    def add_scans(self, scanList):
+        energy_stack, inten_stack, offsets = self.dataAnalysis.scan_stack(scanList, self.channel)
+        self.inten_rows.append(interp_stack(energy_stack, inten_stack, offsets, self.incident_Energy_interp, 
+                                            fill_value = 0))
+        self.emission_Energy.extend(self.dataAnalysis.catalog(scanList).emission[scanList])
+
+    def remove_scan(self, scan):
+        # Only the last folded scan is taken out, it is the last row
+        self.inten_rows[-1] = self.inten_rows[-1][:-1]
+        self.emission_Energy.pop()
+
+    def data(self, choice = 'EE', unit = 'eV', interp_npt_1eV = 20):
+        """
+        Return the current RIXSPlane [XX, YY, intensity], as RIXS_data
+        At least 2 emission energy scans are needed
+        """
+        if len(self.emission_Energy) < 2:
+            raise ValueError('At least 2 emission energy scans are needed for a RIXS plane')
+        MDfci_correc_inten = np.concatenate(self.inten_rows)
+        emission_Energy = np.array(self.emission_Energy)
+        emission_Energy_min = round(emission_Energy.min()*10000+1)/10000
+        emission_Energy_max = round(emission_Energy.max()*10000-1)/10000
+        emission_Energy_interp_npt = int(round((emission_Energy_max - emission_Energy_min)*1000)*interp_npt_1eV)
+        emission_Energy_interp = np.linspace(emission_Energy_min, emission_Energy_max, emission_Energy_interp_npt)
+        order = np.argsort(emission_Energy, kind = 'stable')
+        EE_intensity = resample_axis(emission_Energy[order], MDfci_correc_inten[order], emission_Energy_interp)
+        dataArray = RIXSPlane(self.incident_Energy_interp, emission_Energy_interp, EE_intensity, 
+                              choice = 'EE', unit = 'KeV')
+        if choice == 'ET':
+            dataArray = RIXS_EE_to_ET(dataArray)
+        return dataArray.to_unit(unit)
+
+
+class SpecIndex(object):
+    '''
+    Byte-offset index of a SPEC file, saved next to it as <SPEC file>.idx (JSON) and updated
+    incrementally when the file grows (only the last indexed scan and the new bytes are parsed again)
+    For each scan: byte offsets of the '#S' line, of the first data line and of the end of the scan,
+    the '#S' header line, the column labels, the number of points and the first two and last data lines
+    (for the ScanCatalog)
+    The columns of a scan are read with a memory map of the indexed byte range only
+
+    Parameters
+    ----------
+    path : the SPEC file
+    save : default True -----> keep the index in <SPEC file>.idx (silently skipped if the folder is read only)
+    '''
+    version = 2
+
+    def __init__(self, path, save = True):
+        self.path = path
+        self.index_path = path + '.idx'
+        self.save_index = save
+        self.scans = []
+        self.indexed_size = 0
+        self.file_stat = None
+        self.mmap = None
+        if not self.load():
+            self.scans = []
+            self.indexed_size = 0
+        self.update()
+
+    def __len__(self):
+        return len(self.scans)
+
+    def stat_file(self):
+        stat = os.stat(self.path)
+        return (stat.st_size, stat.st_mtime_ns)
+
+    def check_sum(self, start, end):
+        # sha1 of a byte range, to check that the indexed part of the file did not change
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            return hashlib.sha1(f.read(end - start)).hexdigest()
+
+    def load(self):
+        """
+        Read the index file, return False if it is missing or does not match the SPEC file
+        """
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+        except (IOError, OSError, ValueError):
+            return False
+        if index.get('version') != self.version or os.path.getsize(self.path) < index['indexed_size']:
+            return False
+        scans = index['scans']
+        # The head of the file and the last indexed scan must be unchanged (the file only grew)
+        head_end = min(index['indexed_size'], 4096)
+        tail_start = scans[-1]['offset'] if scans else 0
+        if (self.check_sum(0, head_end) != index['head'] or
+                self.check_sum(tail_start, index['indexed_size']) != index['tail']):
+            return False
+        self.scans = scans
+        self.indexed_size = index['indexed_size']
+        self.file_stat = tuple(index['file_stat'])
+        return True
+
+    def save(self):
+        if not self.save_index:
+            return
+        tail_start = self.scans[-1]['offset'] if self.scans else 0
+        index = {'version': self.version, 'path': os.path.abspath(self.path), 'indexed_size': self.indexed_size,
+                 'file_stat': list(self.file_stat), 'head': self.check_sum(0, min(self.indexed_size, 4096)),
+                 'tail': self.check_sum(tail_start, self.indexed_size), 'scans': self.scans}
+        try:
+            tmp_path = self.index_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(index, f)
+            os.replace(tmp_path, self.index_path)
+        except (IOError, OSError):
+            # e.g, read only data folder, the index stays in memory
+            pass
+
+    def update(self):
+        """
+        Index the scans appended since the previous update (the last indexed scan is parsed again,
+        it may have been incomplete). The whole file is indexed again if it did not only grow.
+
+        Returns
+        -------
+        out : True if the index changed
+        """
+        file_stat = self.stat_file()
+        if file_stat == self.file_stat:
+            return False
+        if file_stat[0] < self.indexed_size:
+            # The file was rewritten
+            self.scans = []
+            self.indexed_size = 0
+        start = self.scans.pop()['offset'] if self.scans else 0
+        self.close()
+        if file_stat[0] > 0:
+            with open(self.path, 'rb') as f:
+                data = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+                try:
+                    self.scans.extend(self.index_scans(data, start, len(data)))
+                    self.indexed_size = len(data)
+                finally:
+                    data.close()
+        self.file_stat = file_stat
+        self.save()
+        return True
+
+    def index_scans(self, data, start, end):
+        """
+        Index the scans of data[start:end], start is the beginning of a line
+        """
+        offsets = spec_scan_offsets(data, start, end)
+        return [spec_scan_entry(data, offset, offsets[k + 1] if k + 1 < len(offsets) else end) 
+                for k, offset in enumerate(offsets)]
+
+    def labels(self, scan):
+        return self.scans[scan]['labels']
+
+    def header(self, scan):
+        return self.scans[scan]['header']
+
+    def points(self, scan):
+        return self.scans[scan]['points']
+
+    def catalog_entry(self, scan):
+        # (header, labels, points, first_rows, last_row), see ScanCatalog.extend()
+        entry = self.scans[scan]
+        return (entry['header'], entry['labels'], entry['points'], entry['first_rows'], entry['last_row'])
+
+    def close(self):
+        if self.mmap is not None:
+            self.mmap.close()
+            self.mmap = None
+
+    def scan_data(self, scan):
+        """
+        Return the data of a scan, ndarray (points, columns), read from the indexed byte range only
+        """
+        entry = self.scans[scan]
+        if self.mmap is None:
+            with open(self.path, 'rb') as f:
+                self.mmap = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        block = self.mmap[entry['data_start']:entry['end']]
+        if not entry['clean']:
+            block = b'\n'.join(line for line in block.split(b'\n') if not line.lstrip().startswith((b'#', b'@')))
+        columns = len(entry['labels'])
+        values = np.fromstring(block.decode('ascii'), sep = ' ') if block.strip() else np.zeros(0)
+        if columns == 0:
+            return values.reshape(0, 0)
+        # An incomplete last line (the scan is being written) is dropped
+        points = values.size // columns
+        return values[:points * columns].reshape(points, columns)
+
+    def read_columns(self, scan, labels):
+        """
+        Return the columns of a scan, list of 1d ndarray, one per label
+        """
+        data = self.scan_data(scan)
+        scan_labels = self.scans[scan]['labels']
+        columns = []
+        for label in labels:
+            if label not in scan_labels:
+                raise KeyError('column %s not in scan %d (%s)' % (label, scan, self.scans[scan]['header']))
+            columns.append(np.ascontiguousarray(data[:, scan_labels.index(label)]))
+        return columns
+
+
+class SpecHeaders(object):
+    '''
+    Catalog entries of the scans of a SPEC file read on demand, without an index file (see SpecIndex)
+    The '#S' byte offsets are found once by a byte search (the data blocks are not parsed), then the entry
+    of a scan ('#S' and '#L' lines, number of points, first two and last data lines) is read from its own 
+    byte range the first time it is asked for. Used by the catalog of DataAnalysis(spec_index = False)
+
+    Parameters
+    ----------
+    path : the SPEC file
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.mmap = None
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size:
+                self.mmap = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        self.size = len(self.mmap) if self.mmap is not None else 0
+        self.offsets = spec_scan_offsets(self.mmap, 0, self.size) if self.size else []
+        self.entries = {}
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def catalog_entry(self, scan):
+        # (header, labels, points, first_rows, last_row), see ScanCatalog.extend()
+        if scan not in self.entries:
+            scan_end = self.offsets[scan + 1] if scan + 1 < len(self.offsets) else self.size
+            entry = spec_scan_entry(self.mmap, self.offsets[scan], scan_end)
+            self.entries[scan] = (entry['header'], entry['labels'], entry['points'], entry['first_rows'], 
+                                  entry['last_row'])
+        return self.entries[scan]
+
+    def close(self):
+        if self.mmap is not None:
+            self.mmap.close()
+            self.mmap = None
+
+
+class ScanCatalog(object):
+    '''
+    Metadata of the scans of a SPEC file, see DataAnalysis.catalog()
+    One entry per scan: scan command ('#S' line), column labels, number of points,
+    first/last incident energy (arr_hdh_ene) and emission energy (xes_en)
+    Only the first two and the last data lines of each scan are used, so the grids of XANES_data,
+    Radiation_damage and RIXS_data are planned without reading the columns
+    The entries are read on demand (see ensure()): the arrays are only valid for the scans already read,
+    the other scans have no command/labels, -1 points and NaN energies
+    The energies are kept in KeV as in the SPEC file, the queries (find()) are in eV
+
+    Parameters
+    ----------
+    entry_reader : default None, otherwise a function scan -----> (header, labels, points, first_rows, last_row)
+                   used to read the entries on demand (see extend() for the entry)
+    '''
+
+    def __init__(self, entry_reader = None):
+        self.entry_reader = entry_reader
+        self.commands = []
+        self.labels = []
+        self.first_rows = []
+        self.last_rows = []
+        self.filled = np.zeros(0, dtype = bool)
+        self.points = np.zeros(0, dtype = int)
+        self.incident_first = np.zeros(0)
+        self.incident_last = np.zeros(0)
+        self.emission_first = np.zeros(0)
+        self.emission = np.zeros(0)
+
+    def __len__(self):
+        return len(self.commands)
+
+    def resize(self, length):
+        """
+        Set the number of scans of the catalog, the new scans are read on demand (see ensure())
+        """
+        if length <= len(self):
+            self.truncate(length)
+            return
+        new_scans = length - len(self)
+        self.commands.extend([None]*new_scans)
+        self.labels.extend([] for n in range(new_scans))
+        self.first_rows.extend([] for n in range(new_scans))
+        self.last_rows.extend([None]*new_scans)
+        self.filled = np.concatenate([self.filled, np.zeros(new_scans, dtype = bool)])
+        self.points = np.concatenate([self.points, np.full(new_scans, -1, dtype = int)])
+        for name in ('incident_first', 'incident_last', 'emission_first', 'emission'):
+            setattr(self, name, np.concatenate([getattr(self, name), np.full(new_scans, np.nan)]))
+
+    def ensure(self, scans = None):
+        """
+        Read the entries of the scans not read yet (with entry_reader), default None -----> all the scans
+        The scans after the end of the catalog are ignored
+
+        Returns
+        -------
+        out : the catalog
+        """
+        scans = range(len(self)) if scans is None else scans
+        missing = [n for n in scans if 0 <= n < len(self) and not self.filled[n]]
+        if missing and self.entry_reader is not None:
+            self.set_entries(missing, [self.entry_reader(n) for n in missing])
+        return self
+
+    @property
+    def incident_min(self):
+        return np.fmin(self.incident_first, self.incident_last)
+
+    @property
+    def incident_max(self):
+        return np.fmax(self.incident_first, self.incident_last)
+
+    def extend(self, entries):
+        """
+        Add scans to the catalog
+
+        Parameters
+        ----------
+        entries : list of (header, labels, points, first_rows, last_row)
+                  header -----> the '#S' line, e.g, '#S 72 fscan arr_hdh_ene 6.53 6.545 ...'
+                  first_rows -----> the first two data lines (fewer for the short scans)
+                  last_row -----> the last data line (None if the scan has no point)
+        """
+        entries = list(entries)
+        start = len(self)
+        self.resize(start + len(entries))
+        self.set_entries(range(start, len(self)), entries)
+
+    def set_entries(self, scans, entries):
+        """
+        Set the entries of scans (see extend() for the entries)
+        """
+        scans = list(scans)
+        for n, (header, labels, points, first_rows, last_row) in zip(scans, entries):
+            self.commands[n] = header[3:] if header.startswith('#S ') else header
+            self.labels[n] = list(labels)
+            self.first_rows[n] = [list(row) for row in first_rows]
+            self.last_rows[n] = list(last_row) if last_row is not None else None
+            self.points[n] = points
+        self.filled[scans] = True
+        self.incident_first[scans] = self.values(scans, 'arr_hdh_ene', 0)
+        self.incident_last[scans] = self.values(scans, 'arr_hdh_ene', -1)
+        self.emission_first[scans] = self.values(scans, 'xes_en', 0)
+        # The emission energy of a RIXS scan is its second xes_en value (as in RIXS_data)
+        self.emission[scans] = self.values(scans, 'xes_en', 1)
+
+    def truncate(self, length):
+        """
+        Drop the scans from length on (e.g, the last scan, which may have grown)
+        """
+        del self.commands[length:], self.labels[length:], self.first_rows[length:], self.last_rows[length:]
+        for name in ('filled', 'points', 'incident_first', 'incident_last', 'emission_first', 'emission'):
+            setattr(self, name, getattr(self, name)[:length])
+
+    def values(self, scans, label, row = 0):
+        """
+        Return the value of a column in the first (row = 0), second (row = 1) or last (row = -1) line of scans
+
+        Returns
+        -------
+        out : 1d ndarray, NaN for the scans without this column (or without this line)
+        """
+        self.ensure(scans)
+        values = np.full(len(scans), np.nan)
+        for k, n in enumerate(scans):
+            if label not in self.labels[n]:
+                continue
+            if row == -1:
+                line = self.last_rows[n]
+            else:
+                # A one point scan -----> its only line
+                line = self.first_rows[n][min(row, len(self.first_rows[n]) - 1)] if self.first_rows[n] else None
+            if line is not None and self.labels[n].index(label) < len(line):
+                values[k] = line[self.labels[n].index(label)]
+        return values
+
+    def entry(self, scan):
+        """
+        Return the catalog entry of a scan, dict(command, labels, points, incident_min, incident_max, emission)
+        (energies in KeV)
+        """
+        self.ensure([scan])
+        return {'command': self.commands[scan], 'labels': list(self.labels[scan]), 
+                'points': int(self.points[scan]), 'incident_min': float(self.incident_min[scan]), 
+                'incident_max': float(self.incident_max[scan]), 'emission': float(self.emission[scan])}
+
+    def find(self, incident_range = None, emission_range = None, command = None, labels = None, 
+             min_points = 1, scans = None):
+        """
+        Find the scans matching all the given conditions
+
+        Parameters
+        ----------
+        incident_range : (e1, e2) in eV, the incident energy range of the scan covers e1 - e2 (1 meV tolerance)
+                         e.g, (6535, 6545)
+        emission_range : (e1, e2) in eV, the emission energy of the scan is between e1 and e2
+        command : a part of the scan command, e.g, 'fscan arr_hdh_ene' (the '#S' line without '#S ')
+        labels : the columns the scan must have, e.g, ('arr_hdh_ene', 'det_dtc', 'I02')
+        min_points : the minimum number of points, default 1
+        scans : the scans to search, default None -----> all the scans
+
+        Returns
+        -------
+        out : list of the scan indexes
+        """
+        # The entries of all the searched scans are needed
+        self.ensure(scans)
+        selected = np.zeros(len(self), dtype = bool)
+        selected[list(scans) if scans is not None else slice(None)] = True
+        selected &= self.points >= min_points
+        with np.errstate(invalid = 'ignore'):
+            if incident_range is not None:
+                low, high = sorted(incident_range)
+                selected &= (self.incident_min <= low/1000 + 1e-6) & (self.incident_max >= high/1000 - 1e-6)
+            if emission_range is not None:
+                low, high = sorted(emission_range)
+                selected &= (self.emission >= low/1000 - 1e-6) & (self.emission <= high/1000 + 1e-6)
+        scanList = np.flatnonzero(selected).tolist()
+        if command is not None:
+            scanList = [n for n in scanList if command in self.commands[n]]
+        if labels is not None:
+            scanList = [n for n in scanList if all(label in self.labels[n] for label in labels)]
+        return scanList
+
+
+def open_spec(path):
+    """
+    Open a SPEC file with silx, imported on the first use so that importing DataAnalysis stays cheap
+    """
+    from silx.io.specfile import SpecFile
+    return SpecFile(path)
+
+
+# SpecFile (or SpecIndex) objects opened by the workers of load_columns(), one set per thread
+worker_specfiles = threading.local()
+
+def read_scan_columns(path, file_stat, scan, labels, spec_index = False):
+    """
+    Read the columns of one scan, run by the workers of DataAnalysis.load_columns()
+    Each worker thread/process keeps its own SpecFile, reopened when the file changed
+    spec_index = True -----> the worker reads the columns through a SpecIndex instead
+
+    Returns
+    -------
+    out : list of 1d ndarray, one per label
+    """
+    specfiles = getattr(worker_specfiles, 'specfiles', None)
+    if specfiles is None:
+        specfiles = worker_specfiles.specfiles = {}
+    key = (path, spec_index)
+    if key not in specfiles or specfiles[key][0] != file_stat:
+        # The workers do not write the index file, the DataAnalysis object keeps it up to date
+        specfiles[key] = (file_stat, SpecIndex(path, save = False) if spec_index else open_spec(path))
+    sf = specfiles[key][1]
+    if spec_index:
+        return sf.read_columns(scan, labels)
+    return [sf[scan].data_column_by_name(label) for label in labels]
+
 
 class DataAnalysis(object):
     '''
@@ -60,6 +1617,30 @@ class DataAnalysis(object):
  |  Methods
  |  ----------
  |
+ |  scan_column(): get a data column of a scan, parsed only once thanks to the column cache
+ |      return column, dtype = 1d ndarray (read only)
+ |
+ |  load_columns(): read several columns of several scans, optionally in parallel with a thread/process pool
+ |      return dict {(scan, label): column}
+ |
+ |  scan_stack(): load the incident energy and intensity of several scans as one ragged stack
+ |      return (energy, intensity, offsets), dtype = 1d ndarray
+ |
+ |  cached_plane(), store_plane(): get/save a processed plane from/into the persistent plane cache
+ |
+ |  catalog(): metadata of the scans (energy range, emission energy, points, columns, command), read on demand
+ |      without reading the columns, catalog().find() gives the scans covering an energy range
+ |      return ScanCatalog
+ |
+ |  scan_count(), scan_labels(), scan_header(): number of scans, column labels and '#S' line of a scan
+ |      (from the scan index if spec_index = True, otherwise from silx)
+ |
+ |  cache_info(): column cache statistics
+ |      return dict(hits, misses, columns, currsize, maxsize)
+ |
+ |  enable_timing(), disable_timing(), timing_report(): opt-in timing of each stage of the processing methods
+ |      return StageTimer, report dict {stage name: dict(calls, total_s, mean_s, max_s, size)}
+ |
  |  -----------------------------------------
  |  ------------- XANES PART ----------------
  |  -----------------------------------------
@@ -67,25 +1648,42 @@ class DataAnalysis(object):
  |  XANES_data(): get XANES merged data ndarray from SPEC file
  |      return [incident energy, intensity], dtype = 1d ndarray
  |
+ |  XANES_live(): live XANES average, updated scan by scan while the SPEC file is still being written
+ |      return LiveXANES object, .update() folds the new scans, .data() gives [incident energy, intensity]
+ |
  |  Radiation_damage(): Averaging for a step of XANES
  |      return [incident energy, intensity], dtype = 1d ndarray
  |
+ |  Radiation_damage_series(): dose series, strided/sliding window/cumulative averages of the scans in one pass
+ |      return ([incident energy, group 1 intensity, group 2 intensity, ...], group descriptions)
+ |
  |  XANES_normalize(): Normalize XANES to area into unity(whole area or specified tail area)
  |      return [incident energy, normalized_intensity], dtype = 1d ndarray
  |
  |  XANES_find_peaks(): Find XANES peaks and plotting
  |      return [peak energy, peak_intensity], dtype = 1d ndarray
  |
+ |  XANES_find_peaks_batch(): Find the peaks of many XANES spectra at once, without plotting
+ |      return (peak energy, peak intensity, offsets), ragged table, dtype = 1d ndarray
+ |
  |  XANES_area(): calculate XANES area for specified energy range
  |      return area, dtype = float
  |
+ |  XANES_area_index(): cumulative trapezoid index of many XANES spectra, many areas/normalizations at once
+ |      return XANESAreaIndex, .area() -----> areas ndarray (spectra, energy windows), .normalize()
+ |
  |
  |  -----------------------------------------
  |  ------------- RIXS PART -----------------
  |  -----------------------------------------
  |
  |  RIXS_data() : To get RIXS data ndarray from SPEC file
- |      return data ndarray [incident energy, emission energy, intensity]
+ |      return RIXSPlane [incident energy, emission energy, intensity]
+ |      (a RIXSPlane keeps 1d axes and unpacks like the former data ndarray)
+ |      memory_MB option -----> tiled computation into a memory-mapped .npy file or a HDF5 archive
+ |
+ |  RIXS_live() : live RIXS plane, updated scan by scan while the SPEC file is still being written
+ |      return LiveRIXS object, .update() folds the new scans, .data() gives the RIXS_data like ndarray
  |
  |  RIXS_data_constantET() : To get RIXS data ndarray from SPEC file. In this type of scan, ET is fixed
  |                           This is different with RIXS_data where the emission energy is fixed.
@@ -103,15 +1701,63 @@ class DataAnalysis(object):
  |  RIXS_cut() : To do CIE, CET, CEE cuts
  |      return CIE, CET, CEE data ndarray [incident energy/energy transfer, intensity]
  |
+ |  RIXS_cuts() : Batch CIE, CET, CEE cuts, with interpolators cached on the RIXSPlane
+ |      return dict of data ndarray [incident energy/energy transfer, cut1 intensity, cut2 intensity, ...]
+ |
  |  RIXS_integration() : Integration along incident energy and energy transfer
  |      return integrated data ndarray [incident energy/energy transfer, intensity]
  |
+ |  RIXS_normalization_batch() : Normalize many RIXS planes to the maximum of the same pre-edge range
+ |      return list of RIXSPlane (the pre-edge maxima are O(1) queries, see RIXSPlane.range_max())
+ |
  |  -----------------------------------------
  |  ----------- GENERAL FUNCTIONS ----------- 
  |  ---------- This is not methods! --------- 
  |  -----------------------------------------
  |
+ |  ScanCatalog : per scan metadata (see catalog()), .find() -----> scans by energy range, command, columns
+ |
+ |  SpecIndex : byte-offset index of the scans of a SPEC file, saved in <SPEC file>.idx, updated when the file grows
+ |  SpecHeaders : catalog entries read on demand from the '#S' offsets of a SPEC file, without an index file
+ |      .read_columns() reads the columns of a scan through a memory map of its byte range only
+ |
+ |  XANESAreaIndex : cumulative trapezoid index of a XANES stack, .area(), .normalize() (see XANES_area_index())
+ |
+ |  RangeMaxIndex : sparse table for O(1) range maxima, e.g, the pre-edge maximum of RIXS_normalization()
+ |
+ |  RIXSArchive : HDF5 archive of the processed RIXS planes of a session (RIXS_data(archive = ...))
+ |      archive[name] -----> ArchivedPlane, .roi() and .cut() only read the chunks they need
+ |
  |  saveFile() : Save data into .dat file so that the data can be processed with other softwares
+ |      or into binary .npy, .npz, .h5 files (fileFormat option)
+ |      return the path of the file
+ |
+ |  loadFile() : Read back a file written by saveFile()
+ |      return (dataArray or RIXSPlane, headerList)
+ |
+ |  interp_stack() : Interpolate a ragged stack of scans onto a common incident energy axis, all at once
+ |      return interpolated ndarray (scans, energy points)
+ |
+ |  resample_axis() : Interpolate a 2d array along one axis only, all the rows/columns at once
+ |      return interpolated ndarray
+ |
+ |  energy_grid() : Interpolation grid of an energy axis, uniform or adaptive
+ |      return 1d ndarray
+ |
+ |  adaptive_grid() : Piecewise uniform grid following the measured sampling density
+ |      return 1d ndarray
+ |
+ |  point_axis() : Energy axis in 0.05 eV reference steps (None for a uniform axis), for the areas
+ |      return 1d ndarray or None
+ |
+ |  column_tiles() : Split the columns of a plane into tiles under a RAM budget
+ |      return list of slices
+ |
+ |  as_RIXS_plane() : Get a RIXSPlane from a RIXSPlane or from a former [XX, YY, intensity] data ndarray
+ |      return RIXSPlane
+ |
+ |  RIXS_EE_to_ET() : Remap a RIXS plane from emission energy to energy transfer
+ |      return data ndarray [incident energy, energy transfer, intensity]
  |
  |  normalize_toArea() : Normalize XANES to area into unity(whole area or specified tail area)
  |      return [incident energy, normalized_intensity], dtype = 1d ndarray 
@@ -119,6 +1765,9 @@ class DataAnalysis(object):
  |  find_peaks(): Find XANES peaks and plotting
  |      return [peak energy, peak_intensity], dtype = 1d ndarray
  |
+ |  find_peaks_batch(): Find the peaks of many XANES spectra at once (cached wavelets or prominence detector)
+ |      return (peak energy, peak intensity, offsets), ragged table, dtype = 1d ndarray
+ |
  |  XANES_area(): calculate XANES area for specified energy range
  |      return area, dtype = float
  |
@@ -126,15 +1775,347 @@ class DataAnalysis(object):
  |  Parameters
  |  ----------
  |  path : the filepath of Specfile
+ |  cache_MB : memory budget of the column cache in MB, default: 256 MB
+ |  plane_cache : persistent cache of the RIXS planes, default: None -----> no persistent cache
+ |                True -----> PlaneCache in ~/.cache/DataAnalysis
+ |                a folder path or a PlaneCache object
+ |  spec_index : default False -----> the scans are read with silx, the catalog entries from the
+ |               header and the edge lines of each scan (see SpecHeaders)
+ |               True -----> the scans are read through a SpecIndex, saved in <SPEC file>.idx 
+ |               (fast opening and reading of multi-GB SPEC files, only the new scans are indexed when the file grows)
  |
     '''
     
-    def __init__(self, path):
+    def __init__(self, path, cache_MB = 256, plane_cache = None, spec_index = False):
         self.path = path
-        self.sf = SpecFile(path)
+        # The silx SpecFile is opened on the first use (see the sf property)
+        self._sf = None
+        self.index = SpecIndex(path) if spec_index else None
+        # Scan metadata, built on the first use (see catalog())
+        self._catalog = None
+        # '#S' offsets for the catalog entries without a SpecIndex, found on the first use (see headers)
+        self._headers = None
+        self.cache = ColumnCache(cache_MB)
+        self.file_stat = self.stat_file()
+        if plane_cache is True:
+            plane_cache = PlaneCache()
+        elif isinstance(plane_cache, str):
+            plane_cache = PlaneCache(plane_cache)
+        self.plane_cache = plane_cache
+        # Per-stage timing, disabled by default (see enable_timing())
+        self.timer = None
+
+    def enable_timing(self, callback = None):
+        """
+        Record the wall time, the number of calls and the array sizes of each stage of the processing methods
+
+        Parameters
+        ----------
+        callback : default None, otherwise called at the end of each stage as callback(name, elapsed, size)
+
+        Returns
+        -------
+        out : StageTimer, timer.report() -----> dict {stage name: dict(calls, total_s, mean_s, max_s, size)}
+                          timer.table() -----> the same as a text table
+        """
+        self.timer = StageTimer(callback)
+        return self.timer
+
+    def disable_timing(self):
+        self.timer = None
+
+    def timing_report(self):
+        """
+        Returns
+        -------
+        out : dict {stage name: dict(calls, total_s, mean_s, max_s, size)}, empty if the timing is disabled
+        """
+        if self.timer is None:
+            return OrderedDict()
+        return self.timer.report()
+
+    def span(self, name):
+        """
+        Context manager timing one stage of a method, it does nothing when the timing is disabled
+        """
+        if self.timer is None:
+            return NO_SPAN
+        return self.timer.span(name)
+
+    def cached_plane(self, method, params):
+        """
+        Return the plane computed by method with params from the persistent plane cache, None if not cached
+        """
+        if self.plane_cache is None:
+            return None
+        self.check_file()
+        return self.plane_cache.get(self.path, self.file_stat, method, params)
+
+    def store_plane(self, method, params, dataArray):
+        """
+        Save the plane computed by method with params into the persistent plane cache
+        """
+        if self.plane_cache is not None:
+            self.plane_cache.put(self.path, self.file_stat, method, params, dataArray)
+
+    def archive_plane(self, archive, name, dataArray, params):
+        """
+        Save a plane into a RIXSArchive (or a HDF5 file path), with the processing parameters and the SPEC file
+        """
+        params = dict(params, path = os.path.abspath(self.path), file_stat = list(self.file_stat))
+        if isinstance(archive, RIXSArchive):
+            archive.put(name, dataArray, params)
+        else:
+            with RIXSArchive(archive) as opened_archive:
+                opened_archive.put(name, dataArray, params)
+
+    @property
+    def headers(self):
+        """
+        SpecHeaders of the SPEC file (catalog entries read on demand without a SpecIndex), made on the first use
+        """
+        if self._headers is None:
+            self._headers = SpecHeaders(self.path)
+        return self._headers
+
+    @property
+    def sf(self):
+        """
+        silx SpecFile of the SPEC file, opened on the first use
+        """
+        if self._sf is None:
+            self._sf = open_spec(self.path)
+        return self._sf
+
+    def scan_count(self):
+        """
+        Return the number of scans of the SPEC file
+        """
+        self.check_file()
+        return len(self.index) if self.index is not None else len(self.sf)
+
+    def scan_labels(self, scan):
+        """
+        Return the column labels of a scan, e.g, ['arr_hdh_ene', 'det_dtc', 'I02', ...]
+        """
+        self.check_file()
+        return list(self.index.labels(scan)) if self.index is not None else list(self.sf[scan].labels)
+
+    def scan_header(self, scan):
+        """
+        Return the '#S' line of a scan, e.g, '#S 72 fscan arr_hdh_ene 6.53 6.545 ...'
+        """
+        self.check_file()
+        return self.index.header(scan) if self.index is not None else self.sf[scan].scan_header[0]
+
+    def catalog(self, scans = None):
+        """
+        Metadata of the scans of the SPEC file (from the first two and the last data lines of each scan)
+        The entries are read on demand: only the given scans are read here, 
+        catalog().find() reads the scans it searches (all the scans by default)
+        The scans read before are kept, except the last one when the file grows (it may have grown)
+
+        Parameters
+        ----------
+        scans : the scans whose entries are needed, e.g, range(firstScan, lastScan + 1)
+                default None -----> no entry is read (e.g, for find())
+
+        Returns
+        -------
+        out : ScanCatalog
+              e.g, dataAnalysis.catalog().find(incident_range = (6535, 6545), labels = ('det_dtc', 'I02'))
+              -----> the scans covering 6535 - 6545 eV
+        """
+        self.check_file()
+        if self._catalog is None:
+            self._catalog = ScanCatalog(self.catalog_entry)
+        # The scans are counted from the '#S' lines, silx is not opened for the catalog
+        self._catalog.resize(len(self.index) if self.index is not None else len(self.headers))
+        if scans is not None:
+            self._catalog.ensure(scans)
+        return self._catalog
+
+    def catalog_entry(self, scan):
+        # (header, labels, points, first_rows, last_row) of a scan, see ScanCatalog.extend()
+        if self.index is not None:
+            return self.index.catalog_entry(scan)
+        # From the '#S' and '#L' lines and the first and last data lines of the scan, 
+        # neither silx nor the data block of the scan is parsed (see SpecHeaders)
+        return self.headers.catalog_entry(scan)
+
+    def read_scan(self, scan, labels):
+        # The columns of a scan, through the scan index if there is one
+        if self.index is not None:
+            return self.index.read_columns(scan, labels)
+        return [self.sf[scan].data_column_by_name(label) for label in labels]
+
+    def stat_file(self):
+        """
+        Return (size, modification time) of the SPEC file
+        """
+        stat = os.stat(self.path)
+        return (stat.st_size, stat.st_mtime_ns)
+
+    def check_file(self):
+        """
+        Reopen the SPEC file and drop the cached columns if the file changed on disk
+        
+        Returns
+        -------
+        out : True if the file changed, otherwise False
+        """
+        file_stat = self.stat_file()
+        if file_stat == self.file_stat:
+            return False
+        self._sf = None
+        if self._headers is not None:
+            self._headers.close()
+            self._headers = None
+        if self._catalog is not None:
+            if file_stat[0] < self.file_stat[0]:
+                # The file was rewritten
+                self._catalog = None
+            else:
+                # The last scan may have grown
+                self._catalog.truncate(max(len(self._catalog) - 1, 0))
+        if self.index is not None:
+            # Only the new scans are indexed
+            self.index.update()
+        self.cache.clear()
+        self.file_stat = file_stat
+        return True
+
+    def scan_column(self, scan, label):
+        """
+        Get a data column of a scan, the column is parsed from the SPEC file only once 
+        and then served from the column cache
+
+        Parameters
+        ----------
+        scan : the index of the scan, e.g, 71 corresponding to fscan '72.1'
+        label : the column name, e.g, 'arr_hdh_ene', 'det_dtc', 'I02'
+
+        Returns
+        -------
+        out : 1d ndarray, read only (copy it before modifying it in place)
+        """
+        self.check_file()
+        key = (scan, label)
+        column = self.cache.get(key)
+        if column is None:
+            column = self.read_scan(scan, [label])[0]
+            self.cache.put(key, column)
+        return column
+
+    @timed
+    def load_columns(self, scanList, labels, executor = None, workers = None):
+        """
+        Read several columns of several scans, optionally in parallel, and keep them in the column cache
+
+        Parameters
+        ----------
+        scanList : the indexes of the scans, e.g, range(71, 147)
+        labels : the column names, e.g, ('arr_hdh_ene', 'det_dtc', 'I02')
+        executor : default None -----> read the scans one after the other
+                   'thread' -----> read the scans with a thread pool
+                   'process' -----> read the scans with a process pool
+                   or an existing concurrent.futures executor (it is not shut down)
+        workers : the number of workers of the pool, default: number of CPUs
+
+        Returns
+        -------
+        out : dict {(scan, label): column}, in the order of scanList and labels whatever the executor
+        """
+        self.check_file()
+        scanList = list(scanList)
+        labels = tuple(labels)
+        # Only the scans with columns missing from the cache are read by the pool
+        missing_scans = [n for n in scanList if any((n, label) not in self.cache for label in labels)]
+        loaded_columns = {}
+        own_pool = False
+        if executor is None or len(missing_scans) < 2:
+            # All the labels of a scan are read from the same scan object
+            scan_columns = (self.read_scan(n, labels) for n in missing_scans)
+        else:
+            own_pool = not isinstance(executor, Executor)
+            if executor == 'thread':
+                executor = ThreadPoolExecutor(workers)
+            elif executor == 'process':
+                executor = ProcessPoolExecutor(workers)
+            elif own_pool:
+                raise ValueError("executor should be None, 'thread', 'process' or a concurrent.futures executor")
+            # map() gives back the results in the order of missing_scans, so the result is deterministic
+            scan_number = len(missing_scans)
+            scan_columns = executor.map(read_scan_columns, [self.path] * scan_number, 
+                                        [self.file_stat] * scan_number, missing_scans, 
+                                        [labels] * scan_number, [self.index is not None] * scan_number)
+        try:
+            for n, columns_n in zip(missing_scans, scan_columns):
+                for label, column in zip(labels, columns_n):
+                    column.flags.writeable = False
+                    self.cache.put((n, label), column)
+                    loaded_columns[(n, label)] = column
+            self.cache.misses += len(loaded_columns)
+        finally:
+            if own_pool:
+                executor.shutdown()
+        # The other columns come from the column cache
+        columns = {}
+        for n in scanList:
+            for label in labels:
+                column = loaded_columns.get((n, label))
+                columns[(n, label)] = self.scan_column(n, label) if column is None else column
+        return columns
+
+    def scan_stack(self, scanList, channel = 'det_dtc', concCorrec = None, energy_label = 'arr_hdh_ene'):
+        """
+        Load the incident energy and the I02 normalized intensity of several scans as one ragged stack
+        (the scans can have different numbers of points)
+
+        Parameters
+        ----------
+        scanList : the indexes of the scans, e.g, [71, 72, 74]
+        channel : 'det_dtc' for HERFD-XAS, 'IF2' for conventional XAS
+        concCorrec : default None, 
+                     otherwise the concentration correction intensity, one value per scan of scanList
+                     (the first len(scanList) values are used)
+        energy_label : the energy column, default 'arr_hdh_ene' (incident energy), 
+                       'Spec.Energy' for the constant ET scans
+
+        Returns
+        -------
+        out : (energy, intensity, offsets)
+              energy -----> incident energy of all the scans put one after the other, 1d ndarray
+              intensity -----> corresponding intensity, 1d ndarray
+              offsets -----> the points of scanList[k] are energy[offsets[k]:offsets[k+1]]
+        """
+        energy_list = [self.scan_column(n, energy_label) for n in scanList]
+        offsets = np.zeros(len(scanList) + 1, dtype = int)
+        offsets[1:] = np.cumsum([len(energy) for energy in energy_list])
+        energy = np.concatenate(energy_list) if scanList else np.zeros(0)
+        if not scanList:
+            return energy, np.zeros(0), offsets
+        # Normalized to I02, for all the scans in one go
+        intensity = (np.concatenate([self.scan_column(n, channel) for n in scanList]) /
+                     np.concatenate([self.scan_column(n, 'I02') for n in scanList]))
+        if concCorrec is not None:
+            # One concentration correction value per scan
+            intensity /= np.repeat(np.asarray(concCorrec)[:len(scanList)], np.diff(offsets))
+        return energy, intensity, offsets
+
+    def cache_info(self):
+        """
+        Column cache statistics
+
+        Returns
+        -------
+        out : dict(hits, misses, columns, currsize, maxsize), the sizes are in bytes
+        """
+        return self.cache.info()
     
+    @timed
     def XANES_data(self, firstScan, lastScan, skipScan = [], interp_npt_1eV = 20, 
-                   method = 'average', savetxt = False, channel = 'det_dtc'):
+                   method = 'average', savetxt = False, channel = 'det_dtc', executor = None):
         """
         To get XANES merged data ndarray from SPEC file
         The incident energy for scans can be different
@@ -147,9 +2128,13 @@ class DataAnalysis(object):
                    e.g, [2,5,8] -- skip '3.1','6.1','9.1' scans 
         interp_npt_1eV : the number of interpolation points for 1 eV, default: 20 points for 1 eV
                          e.g, Incident Energy: 6535 eV - 6545 eV, 11 eV, 115 points, -----> 220 points
+                         (min_npt_1eV, max_npt_1eV) -----> adaptive grid following the measured energy steps,
+                         between min_npt_1eV and max_npt_1eV points for 1 eV (see adaptive_grid())
         method : 'average' or 'sum' for intensity
         channel : 'det_dtc' for HERFD-XAS, 'IF2' for conventional XAS
         savetxt: default True, save the ET, EE data as folders 
+        executor: default None, read the scans one after the other
+                  'thread', 'process' or a concurrent.futures executor -----> read the scans in parallel
         Returns
         -------
         out : A 1d data ndarray [incident_Energy_interp, XANES_merge_inten]
@@ -157,68 +2142,56 @@ class DataAnalysis(object):
               XANES_merge_inten -----> interpolated intensity
         """
         
-        # Each scan has different incident energy points
-        # this step finds the highest incident energy of the corresponding scans
-        #             and the lowest incident energy
-        energy_checkmin_list = []
-        energy_checkmax_list = []
-        for n in range(firstScan, lastScan + 1): 
-            IE_min_check = self.sf[n].data_column_by_name('arr_hdh_ene')[0]        
-            IE_max_check = self.sf[n].data_column_by_name('arr_hdh_ene')[-1]
-            energy_checkmin_list.append(IE_min_check)
-            energy_checkmax_list.append(IE_max_check)
-        energy_min_index = energy_checkmin_list.index(min(energy_checkmin_list)) + firstScan
-        energy_max_index = energy_checkmax_list.index(max(energy_checkmax_list)) + firstScan
-
-        # Find the energy span of incident energy (For later interpolation)
-        # e.g, incident energy range : 4.987654 KeV - 4.987987 KeV
-        # will be approximated as 4.9878 KeV for minimum incident Energy 
-        #                         4.9879 KeV for maxmum incident Energy
-        # I do in such a way to ensure the interpolation points lie always inside the experimental incident energy range
-        # 4.9878 > 4.987654 while 4.9879 < 4.987987
-        incident_Energy_min = round(self.sf[energy_min_index].data_column_by_name('arr_hdh_ene')[0]*10000+1)/10000
-        incident_Energy_max = round(self.sf[energy_max_index].data_column_by_name('arr_hdh_ene')[-1]*10000-1)/10000
-
-        # Find the energy span of incident energy
-        incident_Energy_Span = incident_Energy_max - incident_Energy_min
-
-        # Define the total points of interpolation for incident energy
-        # default: 20 points for 1 eV
-        incident_Energy_interp_npt = int(round(incident_Energy_Span*1000) * interp_npt_1eV)
-
-        # Fisrt do the incident energy 1d interpolation
-        # Creat empty arrays filled with NaN for different XANES scans 
-        # which has the shape (scan total numbers, incident_Energy_interp_npt)
-        XANES_inten_array = np.zeros(((lastScan - firstScan + 1,incident_Energy_interp_npt))) 
-        XANES_inten_array[:] = np.nan
-        
         # Define the scans list (skip the problematic scans)
         scanList = []
         for n in range(firstScan, lastScan + 1):
             if n not in skipScan:
                 scanList.append(n)
 
-        # We then fill the empty array with interpolated concentration corrected intensity
-        # Use scipy.interpolate.interp1d to interpolate the points
-        for n in range(firstScan, lastScan + 1):
-            incident_Energy = self.sf[n].data_column_by_name('arr_hdh_ene')
-            # corresponding intensity
-            inten = self.sf[n].data_column_by_name(channel)/self.sf[n].data_column_by_name('I02') # Normalized to I02
-            # Define our interp1d function for incident energy, fill the outbound value with 0
-            f_interp = interp.interp1d(incident_Energy, inten, bounds_error = False)
-            # Find our interpolated incident energy and corresponding intensity
-            incident_Energy_interp = np.linspace(incident_Energy_min, incident_Energy_max, incident_Energy_interp_npt)
-            inten_interp = f_interp (incident_Energy_interp)
-            # Fill the empty array with the interpolated data
-            # Now we only interpolate in incident axis, not in emission axis
-            XANES_inten_array[n-firstScan,:] = inten_interp
-
-        if method == 'average':
-            # To average all the intensities for different scans, we ignore the nan data
-            XANES_merge_inten = np.nanmean(XANES_inten_array, axis = 0)
-        elif method == 'sum':
-            # To average all the intensities for different scans, we ignore the nan data
-            XANES_merge_inten = np.nansum(XANES_inten_array, axis = 0)
+        # Read all the columns first (in parallel if asked), they are then served by the column cache
+        self.load_columns(scanList, ('arr_hdh_ene', channel, 'I02'), executor)
+
+        with self.span('grid') as span:
+            # Each scan has different incident energy points
+            # this step finds the highest incident energy of the corresponding scans
+            #             and the lowest incident energy
+            # (from the scan catalog, the first and last incident energies of the scans are known without reading them)
+            catalog = self.catalog(range(firstScan, lastScan + 1))
+            energy_checkmin_list = catalog.incident_first[firstScan:lastScan + 1]
+            energy_checkmax_list = catalog.incident_last[firstScan:lastScan + 1]
+
+            # Find the energy span of incident energy (For later interpolation)
+            # e.g, incident energy range : 4.987654 KeV - 4.987987 KeV
+            # will be approximated as 4.9878 KeV for minimum incident Energy 
+            #                         4.9879 KeV for maxmum incident Energy
+            # I do in such a way to ensure the interpolation points lie always inside the experimental incident energy range
+            # 4.9878 > 4.987654 while 4.9879 < 4.987987
+            incident_Energy_min = round(np.nanmin(energy_checkmin_list)*10000+1)/10000
+            incident_Energy_max = round(np.nanmax(energy_checkmax_list)*10000-1)/10000
+
+            # Fisrt do the incident energy 1d interpolation
+            # Find our interpolated incident energy
+            # default: 20 points for 1 eV, or an adaptive grid following the measured steps (see energy_grid())
+            measured = [self.scan_column(n, 'arr_hdh_ene') for n in scanList] if np.ndim(interp_npt_1eV) else None
+            incident_Energy_interp = energy_grid(incident_Energy_min, incident_Energy_max, interp_npt_1eV, measured)
+            span.size = incident_Energy_interp.size
+        # Load all the scans as one stack and interpolate them all at once (see interp_stack())
+        # XANES_inten_array has the shape (scan total numbers, incident_Energy_interp_npt)
+        # The points outside of the incident energy range of a scan are NaN
+        with self.span('normalize') as span:
+            energy_stack, inten_stack, offsets = self.scan_stack(scanList, channel)
+            span.size = inten_stack.size
+        with self.span('incident_interp') as span:
+            XANES_inten_array = interp_stack(energy_stack, inten_stack, offsets, incident_Energy_interp, fill_value = np.nan)
+            span.size = XANES_inten_array.size
+
+        with self.span('merge'):
+            if method == 'average':
+                # To average all the intensities for different scans, we ignore the nan data
+                XANES_merge_inten = np.nanmean(XANES_inten_array, axis = 0)
+            elif method == 'sum':
+                # To average all the intensities for different scans, we ignore the nan data
+                XANES_merge_inten = np.nansum(XANES_inten_array, axis = 0)
 
         # Put incident energy and merged intensity into XANES data array
         dataArray_XANES = np.array([incident_Energy_interp, XANES_merge_inten]) 
@@ -228,8 +2201,66 @@ class DataAnalysis(object):
         
         return dataArray_XANES
     
+    def XANES_live(self, firstScan, lastScan = None, skipScan = [], energy_range = None, 
+                   interp_npt_1eV = 20, method = 'average', channel = 'det_dtc', hold_last = False):
+        """
+        Live XANES average while the SPEC file is still being written (e.g, during the beamtime)
+        Each update only reads and interpolates the scans appended since the previous update
+
+        Parameters
+        ----------
+        firstScan : the index of first scan, e.g, 71 corresponding to fscan '72.1'
+        lastScan : the index of last scan, default None -----> all the following scans
+        skipScan : the problematic scans that you want to skip
+        energy_range: (e1, e2) the incident energy range in eV of the common energy axis
+                      default None -----> the energy range of firstScan
+        interp_npt_1eV : the number of interpolation points for 1 eV, default: 20 points for 1 eV
+        method : 'average' or 'sum' for intensity
+        channel : 'det_dtc' for HERFD-XAS, 'IF2' for conventional XAS
+        hold_last: default False -----> the last scan of the file is used as it is, and folded again
+                                        at the next updates while it grows (it may still be measured)
+                   True -----> the last scan of the file is only used once the next scan started 
+        Returns
+        -------
+        out : LiveXANES object, already updated with the scans in the file
+              live.update() -----> fold the newly appended (or grown) scans, return their number
+              live.data() -----> the current data ndarray [incident_Energy_interp, XANES_merge_inten]
+        """
+        live = LiveXANES(self, firstScan, lastScan, skipScan, energy_range, interp_npt_1eV, 
+                         method, channel, hold_last)
+        live.update()
+        return live
+
+    def RIXS_live(self, firstScan, lastScan = None, skipScan = [], energy_range = None, 
+                  interp_npt_1eV = 20, hold_last = False):
+        """
+        Live RIXS plane while the SPEC file is still being written (e.g, during the beamtime)
+        Each update only reads and interpolates the emission energy scans appended since the previous update
+        No concentration correction (the correction scan is measured after the map)
+
+        Parameters
+        ----------
+        firstScan : the index of first scan, e.g, 71 corresponding to fscan '72.1'
+        lastScan : the index of last scan, default None -----> all the following scans
+        skipScan : the problematic scans that you want to skip
+        energy_range: (e1, e2) the incident energy range in eV, default None -----> the energy range of firstScan
+        interp_npt_1eV : the number of interpolation points for 1 eV, default: 20 points for 1 eV
+        hold_last: default False -----> the last scan of the file is used as it is, and folded again
+                                        at the next updates while it grows (it may still be measured)
+                   True -----> the last scan of the file is only used once the next scan started 
+        Returns
+        -------
+        out : LiveRIXS object, already updated with the scans in the file
+              live.update() -----> fold the newly appended (or grown) scans, return their number
+              live.data(choice = 'EE', unit = 'eV') -----> the current RIXS data ndarray, as RIXS_data
+        """
+        live = LiveRIXS(self, firstScan, lastScan, skipScan, energy_range, interp_npt_1eV, 'det_dtc', hold_last)
+        live.update()
+        return live
+
+    @timed
     def Radiation_damage(self, firstScan, lastScan, scanStep, interp_npt_1eV = 20, 
-                         method = 'average', savetxt = False, channel = 'det_dtc'):
+                         method = 'average', savetxt = False, channel = 'det_dtc', executor = None):
         """
         To get XANES merged data ndarray for Radiation damage test
         The incident energy for scans can be different
@@ -241,8 +2272,12 @@ class DataAnalysis(object):
         scanStep : the step for radiation damage
         interp_npt_1eV : the number of interpolation points for 1 eV, default: 20 points for 1 eV
                          e.g, Incident Energy: 6535 eV - 6545 eV, 11 eV, 115 points, -----> 220 points
+                         (min_npt_1eV, max_npt_1eV) -----> adaptive grid following the measured energy steps,
+                         between min_npt_1eV and max_npt_1eV points for 1 eV (see adaptive_grid())
         method : 'average' or 'sum' for intensity
         channel : 'det_dtc' for HERFD-XAS, 'IF2' for conventional XAS
+        executor: default None, read the scans one after the other
+                  'thread', 'process' or a concurrent.futures executor -----> read the scans in parallel
         Returns
         -------
         out : A 1d data ndarray [incident_Energy_interp, XANES_merge_inten]
@@ -250,63 +2285,54 @@ class DataAnalysis(object):
               XANES_merge_inten -----> interpolated intensity
         """
         
-        # Each scan has different incident energy points
-        # this step finds the highest incident energy corresponding scan
-        #             and the lowest incident energy corresponding scan
-        energy_checkmin_list = []
-        energy_checkmax_list = []
-        for n in range(firstScan, lastScan + 1): 
-            IE_min_check = self.sf[n].data_column_by_name('arr_hdh_ene')[0]        
-            IE_max_check = self.sf[n].data_column_by_name('arr_hdh_ene')[-1]
-            energy_checkmin_list.append(IE_min_check)
-            energy_checkmax_list.append(IE_max_check)
-        energy_min_index = energy_checkmin_list.index(min(energy_checkmin_list)) + firstScan
-        energy_max_index = energy_checkmax_list.index(max(energy_checkmax_list)) + firstScan
-
-        # Find the energy span of incident energy (For later interpolation)
-        # e.g, incident energy range : 4.987654 KeV - 4.987987 KeV
-        # will be approximated as 4.9878 KeV for minimum incident Energy 
-        #                         4.9879 KeV for maxmum incident Energy
-        # I do in such a way to ensure the interpolation points lie always inside the experimental incident energy range
-        # 4.9878 > 4.987654 while 4.9879 < 4.987987
-        incident_Energy_min = round(self.sf[energy_min_index].data_column_by_name('arr_hdh_ene')[0]*10000+1)/10000
-        incident_Energy_max = round(self.sf[energy_max_index].data_column_by_name('arr_hdh_ene')[-1]*10000-1)/10000
-
-        # Find the energy span of incident energy
-        incident_Energy_Span = incident_Energy_max - incident_Energy_min
-
-        # Define the total points of interpolation for incident energy
-        # default: 20 points for 1 eV
-        incident_Energy_interp_npt = int(round(incident_Energy_Span*1000) * interp_npt_1eV)
-
-        # Fisrt do the incident energy 1d interpolation
-        # Creat empty arrays filled with NaN for different XANES scans 
-        # which has the shape (scan total numbers, incident_Energy_interp_npt)
-        XANES_inten_array = np.zeros(((lastScan - firstScan + 1,incident_Energy_interp_npt))) 
-        XANES_inten_array[:] = np.nan
-
-        # We then fill the empty array with interpolated concentration corrected intensity
-        # Use scipy.interpolate.interp1d to interpolate the points
-        for n in range(firstScan, lastScan + 1, scanStep):
-            incident_Energy = self.sf[n].data_column_by_name('arr_hdh_ene')
-            # corresponding intensity
-            inten = self.sf[n].data_column_by_name(channel)/self.sf[n].data_column_by_name('I02') # Normalized to I02
-            # Define our interp1d function for incident energy, fill the outbound value with 0
-            f_interp = interp.interp1d(incident_Energy, inten, bounds_error = False)
-            # Find our interpolated incident energy and corresponding intensity
-            incident_Energy_interp = np.linspace(incident_Energy_min, incident_Energy_max, incident_Energy_interp_npt)
-            inten_interp = f_interp (incident_Energy_interp)
-            # Fill the empty array with the interpolated data
-            # Now we only interpolate in incident axis, not in emission axis
-            XANES_inten_array[n-firstScan,:] = inten_interp
+        # Read all the columns first (in parallel if asked), they are then served by the column cache
+        # Only the scans used for the average are read, the grid comes from the scan catalog
+        self.load_columns(range(firstScan, lastScan + 1, scanStep), ('arr_hdh_ene', channel, 'I02'), executor)
+
+        with self.span('grid') as span:
+            # Each scan has different incident energy points
+            # this step finds the highest incident energy corresponding scan
+            #             and the lowest incident energy corresponding scan
+            catalog = self.catalog(range(firstScan, lastScan + 1))
+            energy_checkmin_list = catalog.incident_first[firstScan:lastScan + 1]
+            energy_checkmax_list = catalog.incident_last[firstScan:lastScan + 1]
+
+            # Find the energy span of incident energy (For later interpolation)
+            # e.g, incident energy range : 4.987654 KeV - 4.987987 KeV
+            # will be approximated as 4.9878 KeV for minimum incident Energy 
+            #                         4.9879 KeV for maxmum incident Energy
+            # I do in such a way to ensure the interpolation points lie always inside the experimental incident energy range
+            # 4.9878 > 4.987654 while 4.9879 < 4.987987
+            incident_Energy_min = round(np.nanmin(energy_checkmin_list)*10000+1)/10000
+            incident_Energy_max = round(np.nanmax(energy_checkmax_list)*10000-1)/10000
+
+            # Fisrt do the incident energy 1d interpolation
+            # Find our interpolated incident energy
+            # default: 20 points for 1 eV, or an adaptive grid following the measured steps (see energy_grid())
+            measured = ([self.scan_column(n, 'arr_hdh_ene') for n in range(firstScan, lastScan + 1, scanStep)] 
+                        if np.ndim(interp_npt_1eV) else None)
+            incident_Energy_interp = energy_grid(incident_Energy_min, incident_Energy_max, interp_npt_1eV, measured)
+            span.size = incident_Energy_interp.size
+        # Only every scanStep scan is used for the radiation damage average
+        scanList = list(range(firstScan, lastScan + 1, scanStep))
+        for n in scanList:
             print('adding the'+ str(n)+ ' scan')
+        # Load the scans as one stack and interpolate them all at once (see interp_stack())
+        # XANES_inten_array has the shape (scanList length, incident_Energy_interp_npt)
+        with self.span('normalize') as span:
+            energy_stack, inten_stack, offsets = self.scan_stack(scanList, channel)
+            span.size = inten_stack.size
+        with self.span('incident_interp') as span:
+            XANES_inten_array = interp_stack(energy_stack, inten_stack, offsets, incident_Energy_interp, fill_value = np.nan)
+            span.size = XANES_inten_array.size
 
-        if method == 'average':
-            # To average all the intensities for different scans, we ignore the nan data
-            XANES_merge_inten = np.nanmean(XANES_inten_array, axis = 0)
-        elif method == 'sum':
-            # To average all the intensities for different scans, we ignore the nan data
-            XANES_merge_inten = np.nansum(XANES_inten_array, axis = 0)
+        with self.span('merge'):
+            if method == 'average':
+                # To average all the intensities for different scans, we ignore the nan data
+                XANES_merge_inten = np.nanmean(XANES_inten_array, axis = 0)
+            elif method == 'sum':
+                # To average all the intensities for different scans, we ignore the nan data
+                XANES_merge_inten = np.nansum(XANES_inten_array, axis = 0)
 
         # Put incident energy and merged intensity into XANES data array
         dataArray_XANES = np.array([incident_Energy_interp, XANES_merge_inten]) 
@@ -317,6 +2343,101 @@ class DataAnalysis(object):
         return dataArray_XANES
     
 
+    @timed
+    def Radiation_damage_series(self, firstScan, lastScan, steps = (), windows = (), cumulative = False, 
+                                interp_npt_1eV = 20, method = 'average', channel = 'det_dtc', executor = None):
+        """
+        Dose series for radiation damage tests: many groupings of the same scans in one pass
+        The scans are read and interpolated once, then all the groupings are computed from prefix sums
+        along the scans (instead of calling Radiation_damage() once per scanStep)
+
+        Parameters
+        ----------
+        firstScan : the index of first scan, e.g, 71 corresponding to fscan '72.1'
+        lastScan : the index of last scan
+        steps : strided subsets, e.g, [2, 3] or [(2, 0), (2, 1)] -----> (scanStep, offset)
+                (scanStep, 0) is the average of Radiation_damage(firstScan, lastScan, scanStep)
+        windows : sliding windows of k consecutive scans, e.g, [5] -----> scans 0-4, 1-5, 2-6, ...
+        cumulative : default False, True -----> average of the first 1, 2, 3, ... scans
+        interp_npt_1eV : the number of interpolation points for 1 eV, default: 20 points for 1 eV
+                         (min_npt_1eV, max_npt_1eV) -----> adaptive grid, see XANES_data()
+        method : 'average' or 'sum' for intensity
+        channel : 'det_dtc' for HERFD-XAS, 'IF2' for conventional XAS
+        executor: default None, read the scans one after the other
+                  'thread', 'process' or a concurrent.futures executor -----> read the scans in parallel
+        Returns
+        -------
+        out : (dataArray, groupList)
+              dataArray -----> 2d ndarray [incident_Energy_interp, group 1 intensity, group 2 intensity, ...]
+              groupList -----> description of each intensity row
+                               ('step', scanStep, offset), ('window', k, first scan of the window)
+                               or ('cumulative', last scan)
+        """
+        scanList = list(range(firstScan, lastScan + 1))
+        self.load_columns(scanList, ('arr_hdh_ene', channel, 'I02'), executor)
+
+        with self.span('grid') as span:
+            # Same incident energy grid as Radiation_damage(), from the scan catalog
+            catalog = self.catalog(range(firstScan, lastScan + 1))
+            incident_Energy_min = round(np.nanmin(catalog.incident_first[firstScan:lastScan + 1])*10000+1)/10000
+            incident_Energy_max = round(np.nanmax(catalog.incident_last[firstScan:lastScan + 1])*10000-1)/10000
+            measured = [self.scan_column(n, 'arr_hdh_ene') for n in scanList] if np.ndim(interp_npt_1eV) else None
+            incident_Energy_interp = energy_grid(incident_Energy_min, incident_Energy_max, interp_npt_1eV, measured)
+            span.size = incident_Energy_interp.size
+        with self.span('normalize') as span:
+            energy_stack, inten_stack, offsets = self.scan_stack(scanList, channel)
+            span.size = inten_stack.size
+        with self.span('incident_interp') as span:
+            XANES_inten_array = interp_stack(energy_stack, inten_stack, offsets, incident_Energy_interp, fill_value = np.nan)
+            span.size = XANES_inten_array.size
+
+        with self.span('merge') as span:
+            # NaN (outside of the energy range of a scan) is ignored, as in Radiation_damage()
+            measured = ~np.isnan(XANES_inten_array)
+            values = np.where(measured, XANES_inten_array, 0)
+            # Prefix sums along the scans: the sum of the scans i to j-1 is inten_prefix[j] - inten_prefix[i]
+            inten_prefix = np.zeros((len(scanList) + 1, incident_Energy_interp.size))
+            np.cumsum(values, axis = 0, out = inten_prefix[1:])
+            count_prefix = np.zeros((len(scanList) + 1, incident_Energy_interp.size), dtype = int)
+            np.cumsum(measured, axis = 0, out = count_prefix[1:])
+
+            inten_rows = []
+            count_rows = []
+            groupList = []
+            for step in steps:
+                scanStep, offset = (step, 0) if np.ndim(step) == 0 else step
+                # Strided subset: summed directly (one view of the interpolated scans)
+                inten_rows.append(values[offset::scanStep].sum(axis = 0)[np.newaxis])
+                count_rows.append(measured[offset::scanStep].sum(axis = 0)[np.newaxis])
+                groupList.append(('step', scanStep, offset))
+            for k in windows:
+                starts = np.arange(0, len(scanList) - k + 1)
+                inten_rows.append(inten_prefix[starts + k] - inten_prefix[starts])
+                count_rows.append(count_prefix[starts + k] - count_prefix[starts])
+                groupList.extend(('window', k, firstScan + int(start)) for start in starts)
+            if cumulative:
+                inten_rows.append(inten_prefix[1:])
+                count_rows.append(count_prefix[1:])
+                groupList.extend(('cumulative', n) for n in scanList)
+
+            if inten_rows:
+                inten_sum = np.concatenate(inten_rows)
+                inten_count = np.concatenate(count_rows)
+            else:
+                inten_sum = np.zeros((0, incident_Energy_interp.size))
+                inten_count = np.zeros((0, incident_Energy_interp.size), dtype = int)
+            if method == 'average':
+                with np.errstate(invalid = 'ignore', divide = 'ignore'):
+                    XANES_series = np.where(inten_count > 0, inten_sum / inten_count, np.nan)
+            elif method == 'sum':
+                XANES_series = inten_sum
+            span.size = XANES_series.size
+
+        # Put incident energy and the intensity of each group into one data array
+        dataArray_series = np.vstack([incident_Energy_interp, XANES_series])
+        return dataArray_series, groupList
+
+    @timed
     def XANES_normalize(self, XANES_data, normalized_starting_energy = None):
         """
         Normalize XANES to area into unity(whole area or specified tail area)
@@ -335,14 +2456,19 @@ class DataAnalysis(object):
             normalized_starting_energy = XANES_data[0][0] * 1000
         postedge_index = np.where(XANES_data[0] >= normalized_starting_energy/1000)
         postedge_intensity = XANES_data[1][postedge_index[0]]
-        # Calculate the tail edge area
-        tail_edge_area = np.trapz(postedge_intensity, dx=1)
+        # Calculate the tail edge area (in points, see point_axis() for the non-uniform grids)
+        points = point_axis(XANES_data[0])
+        if points is None:
+            tail_edge_area = trapezoid(postedge_intensity, dx=1)
+        else:
+            tail_edge_area = trapezoid(postedge_intensity, x = points[postedge_index[0]])
         # Normalization to the whole area
         norm_intensity = XANES_data[1]/tail_edge_area
         norm_dataArray = np.array([XANES_data[0],norm_intensity])
         return norm_dataArray
     
-    def XANES_area(self, XANES_data, energy_range):
+    @timed
+    def XANES_area(self, XANES_data, energy_range, verbose = True):
         """
         Calculate XANES area
         Parameters
@@ -351,21 +2477,47 @@ class DataAnalysis(object):
         energy_range: (e1, e2)
                   e1: The starting energy for calculating the area, in eV
                   e2: The ending energy for calculating the area, in eV
+        verbose: default True, print the area (False -----> silent, e.g, for many areas see XANES_area_index())
         Returns
         -------
-        out : XANES_area, dtype = float
+        out : XANES_area, dtype = float, in points (dx = 1), in 0.05 eV steps on a non-uniform grid 
+              (see point_axis())
 
         """
         # Calculate pre-edge area
         edge_area_index = np.where((XANES_data[0] >= energy_range[0]/1000) & (XANES_data[0] <= energy_range[1]/1000))
         edge_area_intensity = XANES_data[1][edge_area_index[0]]
-        # Calculate the tail edge area
-        edge_area = np.trapz(edge_area_intensity, dx=1)
-        print('The edge area from %d eV to %d eV is :'%(energy_range[0], energy_range[1]) + str(edge_area) )
+        # Calculate the tail edge area (in points, see point_axis() for the non-uniform grids)
+        points = point_axis(XANES_data[0])
+        if points is None:
+            edge_area = trapezoid(edge_area_intensity, dx=1)
+        else:
+            edge_area = trapezoid(edge_area_intensity, x = points[edge_area_index[0]])
+        if verbose:
+            print('The edge area from %d eV to %d eV is :'%(energy_range[0], energy_range[1]) + str(edge_area) )
         return edge_area
     
+    @timed
+    def XANES_area_index(self, XANES_stack):
+        """
+        Cumulative trapezoid index of many XANES spectra on a common grid, for many areas and normalizations
+        Parameters
+        ----------
+        XANES_stack : data ndarray [incident energy, intensity 1, intensity 2, ...]
+
+        Returns
+        -------
+        out : XANESAreaIndex
+              .area([(e1, e2), (e3, e4), ...]) -----> areas ndarray (spectra, energy windows), as XANES_area()
+              .normalize(normalized_starting_energy) -----> normalized stack, as XANES_normalize()
+        """
+        with self.span('area_index') as span:
+            area_index = XANESAreaIndex(XANES_stack)
+            span.size = area_index.cumulative.size
+        return area_index
     
-    def XANES_find_peaks(self, XANES_data, energy_range = None, accuracy = (3,30), plot = True):
+    @timed
+    def XANES_find_peaks(self, XANES_data, energy_range = None, accuracy = (3,30), plot = False):
         """
         Find XANES peaks
         Parameters
@@ -375,6 +2527,7 @@ class DataAnalysis(object):
         An energy number, e.g, Incident Energy: 6600 eV, 
                                                 -----> will do normalization from 6600 eV to the end of tail feature
                                       Not difine-----> Normalization to the whole area
+        plot: default False -----> no plotting (matplotlib is not imported), True -----> plot the peaks
         Returns
         -------
         out : A data ndarray of the maxima [peak_energy, peak_intensity]
@@ -382,12 +2535,13 @@ class DataAnalysis(object):
         """
         # Define the width of peaks that we want to detect
         peak_detect_width = np.arange(accuracy[0],accuracy[1])
-        # Find peaks for the whole XANES_data range
-        peak_index = signal.find_peaks_cwt(XANES_data[1],np.arange(accuracy[0],accuracy[1]))
+        # Find peaks for the whole XANES_data range (same peaks as scipy find_peaks_cwt, see cwt_peak_indexes())
+        peak_index = cwt_peak_indexes(XANES_data[1],np.arange(accuracy[0],accuracy[1]))[0]
         peak_dataList = np.array([XANES_data[0][peak_index],XANES_data[1][peak_index]])
         if energy_range == None:
             # plot the figures
             if plot == True:
+                import matplotlib.pyplot as plt
                 plt.plot(XANES_data[0]*1000,XANES_data[1])
                 plt.scatter(peak_dataList[0]*1000,peak_dataList[1],c='r')
                 plt.xlabel('Energy [eV]')
@@ -403,6 +2557,7 @@ class DataAnalysis(object):
 
             # plot the figures
             if plot == True:
+                import matplotlib.pyplot as plt
                 plt.plot(XANES_data[0]*1000,XANES_data[1])
                 plt.scatter(peak_dataList[0]*1000,peak_dataList[1],c='r')
                 plt.xlim(e1,e2)
@@ -412,8 +2567,31 @@ class DataAnalysis(object):
                 plt.show()
             return range_peak_dataList
 
+    @timed
+    def XANES_find_peaks_batch(self, XANES_stack, energy_range = None, accuracy = (3,30), detector = 'cwt', 
+                               prominence = None):
+        """
+        Find the peaks of many XANES spectra on a common incident energy grid, without plotting
+        (see find_peaks_batch())
+        Parameters
+        ----------
+        XANES_stack : data ndarray [incident energy, intensity 1, intensity 2, ...]
+        energy_range : default None -----> whole energy range, otherwise (e1, e2) in eV
+        accuracy : the widths of the peaks (in points) detected by the wavelet transform
+        detector : 'cwt'(default) -----> same peaks as XANES_find_peaks()
+                   'prominence' -----> local maxima with a minimum prominence, much faster
+        prominence : the minimum prominence of the 'prominence' detector, default: 5 % of the intensity range
+
+        Returns
+        -------
+        out : (peak_energy, peak_intensity, offsets), the peaks of spectrum k are [offsets[k]:offsets[k+1]]
+        """
+        return find_peaks_batch(XANES_stack, energy_range, accuracy, detector, prominence)
+
+    @timed
     def RIXS_data(self,firstScan, lastScan, concCorrecScan = False, interp_npt_1eV = 20, 
-                  choice = 'EE', savetxt = False, unit = 'eV'):
+                  choice = 'EE', savetxt = False, unit = 'eV', interp_kind = 'linear', executor = None, 
+                  float32 = False, archive = None, memory_MB = None, out = None):
         """
         To get RIXS data ndarray from SPEC file
 
@@ -425,225 +2603,440 @@ class DataAnalysis(object):
         interp_npt_1eV : the number of interpolation points for 1 eV, default: 20 points for 1 eV
                          e.g, Incident Energy: 6535 eV - 6545 eV, 11 eV, 115 points, -----> 220 points
                               Emitted  Energy: 5890 eV - 5905 eV, 15 eV, 76  points, -----> 300 points
+                         (min_npt_1eV, max_npt_1eV) -----> adaptive grids following the measured incident energy
+                         steps and emission energies, between min_npt_1eV and max_npt_1eV points for 1 eV
         choice : 'EE': get -----> incident energy & emission energy plotting
                  'ET': get -----> energy transfer & emission energy plotting
-        savetxt: default True, save the ET, EE data as folders
+        savetxt: default False, True -----> save the EE and ET planes as text files into the
+                 Emission_Energy and Energy_Transfer folders next to the SPEC file
+                 (see saveFile(), matrix with the incident energy as first row)
         unit: Energy unit -----> 'eV' or 'KeV', default is 'eV' (in original Specfiles are in KeV)
+        interp_kind: 'linear'(default) or 'cubic' interpolation along the emission energy axis
+        executor: default None, read the scans one after the other
+                  'thread', 'process' or a concurrent.futures executor -----> read the scans in parallel
+        float32: default False, True -----> keep the intensity as float32 to halve the memory
+        archive: default None, otherwise a RIXSArchive or a HDF5 file path where the plane is archived
+                 with its processing parameters, under the name '<SPEC file name>_<firstScan>_<lastScan>_<choice>'
+        memory_MB: default None -----> the plane is computed in memory
+                   otherwise tiled mode for very fine grids: the emission energy interpolation and the ET remap
+                   are done by tiles of incident energy columns, written into out, using about memory_MB of RAM
+                   (the plane cache and savetxt are not used)
+        out: the output of the tiled mode
+             default None -----> the archive if there is one, otherwise a temporary .npy file in the
+                                 temporary directory (tempfile.gettempdir()), removed when the plane 
+                                 and all the arrays taken from its intensity are released
+             a '.npy' file path -----> the plane intensity is a read only memory-mapped array
+             a RIXSArchive or a '.h5' file path -----> the plane is returned as an ArchivedPlane
         Returns
         -------
+        RIXSPlane, which can be used as the former data ndarray [XX, YY, intensity]
+        (plane.incident, plane.emission: 1d axes, plane.intensity: 2d intensity)
         if choice = 'EE'
-        out : ndarray, A data list [EE_XX, EE_YY, EE_MDfci_correc_inten_2dinterp]
+        out : RIXSPlane, A data list [EE_XX, EE_YY, EE_MDfci_correc_inten_2dinterp]
               EE_XX -----> interpolated incident energy ndarray
               EE_YY -----> interpolated emission energy ndarray
               EE_MDfci_correc_inten_2dinterp -----> interpolated intensity ndarray
 
         if choice = 'ET'
-        out : ndarray, A data list [ET_XX, ET_YY, ET_MDfci_correc_inten_2dinterp]
+        out : RIXSPlane, A data list [ET_XX, ET_YY, ET_MDfci_correc_inten_2dinterp]
               ET_XX -----> interpolated incident energy ndarray
               ET_YY -----> interpolated energy transfer ndarray
               ET_MDfci_correc_inten_2dinterp -----> interpolated intensity ndarray
     """
 
-        # Extract emission energy from SPEC file
-        emission_Energy = np.array([self.sf[i].data_column_by_name('xes_en')[1] for i in range(firstScan,(lastScan+1))])    
-
-        # Find the energy span of incident energy
-        incident_Energy_min = round(self.sf[firstScan].data_column_by_name('arr_hdh_ene')[0]*10000+1)/10000
-        incident_Energy_max = round(self.sf[firstScan].data_column_by_name('arr_hdh_ene')[-1]*10000-1)/10000
-
-        # and emitted energy
-        emission_Energy_min = round(self.sf[firstScan].data_column_by_name('xes_en')[0]*10000+1)/10000
-        emission_Energy_max = round(self.sf[lastScan].data_column_by_name('xes_en')[0]*10000-1)/10000
-
-        # Find the energy span of incident energy
-        incident_Energy_Span = incident_Energy_max - incident_Energy_min
-        # And emitted energy
-        emission_Energy_Span = emission_Energy_max - emission_Energy_min
-
-        # Define the total points of interpolation for incident energy
-        incident_Energy_interp_npt = int(round(incident_Energy_Span*1000)*interp_npt_1eV)
-        # And emission energy
-        emission_Energy_interp_npt = int(round(emission_Energy_Span*1000)*interp_npt_1eV)
-        if concCorrecScan != False:
-            # Collect concentration correction intensity into an array
-            concCorrec_inten = self.sf[concCorrecScan].data_column_by_name('det_dtc')/self.sf[concCorrecScan].data_column_by_name('I02') # Normalized to I02
-
-        # Fisrt do the incident energy 1d interpolation
-        # Creat empty arrays filled with 0 for RIXS intensity 
-        # which has the shape (emission Energy (scan total numbers), incident_Energy_interp_npt)
-        MDfci_correc_inten = np.zeros(((len(emission_Energy),incident_Energy_interp_npt)))        
-        # We then fill the empty array with interpolated concentration corrected intensity
-        # Use scipy.interpolate.interp1d to interpolate the points
-        for n in range(firstScan, lastScan + 1):
-            incident_Energy = self.sf[n].data_column_by_name('arr_hdh_ene')
-            if concCorrecScan == False:
-                # don't do concentration correction for intensity
-                correc_inten = self.sf[n].data_column_by_name('det_dtc')/(self.sf[n].data_column_by_name('I02'))
+        # Look for the same plane in the persistent plane cache first
+        plane_params = {'firstScan': firstScan, 'lastScan': lastScan, 'concCorrecScan': concCorrecScan, 
+                        'interp_npt_1eV': interp_npt_1eV, 'choice': choice, 'unit': unit, 
+                        'interp_kind': interp_kind, 'float32': float32}
+        archive_name = '%s_%d_%d_%s' % (os.path.basename(self.path), firstScan, lastScan, choice)
+        if memory_MB is not None and savetxt == True:
+            raise ValueError('savetxt is not available in the tiled mode (memory_MB), see saveFile()')
+        if savetxt == False and memory_MB is None:
+            dataArray = self.cached_plane('RIXS_data', plane_params)
+            if dataArray is not None:
+                if archive is not None:
+                    self.archive_plane(archive, archive_name, dataArray, plane_params)
+                return dataArray
+
+        # Read all the columns first (in parallel if asked), they are then served by the column cache
+        # (the emission energies come from the scan catalog, the xes_en columns are not read)
+        self.load_columns(range(firstScan, lastScan + 1), ('arr_hdh_ene', 'det_dtc', 'I02'), executor)
+
+        with self.span('grid'):
+            catalog = self.catalog(range(firstScan, lastScan + 1))
+            # Extract emission energy from SPEC file
+            emission_Energy = catalog.emission[firstScan:lastScan + 1].copy()
+
+            # Find the energy span of incident energy
+            incident_Energy_min = round(catalog.incident_first[firstScan]*10000+1)/10000
+            incident_Energy_max = round(catalog.incident_last[firstScan]*10000-1)/10000
+
+            # and emitted energy
+            emission_Energy_min = round(catalog.emission_first[firstScan]*10000+1)/10000
+            emission_Energy_max = round(catalog.emission_first[lastScan]*10000-1)/10000
+
+            # Define our interpolated incident energy and emission energy
+            # interp_npt_1eV points for 1 eV, or adaptive grids following the measured incident energy steps
+            # and the emission energies of the scans (see energy_grid())
+            measured = ([self.scan_column(n, 'arr_hdh_ene') for n in range(firstScan, lastScan + 1)] 
+                        if np.ndim(interp_npt_1eV) else None)
+            incident_Energy_interp = energy_grid(incident_Energy_min, incident_Energy_max, interp_npt_1eV, measured)
+            emission_Energy_interp = energy_grid(emission_Energy_min, emission_Energy_max, interp_npt_1eV, 
+                                                 [emission_Energy])
+            # Both axes are marked on the plane, they are integrated against their energies (see point_axis())
+            adaptive = (np.ndim(interp_npt_1eV) > 0,)*2
+        with self.span('normalize') as span:
+            if concCorrecScan != False:
+                # Collect concentration correction intensity into an array
+                concCorrec_inten = self.scan_column(concCorrecScan, 'det_dtc')/self.scan_column(concCorrecScan, 'I02') # Normalized to I02
+
             else:
-                # To do concentration correction for intensity
-                correc_inten = self.sf[n].data_column_by_name('det_dtc')/(self.sf[n].data_column_by_name('I02')*concCorrec_inten[n-firstScan]) #Normalized to I02
-            # Define our interp1d function for incident energy, fill the outbound value with 0
-            f_interp = interp.interp1d(incident_Energy, correc_inten, bounds_error = False, fill_value = 0)
-            # Find our interpolated incident energy and corresponding intensity
-            incident_Energy_interp = np.linspace(incident_Energy_min, incident_Energy_max, incident_Energy_interp_npt)
-            correc_inten_interp = f_interp (incident_Energy_interp)
-            # Fill the empty array with the interpolated data
-            # Now we only interpolate in incident axis, not in emission axis
-            MDfci_correc_inten[n-firstScan,:] = correc_inten_interp
+                # don't do concentration correction for intensity
+                concCorrec_inten = None
 
-        # After doing 1D interpolation for incident energy
-        # Now we are going to do 2D interpolation for emission energy, using scipy.interpolate.interp2d
-        # Define our interp2d function
-        f_interp2d = interp.interp2d(incident_Energy_interp, emission_Energy, MDfci_correc_inten)
-        # Define our new emission energy
-        emission_Energy_interp = np.linspace(emission_Energy_min, emission_Energy_max, emission_Energy_interp_npt)
-        # Get interpolated new intensity array (emission energy interpolated)
-        EE_MDfci_correc_inten_2dinterp = f_interp2d(incident_Energy_interp, emission_Energy_interp)
+            # Fisrt do the incident energy 1d interpolation
+            # Load all the scans as one concentration corrected stack and interpolate them all at once
+            # MDfci_correc_inten has the shape (emission Energy (scan total numbers), incident_Energy_interp_npt)
+            # The points outside of the incident energy range of a scan are filled with 0
+            scanList = list(range(firstScan, lastScan + 1))
+            energy_stack, correc_inten_stack, offsets = self.scan_stack(scanList, 'det_dtc', concCorrec_inten)
+            span.size = correc_inten_stack.size
+        with self.span('incident_interp') as span:
+            MDfci_correc_inten = interp_stack(energy_stack, correc_inten_stack, offsets, incident_Energy_interp, fill_value = 0)
+            span.size = MDfci_correc_inten.size
+
+        if memory_MB is not None:
+            # Tiled mode, only the interpolated scans and one tile of the plane are in memory
+            return self.tiled_plane(incident_Energy_interp, emission_Energy, MDfci_correc_inten, emission_Energy_interp,
+                                    choice, unit, interp_kind, np.float32 if float32 else float, memory_MB, 
+                                    out if out is not None else archive, archive_name, plane_params, adaptive)
 
-        # Define Grids, EE_XX: incident energy array, EE_YY: emission energy array
-        EE_XX, EE_YY = np.meshgrid(incident_Energy_interp, emission_Energy_interp)
+        # After doing 1D interpolation for incident energy
+        # Now we are going to interpolate along emission energy
+        # The incident energy axis is already the final one, so all the incident energy columns 
+        # are interpolated along the emission energy axis at once (see resample_axis())
+        with self.span('emission_interp') as span:
+            # Get interpolated new intensity array (emission energy interpolated)
+            EE_MDfci_correc_inten_2dinterp = resample_axis(emission_Energy, MDfci_correc_inten, emission_Energy_interp,
+                                                           axis = 0, kind = interp_kind)
 
-        # Put all the data into a list
-        dataArray_EE = np.array([EE_XX, EE_YY, EE_MDfci_correc_inten_2dinterp])
+            # Put all the data into a RIXS plane, the incident and emission energy axes are kept 1d
+            dataArray_EE = RIXSPlane(incident_Energy_interp, emission_Energy_interp, EE_MDfci_correc_inten_2dinterp, 
+                                     choice = 'EE', unit = 'KeV', dtype = np.float32 if float32 else None, 
+                                     adaptive = adaptive)
+            span.size = EE_MDfci_correc_inten_2dinterp.size
 
         # -------------- RIXS Energy Transfer - Incident Energy plotting 
-        # When it comes to ET, the length of new y axis(energy transfer) change
-        energy_transfer_min = min(EE_XX[0,:])-max(EE_YY[:,0])
-        energy_transfer_max = max(EE_XX[0,:])-min(EE_YY[:,0])  
-        energy_transfer_length = sum(EE_XX.shape)-1
-        # Define our energy transfer axis
-        energy_transfer = np.linspace(energy_transfer_min,energy_transfer_max,energy_transfer_length)
-
-        # Define our new intensity empty array: ET_MDfci_correc_inten_2dinterp
-        # And the new empty array has a shape of (sum(EE_XX.shape)-1, EE_XX.shape[1])
-        ET_MDfci_correc_inten_2dinterp = np.zeros((energy_transfer_length, EE_XX.shape[1]))
-        # Make all the numbers into NaN
-        ET_MDfci_correc_inten_2dinterp[:] = np.nan
-        offset = (EE_YY.shape[0]-1,0)
-
-    #     #---------------- AFFINE TRANSFORM METHOD ----------------
-    #     # We want new_y = x-y, new_x = x
-    #     # Thus we need the transform matrix : [-1,1]
-    #     #                                     [0, 1]
-    #     transform_matrix = np.array([[-1,1],[0,1]])
-    #     ET_MDfci_correc_inten_2dinterp = nd.interpolation.affine_transform(EE_MDfci_correc_inten_2dinterp, transform_matrix, 
-    #                                                               output_shape = ET_MDfci_correc_inten_2dinterp.shape, offset = offset)
-
-        # Define ET Grids, ET_XX: incident energy array, ET_YY: energy transfer array
-        ET_XX, ET_YY = np.meshgrid(incident_Energy_interp, energy_transfer)
-
-        #---------------- LOOP METHOD ----------------
-        for j in range(EE_XX.shape[0]):
-            for i in range(EE_XX.shape[1]):
-                # Fill the new empty array with the EE intensity
-                ET_MDfci_correc_inten_2dinterp[i-j+offset[0],i] = EE_MDfci_correc_inten_2dinterp[j,i]
-
-
-        # Put all the data into a list
-        dataArray_ET = np.array([ET_XX, ET_YY, ET_MDfci_correc_inten_2dinterp])
+        # Remap the EE plane onto the energy transfer axis (see RIXS_EE_to_ET())
+        if choice == 'ET' or savetxt == True:
+            with self.span('ET_remap') as span:
+                dataArray_ET = RIXS_EE_to_ET(dataArray_EE)
+                span.size = dataArray_ET.intensity.size
 
         if savetxt == True:
             # Save file: Creat EE and ET folders in the compound file folder
-            EE_path = fileFolder + 'Emission_Energy'
-            ET_path = fileFolder + 'Energy_Transfer'
-            if not os.path.exists(EE_path):
-                os.makedirs(EE_path)
-                np.savetxt(EE_path + '_EE.txt', dataArray_EE, fmt = '%.10f')
-            if not os.path.exists(ET_path):
-                os.makedirs(ET_path)
-                np.savetxt(EE_path + '_ET.txt', dataArray_ET, fmt = '%.10f')
+            fileFolder = os.path.dirname(os.path.abspath(self.path))
+            fileName = '%s_%d_%d' % (os.path.basename(self.path), firstScan, lastScan)
+            for folderName, plane, suffix, axis_name in (('Emission_Energy', dataArray_EE, '_EE', 'emission energy'), 
+                                                         ('Energy_Transfer', dataArray_ET, '_ET', 'energy transfer')):
+                folderPath = os.path.join(fileFolder, folderName)
+                if not os.path.exists(folderPath):
+                    os.makedirs(folderPath)
+                header = 'first row: incident energy [%s], first column: %s [%s]' % (unit, axis_name, unit)
+                saveFile(plane.to_unit(unit), [header], folderPath, fileName + suffix, choice = 'RIXS', 
+                         number_format = '%.10f')
+
+        if choice == 'EE':
+            dataArray = dataArray_EE
+        elif choice == 'ET': 
+            dataArray = dataArray_ET
+        else:
+            return None
+        # Only the 1d axes are converted
+        with self.span('unit'):
+            dataArray = dataArray.to_unit(unit)
+        self.store_plane('RIXS_data', plane_params, dataArray)
+        if archive is not None:
+            self.archive_plane(archive, archive_name, dataArray, plane_params)
+        return dataArray
+        
+    def tiled_plane(self, incident_Energy_interp, emission_Energy, scan_intensity, emission_Energy_interp, 
+                    choice, unit, interp_kind, dtype, memory_MB, out, name, params, adaptive = (False, False)):
+        """
+        Emission energy interpolation (and ET remap) of a RIXS plane by tiles of incident energy columns,
+        written into a memory-mapped .npy file or a HDF5 archive, see RIXS_data(memory_MB = ...)
+        The columns of a RIXS plane are independent: a tile of the EE plane only needs the same columns 
+        of the interpolated scans, and gives the same columns of the ET plane
+
+        Parameters
+        ----------
+        incident_Energy_interp : the incident energy axis (KeV)
+        emission_Energy : the emission energy of each scan (KeV)
+        scan_intensity : the scans interpolated on the incident energy axis, (scans, incident energy)
+        emission_Energy_interp : the emission energy axis (KeV)
+        choice, unit, interp_kind : as RIXS_data()
+        dtype : the type of the intensity
+        memory_MB : the RAM budget of a tile
+        out : a '.npy' file path, a RIXSArchive or a '.h5' file path
+              None -----> temporary .npy file, removed when the plane is released (see temporary_memmap())
+        name, params : the name and the processing parameters of the plane in a RIXSArchive
+        adaptive : (incident, emission) True for an axis made by adaptive_grid() (see RIXSPlane)
+
+        Returns
+        -------
+        out : RIXSPlane (memory-mapped intensity) or ArchivedPlane
+        """
+        emission_npt = len(emission_Energy_interp)
+        incident_npt = len(incident_Energy_interp)
+        if choice == 'EE':
+            axis_values = emission_Energy_interp
+        elif choice == 'ET':
+            # Same energy transfer axis as RIXS_EE_to_ET()
+            axis_values = np.linspace(incident_Energy_interp.min() - emission_Energy_interp.max(), 
+                                      incident_Energy_interp.max() - emission_Energy_interp.min(), 
+                                      emission_npt + incident_npt - 1)
+            pixel_remap = same_step_axes(incident_Energy_interp, emission_Energy_interp)
+        else:
+            return None
+        scale = 1000. if unit == 'eV' else 1.
+        shape = (len(axis_values), incident_npt)
+        if choice == 'ET':
+            # The energy transfer axis comes from both axes (see RIXS_EE_to_ET())
+            adaptive = (adaptive[0], any(adaptive))
+
+        if out is None:
+            # Temporary file, removed once the plane and all its views are released
+            archive = None
+            intensity = temporary_memmap(shape, dtype, prefix = 'RIXS_')
+            align = 1
+        elif isinstance(out, RIXSArchive) or str(out).endswith('.h5'):
+            archive = out if isinstance(out, RIXSArchive) else RIXSArchive(out)
+            intensity = archive.create(name, incident_Energy_interp*scale, axis_values*scale, choice, unit, 
+                                       params, dtype, adaptive = adaptive)
+            # Tiles made of whole HDF5 chunks
+            align = intensity.chunks[1] if intensity.chunks else 1
+        else:
+            archive = None
+            intensity = np.lib.format.open_memmap(out, mode = 'w+', dtype = dtype, shape = shape)
+            align = 1
+
+        # Memory of one column: the scans, the interpolation temporaries and the ET column
+        column_bytes = 8*(2*scan_intensity.shape[0] + 4*emission_npt + (2*shape[0] if choice == 'ET' else 0))
+        for columns in column_tiles(incident_npt, column_bytes, memory_MB, align):
+            with self.span('emission_interp') as span:
+                tile = resample_axis(emission_Energy, scan_intensity[:, columns], emission_Energy_interp,
+                                     axis = 0, kind = interp_kind).astype(dtype, copy = False)
+                span.size = tile.size
+            if choice == 'ET':
+                with self.span('ET_remap') as span:
+                    if pixel_remap:
+                        # The pixel [j, i] of the EE plane goes to the pixel [i-j+emission_npt-1, i] of the ET plane
+                        ET_tile = np.full((shape[0], tile.shape[1]), np.nan, dtype = dtype)
+                        ET_rows = np.arange(columns.start, columns.stop) - np.arange(emission_npt)[:, np.newaxis] + emission_npt - 1
+                        ET_tile[ET_rows, np.broadcast_to(np.arange(tile.shape[1]), ET_rows.shape)] = tile
+                    else:
+                        # Non-uniform or different steps (adaptive grids), see RIXS_EE_to_ET()
+                        ET_tile = ET_interp_columns(incident_Energy_interp[columns], emission_Energy_interp, 
+                                                    tile, axis_values).astype(dtype, copy = False)
+                    tile = ET_tile
+                    span.size = tile.size
+            with self.span('write') as span:
+                intensity[:, columns] = tile
+                span.size = tile.size
+
+        if archive is not None:
+            archive.file.flush()
+            return archive[name]
+        intensity.flush()
+        # Read only, plane[2] never hands out the writable memory map (see RIXSPlane)
+        return RIXSPlane(incident_Energy_interp*scale, axis_values*scale, intensity, choice = choice, unit = unit, 
+                         writable = False, adaptive = adaptive)
+
+    @timed
+    def RIXS_data_constantET(self,firstScan, lastScan, concCorrecScan = False, executor = None, 
+                             regrid = False, interp_npt_1eV = 20):
+        """
+        To get RIXS data ndarray from SPEC file, for scans at fixed incident energy (constant ET scans)
 
-        if choice == 'EE':
-            if unit == 'eV':
-                dataArray_EE[0] = dataArray_EE[0]*1000
-                dataArray_EE[1] = dataArray_EE[1]*1000
-                return dataArray_EE
-            return dataArray_EE
-        if choice == 'ET': 
-            if unit == 'eV':
-                dataArray_ET[0] = dataArray_ET[0]*1000
-                dataArray_ET[1] = dataArray_ET[1]*1000
-                return dataArray_ET
-            return dataArray_ET
-        
-    def RIXS_data_constantET(self,firstScan, lastScan, concCorrecScan = False):
+        Parameters
+        ----------
+        firstScan : the index of first scan, e.g, 71 corresponding to fscan '72.1'
+        lastScan : the index of first scan
+        concCorrecScan : the index of concentration correction scan, normally the one after last RIXS scan
+        executor: default None, read the scans one after the other
+                  'thread', 'process' or a concurrent.futures executor -----> read the scans in parallel
+        regrid: default False -----> all the scans have the Spec.Energy points of the first scan,
+                                     the energy transfer axis is the one of the first scan
+                True -----> the scans (which can have different Spec.Energy points) are interpolated 
+                            onto a common energy transfer axis, the points outside of a scan are 0
+        interp_npt_1eV : the number of points for 1 eV of the common energy transfer axis (regrid = True)
+        Returns
+        -------
+        out : RIXSPlane (in KeV), A data list [XX, YY, MDfci_correc_inten]
+              XX -----> incident energy ndarray
+              YY -----> energy transfer ndarray
+              MDfci_correc_inten -----> intensity ndarray
+        """
 
-        incident_Energy = np.array([self.sf[i].data_column_by_name('mono.energy')[1] for i in range(firstScan, lastScan+1)]) 
-        emission_Energy_firstScan = self.sf[firstScan].data_column_by_name('Spec.Energy')
-        Energy_transfer = np.zeros_like(self.sf[firstScan].data_column_by_name('mono.energy'))
+        # Look for the same plane in the persistent plane cache first
+        plane_params = {'firstScan': firstScan, 'lastScan': lastScan, 'concCorrecScan': concCorrecScan}
+        if regrid:
+            plane_params.update(regrid = True, interp_npt_1eV = interp_npt_1eV)
+        RIXS_dataArray = self.cached_plane('RIXS_data_constantET', plane_params)
+        if RIXS_dataArray is not None:
+            return RIXS_dataArray
 
-        # Fill the empty energy_transfer array
-        for n in range(len(Energy_transfer)):
-            Energy_transfer[n] = incident_Energy[0] - emission_Energy_firstScan[n]
+        scanList = list(range(firstScan, lastScan + 1))
+        # Read all the columns first (in parallel if asked), they are then served by the column cache
+        self.load_columns(scanList, ('det_dtc', 'I02') + (('Spec.Energy',) if regrid else ()), executor)
 
-        # Creat an empty array
-        MDfci_correc_inten = np.zeros(((len(Energy_transfer), len(incident_Energy))))
-        
-        
-        # We then fill the empty array with intensity
-        for n in range(firstScan, lastScan + 1):
-            # intensity for each scan at fixed incident energy
-            
+        with self.span('normalize') as span:
+            # The incident energy of each scan (second mono.energy value) comes from the scan catalog
+            incident_Energy = self.catalog(scanList).values(scanList, 'mono.energy', 1)
             if concCorrecScan == False:
-                correc_inten = self.sf[n].data_column_by_name('det_dtc')/self.sf[n].data_column_by_name('I02') #Normalized to I02
+                concCorrec_inten = None
             else:
-                # Collect concentration correction intensity into an array
-                concCorrec_inten = self.sf[concCorrecScan].data_column_by_name('det_dtc')/self.sf[concCorrecScan].data_column_by_name('I02') # Normalized to I02
-                correc_inten = self.sf[n].data_column_by_name('det_dtc')/(self.sf[n].data_column_by_name('I02')*concCorrec_inten[n-firstScan]) 
-    
-            MDfci_correc_inten[:,n-firstScan] = correc_inten
+                # Concentration correction intensity, one value per scan, normalized to I02 (read once)
+                concCorrec_inten = (self.scan_column(concCorrecScan, 'det_dtc')/
+                                    self.scan_column(concCorrecScan, 'I02'))[:len(scanList)]
 
-        # Define Grids, EE_XX: incident energy array, EE_YY: emission energy array
-        EE_XX, EE_YY = np.meshgrid(incident_Energy, Energy_transfer)
-        RIXS_dataArray = np.array([EE_XX, EE_YY, MDfci_correc_inten])
+            if regrid:
+                # Ragged stack of the scans, each scan with its own energy transfer points
+                emission_stack, correc_inten_stack, offsets = self.scan_stack(scanList, 'det_dtc', concCorrec_inten, 
+                                                                              energy_label = 'Spec.Energy')
+                ET_stack = np.repeat(incident_Energy, np.diff(offsets)) - emission_stack
+            else:
+                points = [len(self.scan_column(n, 'det_dtc')) for n in scanList]
+                if len(set(points)) > 1:
+                    raise ValueError('The scans have different numbers of points (%d to %d), use regrid = True' 
+                                     % (min(points), max(points)))
+                emission_Energy_firstScan = self.scan_column(firstScan, 'Spec.Energy')
+                # Energy transfer axis of the first scan
+                Energy_transfer = incident_Energy[0] - emission_Energy_firstScan
+
+                # All the scans in one preallocated array, one column per scan
+                det_dtc = np.empty((points[0], len(scanList)))
+                I02 = np.empty((points[0], len(scanList)))
+                for k, n in enumerate(scanList):
+                    det_dtc[:, k] = self.scan_column(n, 'det_dtc')
+                    I02[:, k] = self.scan_column(n, 'I02')
+                if concCorrec_inten is not None:
+                    # One concentration correction value per scan (column)
+                    I02 *= concCorrec_inten
+                # Normalized to I02
+                MDfci_correc_inten = det_dtc/I02
+            span.size = correc_inten_stack.size if regrid else MDfci_correc_inten.size
+
+        if regrid:
+            with self.span('ET_regrid') as span:
+                # Common energy transfer axis, inside the energy transfer range of the scans
+                Energy_transfer_min = round(ET_stack.min()*10000+1)/10000
+                Energy_transfer_max = round(ET_stack.max()*10000-1)/10000
+                Energy_transfer_npt = int(round((Energy_transfer_max - Energy_transfer_min)*1000)*interp_npt_1eV)
+                Energy_transfer = np.linspace(Energy_transfer_min, Energy_transfer_max, Energy_transfer_npt)
+                # All the scans are interpolated at once (see interp_stack()), one column per scan
+                MDfci_correc_inten = interp_stack(ET_stack, correc_inten_stack, offsets, Energy_transfer, 
+                                                  fill_value = 0).T.copy()
+                span.size = MDfci_correc_inten.size
+
+        # Put all the data into a RIXS plane, XX: incident energy, YY: energy transfer
+        RIXS_dataArray = RIXSPlane(incident_Energy, Energy_transfer, MDfci_correc_inten, choice = 'ET', unit = 'KeV')
+        self.store_plane('RIXS_data_constantET', plane_params, RIXS_dataArray)
         return RIXS_dataArray
         
-    def RIXS_merge(self, scansets, choice = 'sum'):
+    @timed
+    def RIXS_merge(self, scansets, choice = 'sum', weights = None, ignore_nan = True):
         """
         To merge (sum up/average different RIXS data ndarray)
+        The planes are added one by one into the merged intensity, so scansets can be a generator 
+        and the memory used does not depend on the number of planes
+        (working memory: the merged intensity, plus the summed weight of each pixel if ignore_nan = True)
 
         Parameters
         ----------
         scansets : put all the RIXS_data output file that want to mergy into a list
                    e.g. [dataArray1, dataArray2, dataArray3]
+                   or any iterable/generator of RIXS data ndarray (all with the same shape),
+                   e.g. (data.RIXS_data(n, n+75, n+76) for n in (71, 148, 225))
         choice : 'sum':     get -----> summed intensity
                  'average': get -----> averaged intensity
+        weights : default None -----> all the planes have the same weight
+                  otherwise one weight per plane, e.g. [1, 1, 0.5]
+        ignore_nan : default True -----> the NaN pixels of a plane are left out of the sum and of the average,
+                                          a merged pixel is NaN only if it is NaN in all the planes
+                     False -----> a NaN pixel in one plane gives a NaN merged pixel
         Returns
         -------
         if choice = 'sum':
-        out : A new ndarray dataArray with summed intensity 
+        out : A new RIXSPlane with summed intensity 
               -----> [averaged_XX,averaged_YY,summed_intensity]
 
         if choice = 'average':
-        out : A new ndarray dataArray with summed intensity
+        out : A new RIXSPlane with summed intensity
               -----> [averaged_XX,averaged_YY,averaged_intensity]
         """
-        # scansets = np.array(scansets)
-        summed_XX = 0
-        summed_YY = 0
-        summed_intensity = 0
-        # Sum up incident energy array, emission energy array and intensity array separately
+        if weights is not None:
+            weights = iter(weights)
+        merged_intensity = None
+        plane_number = 0
+        # Sum up incident energy axis, emission energy axis and intensity array separately, in place
         for nscan in scansets:
-            summed_XX += nscan[0]
-            summed_YY += nscan[1]
-            summed_intensity += nscan[2]
-
-        # To do the average = sum/scansets
-        averaged_XX = summed_XX/len(scansets)
-        averaged_YY = summed_YY/len(scansets)
-        averaged_intensity =summed_intensity/len(scansets)
-
-        # Reput the data into a dataArray
-        summed_dataArray = np.array([averaged_XX,averaged_YY,summed_intensity])
-        averaged_dataArray = np.array([averaged_XX,averaged_YY,averaged_intensity])
-
-        if choice == 'sum':
-            return summed_dataArray
-        if choice == 'average':
-            return averaged_dataArray
+            plane = as_RIXS_plane(nscan)
+            weight = 1.0 if weights is None else float(next(weights))
+            intensity = plane.intensity
+            if merged_intensity is None:
+                # Preallocate the merged intensity, the summed weights are only kept per pixel
+                # when the NaN pixels are left out, otherwise all the pixels have the same summed weight
+                summed_incident = np.zeros(len(plane.incident))
+                summed_emission = np.zeros(len(plane.emission))
+                merged_intensity = np.zeros(intensity.shape)
+                weight_sum = np.zeros(intensity.shape) if ignore_nan else 0.0
+                # The planes are added by blocks of rows, with small work arrays (about 1 MB)
+                block_rows = max(1, 2**17 // max(intensity.shape[1], 1))
+                weighted_block = np.empty((min(block_rows, intensity.shape[0]), intensity.shape[1]))
+                measured_block = np.empty(weighted_block.shape, dtype = bool)
+                plane_choice = plane.choice
+                plane_unit = plane.unit
+                plane_adaptive = plane.adaptive
+            elif intensity.shape != merged_intensity.shape:
+                raise ValueError('all the RIXS planes to merge should have the same shape')
+            summed_incident += plane.incident
+            summed_emission += plane.emission
+            for start in range(0, intensity.shape[0], block_rows):
+                rows = slice(start, start + block_rows)
+                weighted_intensity = weighted_block[:len(merged_intensity[rows])]
+                np.multiply(intensity[rows], weight, out = weighted_intensity)
+                if ignore_nan:
+                    # Only add and count the measured (not NaN) pixels
+                    measured = measured_block[:len(weighted_intensity)]
+                    np.isnan(intensity[rows], out = measured)
+                    np.logical_not(measured, out = measured)
+                    np.add(merged_intensity[rows], weighted_intensity, out = merged_intensity[rows], where = measured)
+                    np.add(weight_sum[rows], weight, out = weight_sum[rows], where = measured)
+                else:
+                    np.add(merged_intensity[rows], weighted_intensity, out = merged_intensity[rows])
+            if not ignore_nan:
+                weight_sum += weight
+            plane_number += 1
+        if merged_intensity is None:
+            raise ValueError('scansets is empty, nothing to merge')
+
+        if choice not in ('sum', 'average'):
+            return None
+        if ignore_nan:
+            # The pixels never measured are NaN
+            never_measured = weight_sum == 0
+            if choice == 'average':
+                np.divide(merged_intensity, weight_sum, out = merged_intensity, where = ~never_measured)
+            merged_intensity[never_measured] = np.nan
+        elif choice == 'average' and weight_sum != 0:
+            merged_intensity /= weight_sum
+        # To do the average of the axes = sum/scansets
+        return RIXSPlane(summed_incident/plane_number, summed_emission/plane_number, merged_intensity, 
+                         choice = plane_choice, unit = plane_unit, adaptive = plane_adaptive)
     
     def RIXS_display(self, dataArray, title = 'RIXS',  choice = 'EE', mode = '2d',
-                     savefig = False, normalize_to_Preedge = False,):
+                     savefig = False, normalize_to_Preedge = False, show = True):
         """
         To plot RIXS planes
 
@@ -658,11 +3051,15 @@ class DataAnalysis(object):
         normalize_to_Preedge : set pre-edge maximum as the max color(vmax), 
                                default = False: automatically choose the max of the whole peak max as vmax
         
+        show: default True -----> plt.show(), False -----> return the figure without displaying it
+                                                       (e.g, to savefig on a headless node)
+
         Returns
         -------
-        out : ndarray
-            Array of zeros with the given shape, dtype, and order.
+        out : None (show = True) or the matplotlib figure (show = False)
     """
+        import matplotlib.pyplot as plt
+        from matplotlib import cm
         if mode == '2d':
             # ------------ CONTOURF METHOD ------------
             # Transfer the energy from KeV scale into eV scale
@@ -718,12 +3115,15 @@ class DataAnalysis(object):
             ax.grid(False)
             # Add colorbar
             fig.colorbar(plotting_3d, shrink=0.5, aspect=5)
-            
 
+
+        if show == False:
+            return plt.gcf()
         return plt.show()
     
         
-    def RIXS_imshow(self, dataArray):
+    def RIXS_imshow(self, dataArray, show = True):
+        import matplotlib.pyplot as plt
         levels = np.linspace(dataArray[2].min(), dataArray[2].max(), 12)
         extent = (dataArray[0].min(), dataArray[0].max(), 
                   dataArray[1].min(), dataArray[1].max())
@@ -732,8 +3132,11 @@ class DataAnalysis(object):
                    origin='lower', aspect='auto',interpolation='nearest')
         plt.contour(dataArray[2], extent=extent, 
                     origin='lower', levels=levels,cmap=plt.cm.gray, linewidths=0.5)
+        if show == False:
+            return plt.gcf()
         return plt.show()
     
+    @timed
     def RIXS_normalization(self, RIXS_data, XX_range =(), plot = False, 
                            levelnumber = 20, xlim = (6537.3,6544.8), ylim = (638.5, 647), 
                            savefig = False):
@@ -742,7 +3145,7 @@ class DataAnalysis(object):
         
         Parameters
         ----------
-        RIXS_data : the RIXS_data [XX, YY, intensity]
+        RIXS_data : the RIXS_data RIXSPlane or data ndarray [XX, YY, intensity]
         XX_range: default ()
                   A tuple of pre-edge range, e.g, XX_range =  (6538,6542)
                   -----> will do normalization to the maximum peak in the range of 6538 eV to 6542 eV
@@ -750,35 +3153,29 @@ class DataAnalysis(object):
                   -----> Normalization to the whole area
         Returns
         -------
-        out : A data ndarray of the normalized RIXS data [RIXS_XX, RIXS_YY, RIXS_intensity]
+        out : A RIXSPlane of the normalized RIXS data [RIXS_XX, RIXS_YY, RIXS_intensity]
 
         """
 
+        plane = as_RIXS_plane(RIXS_data)
         # default incident_energy_range is the whole range
         if XX_range == ():
-            XX_min = RIXS_data[0].min()
-            XX_max = RIXS_data[0].max()
+            XX_min = plane.incident.min()
+            XX_max = plane.incident.max()
             XX_range=(XX_min,XX_max)
 
         # Crop the RIXS plane into pre-edge region by defining the incident_energy_range
         # This step is to ensure we are choosing the maximum of pre-edge without influence of main edge
-        # First find indexes of this pre-edge region
-        incident_E_index = np.where((RIXS_data[0][0,:] >= XX_range[0]) & 
-                                    (RIXS_data[0][0,:] <= XX_range[1]))
-        # Find the corresponding intensity of the pre-edge region
-        crop_intensity = RIXS_data[2][:, incident_E_index[0]]
-
-        # Find the maximum of pre-edge peak
-        pre_edge_max = np.nanmax(crop_intensity)
+        # Find the maximum of pre-edge peak, from the column maxima cached on the plane (see RIXSPlane.range_max())
+        pre_edge_max = plane.range_max(XX_range)
         #print(pre_edge_max)
 
         # Normalization of RIXS_data intensity
-        norm_intensity = RIXS_data[2]/pre_edge_max
+        norm_intensity = plane.intensity/pre_edge_max
 
         # Put new normalized data into a new data array
-        norm_RIXS_dataArray = np.array([RIXS_data[0], 
-                                        RIXS_data[1],
-                                        norm_intensity])
+        norm_RIXS_dataArray = RIXSPlane(plane.incident, plane.emission, norm_intensity, 
+                                        choice = plane.choice, unit = plane.unit, adaptive = plane.adaptive)
         if plot == True:
             # Auto scale Plotting
             # Each contour have differenr intensity range, so we need different levels for contour plotting
@@ -786,6 +3183,8 @@ class DataAnalysis(object):
             #level = int(intensity_range * levelscale)
             level = list(np.arange(0,1,1/levelnumber))
             # print('intensity range', intensity_range)
+            import matplotlib.pyplot as plt
+            from matplotlib import cm
             fig = plt.figure(figsize=(6,6))
             MyContour = plt.contourf(norm_RIXS_dataArray[0],
                                      norm_RIXS_dataArray[1],
@@ -818,7 +3217,35 @@ class DataAnalysis(object):
             
         return norm_RIXS_dataArray
     
-    def RIXS_cut(self, dataArray, choice, cut):
+    @timed
+    def RIXS_normalization_batch(self, RIXS_planes, XX_range = ()):
+        """
+        Normalize many RIXS planes to the maximum of the same pre-edge range (see RIXS_normalization())
+        The column maxima of each RIXSPlane are computed once and cached on it (see RIXSPlane.range_max()),
+        so normalizing the same planes for another pre-edge range only costs the divisions
+
+        Parameters
+        ----------
+        RIXS_planes : list of RIXS_data RIXSPlane or data ndarray [XX, YY, intensity]
+        XX_range: default () -----> normalization to the maximum of each whole plane
+                  A tuple of pre-edge range, e.g, XX_range =  (6538,6542), in the unit of the planes
+
+        Returns
+        -------
+        out : list of the normalized RIXSPlane
+        """
+        planes = [as_RIXS_plane(RIXS_data) for RIXS_data in RIXS_planes]
+        with self.span('range_max'):
+            pre_edge_maxima = [plane.range_max(XX_range if XX_range != () else None) for plane in planes]
+        with self.span('normalize') as span:
+            norm_planes = [RIXSPlane(plane.incident, plane.emission, plane.intensity/pre_edge_max, 
+                                     choice = plane.choice, unit = plane.unit, adaptive = plane.adaptive)
+                           for plane, pre_edge_max in zip(planes, pre_edge_maxima)]
+            span.size = sum(plane.intensity.size for plane in norm_planes)
+        return norm_planes
+
+    @timed
+    def RIXS_cut(self, dataArray, choice, cut, interp_kind = 'linear', plot = False):
         """
         To do CIE, CET, CEE cuts(choice, cut)
         NOTICE: Choose ET dataArray for CIE & CET
@@ -831,6 +3258,8 @@ class DataAnalysis(object):
                 'CET'-- Constant energy transfer cut
                 'CEE'-- Constant emission energy cut
         cut: the energy (eV) you want to cut, e.g., 6530 eV
+        interp_kind: 'linear'(default) or 'cubic' interpolation across the cut
+        plot: default False -----> no plotting (matplotlib is not imported), True -----> plot the result
 
         Returns
         -------
@@ -839,117 +3268,874 @@ class DataAnalysis(object):
  |      CIE, CET, CEE data ndarray [incident energy/energy transfer, intensity]
     """
 
-        # Convert all the NaN to numbers (the 2d interpolation will raise errors when existing NaN)
-        new_inten = np.nan_to_num(dataArray[2])
-        # 2d interpolation
-        cut_interp2d = interp.interp2d(dataArray[0][0,:], dataArray[1][:,0], new_inten)
-        # Convert KeV into eV
-        cut = cut/1000
-        if choice == 'CIE':
-            # Find the interpolated intensity
-            cut_intensity = cut_interp2d(cut, dataArray[1][:,0])
-            # Plotting
-            plt.plot(dataArray[1][:,0]*1000, cut_intensity)
-            plt.title('CIE')
-            plt.xlabel('Energy transfer')
-            plt.ylabel('Arbitrary Intensity')
-            plt.show()
-            CIE_dataArray = np.array([dataArray[1][:,0]*1000, cut_intensity[0]])
-            return CIE_dataArray
-        elif choice == 'CET':
-            # Find the interpolated intensity
-            cut_intensity = cut_interp2d(dataArray[0][0,:],cut)
-            # Plotting
-            plt.plot(dataArray[0][0,:]*1000,cut_intensity)
-            plt.title('CET')
-            plt.xlabel('Incident Energy')
+        if choice not in ('CIE', 'CET', 'CEE'):
+            return None
+        # The cut is done by the batch cut engine
+        cut_dataArray = self.RIXS_cuts(dataArray, {choice: [cut]}, interp_kind = interp_kind)[choice]
+        # Plotting
+        if plot == True:
+            import matplotlib.pyplot as plt
+            plt.plot(cut_dataArray[0], cut_dataArray[1])
+            plt.title(choice)
+            plt.xlabel('Energy transfer' if choice == 'CIE' else 'Incident Energy')
             plt.ylabel('Arbitrary Intensity')
             plt.show()
-            CET_dataArray = np.array([dataArray[0][0,:]*1000,cut_intensity])
-            return CET_dataArray
-        elif choice == 'CEE':
-            # Find the interpolated intensity
-            cut_intensity = cut_interp2d(dataArray[0][0,:],cut)
-            # Plotting
-            plt.plot(dataArray[0][0,:]*1000,cut_intensity)
-            plt.title('CEE')
-            plt.xlabel('Incident Energy')
-            plt.ylabel('Arbitrary Intensity')
+        return cut_dataArray
+
+    @timed
+    def RIXS_cuts(self, dataArray, cuts, interp_kind = 'linear', plot = False):
+        """
+        Batch CIE, CET, CEE cuts: all the cuts of one kind are interpolated in one vectorized evaluation
+        The interpolators are cached on the RIXSPlane, so the next cuts of the same plane reuse them
+        NOTICE: Choose ET dataArray for CIE & CET
+                Choose EE dataArray for CEE
+
+        Parameters
+        ----------
+        dataArray: the RIXS_data output RIXSPlane (a data ndarray works, without the caching)
+        cuts: dict of the energies (eV) you want to cut for each kind of cut, 
+              e.g., {'CIE': [6539, 6540, 6541], 'CET': [645, 646]}
+        interp_kind: 'linear'(default) or 'cubic' interpolation across the cuts
+        plot: default False, True -----> plot the cuts
+
+        Returns
+        -------
+        out : dict {'CIE': CIE data ndarray, 'CET': ..., 'CEE': ...}
+              each data ndarray is [incident energy/energy transfer, cut1 intensity, cut2 intensity, ...]
+              with the energies in eV
+        """
+        plane = as_RIXS_plane(dataArray)
+        # Energies of the cuts are in eV, convert them into the unit of the plane
+        scale = 1000. if plane.unit == 'KeV' else 1.
+        cut_dataArrays = {}
+        with self.span('cut'):
+            for choice, cut_energies in cuts.items():
+                cut_energies = np.atleast_1d(np.asarray(cut_energies, dtype = float))/scale
+                if choice == 'CIE':
+                    # Interpolating along the incident energy axis only
+                    cut_axis = plane.emission*scale
+                    cut_intensity = plane.interpolator(1, interp_kind)(cut_energies)
+                elif choice in ('CET', 'CEE'):
+                    # Interpolating along the y axis only
+                    cut_axis = plane.incident*scale
+                    cut_intensity = plane.interpolator(0, interp_kind)(cut_energies)
+                else:
+                    raise ValueError("the cuts should be 'CIE', 'CET' or 'CEE'")
+                cut_dataArrays[choice] = np.vstack([cut_axis, cut_intensity])
+
+        if plot == True:
+            import matplotlib.pyplot as plt
+            for choice, cut_dataArray in cut_dataArrays.items():
+                plt.figure()
+                plt.plot(cut_dataArray[0], cut_dataArray[1:].T)
+                plt.legend(['%g eV' % energy for energy in np.atleast_1d(cuts[choice])])
+                plt.title(choice)
+                plt.xlabel('Energy transfer [eV]' if choice == 'CIE' else 'Incident Energy [eV]')
+                plt.ylabel('Arbitrary Intensity')
             plt.show()
-            CEE_dataArray = np.array([dataArray[0][0,:]*1000,cut_intensity])
-            return CEE_dataArray
+        return cut_dataArrays
     
-    def RIXS_integration(self, dataArray, choice = 'IE'):
+    @timed
+    def RIXS_integration(self, dataArray, choice = 'IE', plot = False, memory_MB = None):
         """
         Integration along incident energy and energy transfer
 
         Parameters
         ----------
-        dataArray: the RIXS_data return data ndarray
+        dataArray: the RIXS_data return data ndarray (or an ArchivedPlane)
+        choice: 'IE'(default) -----> integrated intensity vs incident energy
+                'ET' -----> integrated intensity vs energy transfer
+        plot: default False -----> no plotting (matplotlib is not imported), True -----> plot the result
+        memory_MB: default None -----> the whole intensity is read at once
+                   otherwise the intensity is read by tiles of columns using about memory_MB of RAM
+                   (for the memory-mapped or archived planes of RIXS_data(memory_MB = ...))
 
         Returns
         -------
         out :     
         ndarray
         integrated data ndarray [incident energy/energy transfer, intensity]
+        the intensity is summed point by point, the axes made by adaptive_grid() (plane.adaptive) 
+        are integrated against their energies in 0.05 eV steps (see reference_steps())
 
 
     """
-        # integration for incident energy ---> Conventional XANES
-        sumIntensity_IE = np.nansum(dataArray[2],axis = 0)
-        # integration for incident energy ---> Conventional XANES
-        sumIntensity_ET = np.nansum(dataArray[2],axis = 1)
-        # plot both figures with same intensity scale
-        fig, ax = plt.subplots(nrows=1, ncols=2,figsize=(12,4),sharey = 'all')
-        ax[0].plot(dataArray[0][0,:]*1000,sumIntensity_IE)
-        ax[0].set_xlabel('Incident Energy [eV]')
-        ax[0].set_ylabel('Integrated intensity')
-        ax[1].plot(dataArray[1][:,0]*1000,sumIntensity_ET)
-        ax[1].set_xlabel('Energy Transfer [eV]')
-        ax[1].set_ylabel('Integrated intensity')
-        plt.setp(ax[1].get_yticklabels(), visible = True)
-        plt.show()
+        plane = dataArray if isinstance(dataArray, ArchivedPlane) else as_RIXS_plane(dataArray)
+        # The axes made by adaptive_grid() (marked on the plane): each point weighs its step, in units
+        # of the 0.05 eV reference step (see reference_steps()), the other axes are summed point by point
+        adaptive = getattr(plane, 'adaptive', (False, False))
+        if any(adaptive):
+            incident_weights, emission_weights = [
+                np.abs(np.gradient(reference_steps(axis_values, plane.unit))) 
+                if axis_adaptive and axis_values.size > 1 else np.ones(axis_values.size) 
+                for axis_values, axis_adaptive in zip((plane.incident, plane.emission), adaptive)]
+            sumIntensity_IE = np.zeros(plane.incident.size)
+            sumIntensity_ET = np.zeros(plane.emission.size)
+            for tile_columns in column_tiles(plane.incident.size, 24*plane.emission.size, 
+                                             memory_MB if memory_MB is not None else 256):
+                tile = np.nan_to_num(plane.intensity[:, tile_columns])
+                sumIntensity_IE[tile_columns] = emission_weights.dot(tile)
+                sumIntensity_ET += tile.dot(incident_weights[tile_columns])
+        elif memory_MB is None and isinstance(plane.intensity, np.ndarray):
+            # integration for incident energy ---> Conventional XANES
+            sumIntensity_IE = np.nansum(plane.intensity,axis = 0)
+            # integration for incident energy ---> Conventional XANES
+            sumIntensity_ET = np.nansum(plane.intensity,axis = 1)
+        else:
+            # Tile by tile, the energy transfer integration is accumulated over the tiles
+            rows, columns = plane.intensity.shape
+            sumIntensity_IE = np.zeros(columns)
+            sumIntensity_ET = np.zeros(rows)
+            for tile_columns in column_tiles(columns, 16*rows, memory_MB if memory_MB is not None else 256):
+                tile = plane.intensity[:, tile_columns]
+                sumIntensity_IE[tile_columns] = np.nansum(tile, axis = 0)
+                sumIntensity_ET += np.nansum(tile, axis = 1)
+        # Energies are returned in eV
+        incident_eV = plane.incident*(1000 if plane.unit == 'KeV' else 1)
+        emission_eV = plane.emission*(1000 if plane.unit == 'KeV' else 1)
+        if plot == True:
+            import matplotlib.pyplot as plt
+            # plot both figures with same intensity scale
+            fig, ax = plt.subplots(nrows=1, ncols=2,figsize=(12,4),sharey = 'all')
+            ax[0].plot(incident_eV,sumIntensity_IE)
+            ax[0].set_xlabel('Incident Energy [eV]')
+            ax[0].set_ylabel('Integrated intensity')
+            ax[1].plot(emission_eV,sumIntensity_ET)
+            ax[1].set_xlabel('Energy Transfer [eV]')
+            ax[1].set_ylabel('Integrated intensity')
+            plt.setp(ax[1].get_yticklabels(), visible = True)
+            plt.show()
         if choice == 'IE':
-            integration_dataArray = np.array([dataArray[0][0,:]*1000,sumIntensity_IE])
+            integration_dataArray = np.array([incident_eV,sumIntensity_IE])
         elif choice == 'ET':
-            integration_dataArray = np.array([dataArray[1][:,0]*1000,sumIntensity_ET])
-        #integration_dataArray = np.array([[dataArray[0][0,:]*1000,sumIntensity_IE],[dataArray[1][:,0]*1000,sumIntensity_ET]])
+            integration_dataArray = np.array([emission_eV,sumIntensity_ET])
+        #integration_dataArray = np.array([[incident_eV,sumIntensity_IE],[emission_eV,sumIntensity_ET]])
         return integration_dataArray
 
     
 # Functions
-def saveFile(dataList, headerList, folderPath = 'None', fileName = 'myData', choice = 'XANES'):
+def saveFile(dataList, headerList, folderPath = 'None', fileName = 'myData', choice = 'XANES',
+             fileFormat = 'dat', number_format = '%.12f'):
     """
-    Save data into txt
+    Save data into txt or binary files
     Parameters
     ----------
     dataList : [dataArray1, dataArray2..., dataArrayn]
+               or a RIXSPlane/RIXS data ndarray for choice = 'RIXS'
     headerList : ['Column title 1', 'Column title 2'..., 'Column title n']
-    folderPath: the folder where you want to save your data 
+    folderPath: the folder where you want to save your data
     fileName: the file name
     choice: 'XANES' or 'RIXS'
-    
+    fileFormat: 'dat'(default) -----> text file, readable by any software
+                'npy' -----> numpy file, XANES columns are named after headerList
+                'npz' -----> numpy archive with the axes, the header (and the RIXS choice, unit)
+                'h5' -----> HDF5 file, chunked and compressed, same content as 'npz'
+    number_format: the number format of the text file, default '%.12f'
+
+    A RIXSPlane is saved in 'dat' and 'npy' files as a matrix with the incident energy axis
+    as first row and the emission energy/energy transfer axis as first column
+
     Returns
     -------
-    out : A '.dat' file saving all the data
+    out : the path of the saved file, e.g, 'myData.dat'
 
     """
     if folderPath == 'None':
         folderPath = os.getcwd()
-    
-    headerSaveList = ' , '.join(headerList)
-    # Save XANES
+    path = os.path.join(folderPath, fileName + '.' + fileFormat)
+
     if choice == 'XANES':
-        dataSaveList = np.array(dataList) 
-        np.savetxt(folderPath + fileName + '.dat', 
-                   np.transpose(dataSaveList), fmt = '%.12f', 
-                   header = headerSaveList)
-    # Save RIXS
+        # One row per column of the file
+        dataArray = np.asarray(np.array(dataList), dtype = float)
+        arrays = {'data': dataArray}
+        table = np.transpose(dataArray)
     elif choice == 'RIXS':
-        np.savetxt(folderPath + fileName + '.dat', 
-                   dataList, fmt = '%.12f', 
-                   header = headerSaveList)
-    
+        if isinstance(dataList, RIXSPlane) or np.ndim(dataList) == 3:
+            plane = as_RIXS_plane(dataList)
+            arrays = {'incident': plane.incident, 'emission': plane.emission, 'intensity': plane.intensity}
+            # Matrix with the axes, the top left corner is not used
+            table = np.empty((plane.emission.size + 1, plane.incident.size + 1))
+            table[0, 0] = np.nan
+            table[0, 1:] = plane.incident
+            table[1:, 0] = plane.emission
+            table[1:, 1:] = plane.intensity
+        else:
+            plane = None
+            table = np.asarray(dataList, dtype = float)
+            arrays = {'data': table}
+    else:
+        return None
+
+    if fileFormat == 'dat':
+        write_text(path, table, number_format, header = ' , '.join(headerList))
+    elif fileFormat == 'npy':
+        if choice == 'XANES' and len(headerList) == table.shape[1] and len(set(headerList)) == len(headerList):
+            # Structured array: the columns keep their titles
+            columns = np.empty(table.shape[0], dtype = [(str(title), float) for title in headerList])
+            for k, title in enumerate(headerList):
+                columns[str(title)] = table[:, k]
+            np.save(path, columns)
+        else:
+            np.save(path, table)
+    elif fileFormat in ('npz', 'h5'):
+        meta = {'header': list(headerList), 'choice': choice}
+        if choice == 'RIXS' and plane is not None:
+            meta.update(plane_choice = plane.choice, unit = plane.unit, adaptive = list(plane.adaptive))
+        if fileFormat == 'npz':
+            np.savez(path, meta = json.dumps(meta), **arrays)
+        else:
+            import h5py
+            with h5py.File(path, 'w') as f:
+                for key, value in arrays.items():
+                    # Chunked and compressed, a cut only needs to read a few chunks
+                    f.create_dataset(key, data = value, chunks = True if value.ndim == 2 else None,
+                                     compression = 'gzip', compression_opts = 4, shuffle = True)
+                for key, value in meta.items():
+                    f.attrs[key] = json.dumps(value)
+    else:
+        raise ValueError("fileFormat should be 'dat', 'npy', 'npz' or 'h5'")
+    return path
+
+def loadFile(path, choice = 'XANES'):
+    """
+    Read back a file written by saveFile()
+    Parameters
+    ----------
+    path : the saved file, '.dat', '.npy', '.npz' or '.h5'
+    choice: 'XANES' or 'RIXS' (only used for the '.dat' and '.npy' files)
+
+    Returns
+    -------
+    out : (dataArray, headerList)
+          XANES -----> data ndarray, one row per column of the file
+          RIXS -----> RIXSPlane (or the data ndarray saved)
+    """
+    extension = os.path.splitext(path)[1]
+    headerList = []
+    if extension in ('.npz', '.h5'):
+        if extension == '.npz':
+            with np.load(path) as stored:
+                arrays = {key: stored[key] for key in stored.files if key != 'meta'}
+                meta = json.loads(str(stored['meta']))
+        else:
+            import h5py
+            with h5py.File(path, 'r') as f:
+                arrays = {key: f[key][()] for key in f.keys()}
+                meta = {key: json.loads(value) for key, value in f.attrs.items()}
+        headerList = meta['header']
+        if 'intensity' in arrays:
+            return RIXSPlane(arrays['incident'], arrays['emission'], arrays['intensity'],
+                             choice = meta['plane_choice'], unit = meta['unit'], 
+                             adaptive = meta.get('adaptive', (False, False))), headerList
+        return arrays['data'], headerList
+    if extension == '.npy':
+        table = np.load(path)
+        if table.dtype.names is not None:
+            # Structured array of the XANES columns
+            headerList = list(table.dtype.names)
+            return np.array([table[title] for title in headerList]), headerList
+    else:
+        with open(path) as f:
+            first_line = f.readline()
+        if first_line.startswith('# '):
+            headerList = first_line[2:].rstrip('\n').split(' , ')
+        table = np.loadtxt(path, ndmin = 2)
+    if choice == 'XANES':
+        return np.transpose(table), headerList
+    if np.isnan(table[0, 0]):
+        # Matrix with the axes, the energy transfer is much lower than the incident energy
+        incident_Energy = table[0, 1:]
+        emission_Energy = table[1:, 0]
+        plane_choice = 'ET' if emission_Energy.max() < incident_Energy.min()/2 else 'EE'
+        unit = 'eV' if incident_Energy.max() > 100 else 'KeV'
+        return RIXSPlane(incident_Energy, emission_Energy, table[1:, 1:], choice = plane_choice, unit = unit), headerList
+    return table, headerList
+
+def write_text(path, table, number_format = '%.12f', header = ''):
+    """
+    Write a 2d ndarray into a text file, same output as np.savetxt(path, table, fmt = number_format, header = header)
+    '%.Nf' formats (N <= 12) are formatted by numpy digit arithmetic (see format_fixed()),
+    the other formats by blocks of rows in one string operation
+    """
+    table = np.asarray(table)
+    if table.ndim == 1:
+        table = table[:, np.newaxis]
+    fixed = re.match(r'^%\.(\d+)f$', number_format)
+    decimals = int(fixed.group(1)) if fixed and int(fixed.group(1)) <= 12 else None
+    row_format = ' '.join([number_format] * table.shape[1]) + '\n'
+    # About 2**18 numbers per block, the memory used does not depend on the table size
+    block_rows = max(1, 2**18 // max(table.shape[1], 1))
+    with open(path, 'w') as f:
+        if header:
+            f.write('# ' + header.replace('\n', '\n# ') + '\n')
+        for start in range(0, table.shape[0], block_rows):
+            block = table[start:start + block_rows]
+            text = format_fixed(block, decimals) if decimals is not None else None
+            if text is None:
+                text = (row_format * block.shape[0]) % tuple(block.ravel().tolist())
+            f.write(text)
+
+def format_fixed(table, decimals):
+    """
+    Format a 2d ndarray as '%.<decimals>f' numbers separated by ' ', one row per line,
+    the digits are computed with numpy on all the numbers at once instead of one string formatting per number
+
+    Returns
+    -------
+    out : str, the same text as the '%.<decimals>f' string formatting,
+          None if a number is too large (the caller formats the table itself)
+    """
+    values = np.asarray(table, dtype = float)
+    ncols = values.shape[1]
+    flat = values.ravel()
+    finite = np.isfinite(flat)
+    magnitude = np.where(finite, np.abs(flat), 0.)
+    # Integer and fraction parts, floor() and the subtraction are exact
+    integer = np.floor(magnitude)
+    scale = 10.**decimals
+    scaled = (magnitude - integer)*scale
+    fraction = np.round(scaled)
+    carry = fraction >= scale
+    integer[carry] += 1
+    fraction[carry] = 0
+    if flat.size == 0 or integer.max() >= 2.**62:
+        return None
+    integer = integer.astype(np.int64)
+    fraction = fraction.astype(np.int64)
+    # The product by scale can round the wrong way when the fraction is very close to a half:
+    # those few numbers are formatted by python
+    for k in np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-3):
+        text = '%.*f' % (decimals, magnitude[k])
+        integer[k] = int(text.split('.')[0])
+        fraction[k] = int(text.split('.')[1]) if decimals else 0
+    int_digits = len(str(integer.max()))
+    # One fixed width field per number: sign, integer digits, '.', fraction digits, separator
+    # the unused leading characters are 0 and removed at the end
+    width = max(2 + int_digits + (1 + decimals if decimals else 0), 5)
+    chars = np.zeros((width, flat.size), dtype = np.uint8).T
+    col = width - 2
+    # The digits are taken 6 by 6 from 32 bit integers (faster divisions)
+    for start in range(0, decimals, 6):
+        fraction, group = np.divmod(fraction, 10**min(6, decimals - start))
+        group = group.astype(np.int32)
+        for k in range(min(6, decimals - start)):
+            chars[:, col] = group % 10 + 48
+            group //= 10
+            col -= 1
+    if decimals:
+        chars[:, col] = ord('.')
+        col -= 1
+    for k in range(int_digits):
+        digit = integer % 10 + 48
+        if k:
+            # No leading zeros, the units digit is always written
+            digit[integer == 0] = 0
+        chars[:, col] = digit
+        integer //= 10
+        col -= 1
+    chars[np.signbit(flat) & finite, 0] = ord('-')
+    if not finite.all():
+        chars[~finite, :-1] = 0
+        for mask, text in ((np.isnan(flat), b'nan'), (flat == np.inf, b'inf'), (flat == -np.inf, b'-inf')):
+            chars[mask, width - 1 - len(text):width - 1] = np.frombuffer(text, dtype = np.uint8)
+    chars[:, -1] = ord(' ')
+    chars[ncols - 1::ncols, -1] = ord('\n')
+    return chars[chars != 0].tobytes().decode('ascii')
+
+def interp_stack(energy, intensity, offsets, new_axis, fill_value = np.nan):
+    """
+    Linear interpolation of a ragged stack of scans onto a common incident energy axis, 
+    all the scans in one vectorized pass (no interpolator object per scan)
+
+    Parameters
+    ----------
+    energy, intensity, offsets : the ragged stack, see DataAnalysis.scan_stack()
+                                 the points of scan k are energy[offsets[k]:offsets[k+1]]
+    new_axis : 1d ndarray, the common incident energy axis
+    fill_value : value for the points outside of the energy range of a scan
+                 e.g, np.nan for XANES (default), 0 for RIXS
+
+    Returns
+    -------
+    out : ndarray of shape (number of scans, len(new_axis))
+    """
+    energy = np.asarray(energy, dtype = float)
+    intensity = np.asarray(intensity, dtype = float)
+    new_axis = np.asarray(new_axis, dtype = float)
+    offsets = np.asarray(offsets)
+    scan_npt = np.diff(offsets)
+    scan_number = len(scan_npt)
+    new_inten = np.full((scan_number, len(new_axis)), fill_value, dtype = float)
+    if energy.size == 0 or new_axis.size == 0:
+        return new_inten
+
+    # Sort the points inside each scan if some scan is not increasing
+    scan_id = np.repeat(np.arange(scan_number), scan_npt)
+    decrease = np.diff(energy) < 0
+    if np.any(decrease & (scan_id[1:] == scan_id[:-1])):
+        order = np.lexsort((energy, scan_id))
+        energy = energy[order]
+        intensity = intensity[order]
+
+    # Shift every scan onto its own energy band, scan k lies in [k*band, (k+1)*band)
+    # So one searchsorted over the whole stack finds the left neighbours for all the scans
+    origin = min(energy.min(), new_axis.min())
+    band = max(energy.max(), new_axis.max()) - origin + 1
+    stack_key = energy - origin + scan_id * band
+    new_key = (new_axis - origin) + (np.arange(scan_number) * band)[:, np.newaxis]
+    index = np.searchsorted(stack_key, new_key, side = 'right') - 1
+
+    # Keep the neighbours inside each scan
+    first = offsets[:-1, np.newaxis]
+    last = np.maximum(offsets[1:, np.newaxis] - 1, first)
+    index = np.clip(index, first, np.maximum(last - 1, first))
+    index_next = np.minimum(index + 1, last)
+    index = np.minimum(index, energy.size - 1)
+    index_next = np.minimum(index_next, energy.size - 1)
+
+    step = energy[index_next] - energy[index]
+    weight = (new_axis - energy[index]) / np.where(step == 0, 1, step)
+    interp_inten = intensity[index] * (1 - weight) + intensity[index_next] * weight
+
+    # Only the points inside the energy range of each scan are kept
+    inside = ((scan_npt > 0)[:, np.newaxis] & 
+              (new_axis >= energy[np.minimum(first, energy.size - 1)]) & 
+              (new_axis <= energy[np.minimum(last, energy.size - 1)]))
+    new_inten[inside] = interp_inten[inside]
+    return new_inten
+
+def resample_axis(old_axis, data, new_axis, axis = 0, kind = 'linear', fill_value = None):
+    """
+    Interpolate an ndarray along one axis only, e.g, a RIXS plane along the emission energy axis
+    All the rows/columns share the same interpolation positions, so they are all interpolated 
+    in one vectorized operation instead of building a 2d interpolator
+
+    Parameters
+    ----------
+    old_axis : 1d ndarray, the energy axis of the data along `axis`, strictly monotonic
+    data : ndarray, e.g, the intensity array of shape (emission energy, incident energy)
+    new_axis : 1d ndarray or a number, the new energy axis
+    axis : the axis of data to interpolate, default: 0 (the emission energy/energy transfer axis)
+    kind : 'linear'(default) or 'cubic'
+    fill_value : value for the points outside of old_axis
+                 default None -----> use the value at the nearest edge (as interp2d did)
+
+    Returns
+    -------
+    out : ndarray, same shape as data except len(new_axis) points along `axis`
+    """
+    old_axis = np.asarray(old_axis, dtype = float)
+    new_axis = np.atleast_1d(np.asarray(new_axis, dtype = float))
+    data = np.asarray(data)
+    if not np.issubdtype(data.dtype, np.floating):
+        data = data.astype(float)
+    data = np.moveaxis(data, axis, 0)
+    # Work on an increasing axis
+    if old_axis[0] > old_axis[-1]:
+        old_axis = old_axis[::-1]
+        data = data[::-1]
+    outside = (new_axis < old_axis[0]) | (new_axis > old_axis[-1])
+    # Points outside of the axis take the edge value, they are filled afterwards if asked
+    new_axis_clip = np.clip(new_axis, old_axis[0], old_axis[-1])
+
+    if kind == 'linear':
+        # Left neighbour of every new point, found once for all the rows/columns
+        index = np.clip(np.searchsorted(old_axis, new_axis_clip, side = 'right') - 1, 0, len(old_axis) - 2)
+        step = old_axis[index + 1] - old_axis[index]
+        weight = (new_axis_clip - old_axis[index]) / np.where(step == 0, 1, step)
+        weight = weight.reshape((-1,) + (1,) * (data.ndim - 1))
+        new_data = data[index] * (1 - weight) + data[index + 1] * weight
+    elif kind == 'cubic':
+        from scipy.interpolate import CubicSpline
+        new_data = CubicSpline(old_axis, data, axis = 0)(new_axis_clip)
+    else:
+        raise ValueError("kind should be 'linear' or 'cubic'")
+
+    if fill_value is not None:
+        new_data[outside] = fill_value
+    return np.moveaxis(new_data, 0, axis)
+
+def energy_grid(energy_min, energy_max, interp_npt_1eV = 20, measured = None):
+    """
+    Interpolation grid of an energy axis
+
+    Parameters
+    ----------
+    energy_min, energy_max : the energy range (KeV)
+    interp_npt_1eV : the number of points for 1 eV -----> uniform grid (as before)
+                     (min_npt_1eV, max_npt_1eV) -----> adaptive grid, see adaptive_grid()
+    measured : list of the measured energy axes (KeV), only used by the adaptive grid
+
+    Returns
+    -------
+    out : 1d ndarray (KeV)
+    """
+    if np.ndim(interp_npt_1eV) == 0:
+        return np.linspace(energy_min, energy_max, int(round((energy_max - energy_min)*1000)*interp_npt_1eV))
+    return adaptive_grid(measured if measured is not None else [], energy_min, energy_max, *interp_npt_1eV)
+
+def adaptive_grid(measured, energy_min, energy_max, min_npt_1eV = 2, max_npt_1eV = 20, oversampling = 2, 
+                  segment_eV = 1):
+    """
+    Piecewise uniform interpolation grid following the measured sampling density
+    The range is cut into segments of segment_eV, the density of each segment is oversampling points 
+    per measured step (median step of the scans in the segment), rounded and kept between min_npt_1eV 
+    and max_npt_1eV points for 1 eV. Neighbouring segments with the same density make one uniform piece.
+    e.g, scans with 0.2 eV steps before the edge, 0.05 eV on the edge and 0.5 eV after it, (2, 20) 
+         -----> 10, 20 and 4 points for 1 eV instead of 20 points for 1 eV everywhere
+
+    Parameters
+    ----------
+    measured : list of 1d ndarray, the measured energy axes (KeV), e.g, the arr_hdh_ene of each scan
+               or the emission energies of a RIXS plane
+    energy_min, energy_max : the energy range (KeV)
+    min_npt_1eV, max_npt_1eV : the lowest and highest number of points for 1 eV
+    oversampling : the number of grid points per measured step
+    segment_eV : the width of the segments (eV)
+
+    Returns
+    -------
+    out : 1d ndarray, increasing energies (KeV) from energy_min to energy_max
+    """
+    span_eV = (energy_max - energy_min)*1000
+    segment_number = max(1, int(np.ceil(span_eV/segment_eV - 1e-9)))
+    edges = energy_min + np.arange(segment_number + 1)*segment_eV/1000
+    edges[-1] = energy_max
+
+    # Measured steps (eV) and their middle energies, for the steps overlapping the range
+    steps, middles = [np.zeros(0)], [np.zeros(0)]
+    for axis_values in measured:
+        axis_values = np.sort(np.asarray(axis_values, dtype = float).ravel())
+        axis_values = axis_values[np.isfinite(axis_values)]
+        keep = ((axis_values[1:] > axis_values[:-1]) & 
+                (axis_values[1:] > energy_min) & (axis_values[:-1] < energy_max))
+        steps.append((axis_values[1:] - axis_values[:-1])[keep]*1000)
+        middles.append(((axis_values[1:] + axis_values[:-1])/2)[keep])
+    steps = np.concatenate(steps)
+    middles = np.concatenate(middles)
+
+    # Median measured step of each segment
+    density = np.full(segment_number, float(max_npt_1eV))
+    if steps.size:
+        segment = np.clip(np.searchsorted(edges, middles, 'right') - 1, 0, segment_number - 1)
+        sorted_steps = steps[np.lexsort((steps, segment))]
+        counts = np.bincount(segment, minlength = segment_number)
+        starts = np.cumsum(counts) - counts
+        filled = counts > 0
+        median_step = (sorted_steps[starts[filled] + (counts[filled] - 1)//2] + 
+                       sorted_steps[starts[filled] + counts[filled]//2])/2
+        # The segments without a measured step take the density of their neighbours
+        centers = (edges[1:] + edges[:-1])/2
+        density = np.interp(centers, centers[filled], oversampling/median_step)
+    density = np.clip(np.round(density), min_npt_1eV, max_npt_1eV)
+
+    # One uniform piece per run of segments with the same density
+    bounds = np.concatenate([[0], np.flatnonzero(np.diff(density)) + 1, [segment_number]])
+    pieces = []
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        npt = max(int(round((edges[stop] - edges[start])*1000*density[start])), 1) + 1
+        piece = np.linspace(edges[start], edges[stop], npt)
+        pieces.append(piece[1:] if pieces else piece)
+    return np.concatenate(pieces)
+
+def point_axis(axis_values, unit = 'KeV', reference_npt_1eV = 20):
+    """
+    Energy axis for the XANES areas of a non-uniform axis (adaptive_grid())
+    A uniform axis, whatever its step, is integrated in points (dx = 1), as before. A non-uniform axis
+    is integrated against its energies in units of a fixed reference step of 1/reference_npt_1eV eV 
+    (0.05 eV, the step of the default interp_npt_1eV = 20 grid, see reference_steps())
+
+    Parameters
+    ----------
+    axis_values : 1d energy axis
+    unit : 'KeV' (default) or 'eV', the unit of axis_values
+    reference_npt_1eV : default 20, the reference step is 1/reference_npt_1eV eV
+
+    Returns
+    -------
+    out : None for a uniform axis, otherwise 1d ndarray, increasing (see reference_steps())
+    """
+    if uniform_axis(axis_values):
+        return None
+    return reference_steps(axis_values, unit, reference_npt_1eV)
+
+def reference_steps(axis_values, unit = 'KeV', reference_npt_1eV = 20):
+    """
+    Distance of each energy of a monotonic axis to the first one, in reference steps of 1/reference_npt_1eV eV
+    The distances increase along a decreasing axis too, so the areas and the weights stay positive
+
+    Returns
+    -------
+    out : 1d ndarray
+    """
+    axis_values = np.asarray(axis_values, dtype = float)
+    scale = 1000. if unit == 'KeV' else 1.
+    return np.abs(axis_values - axis_values[:1])*scale*reference_npt_1eV
+
+def uniform_axis(axis_values):
+    """
+    True if the axis is evenly spaced (within 1e-6 of its mean step)
+    """
+    axis_values = np.asarray(axis_values, dtype = float)
+    if axis_values.size < 3:
+        return True
+    mean_step = (axis_values[-1] - axis_values[0])/(axis_values.size - 1)
+    return bool(np.all(np.abs(np.diff(axis_values) - mean_step) <= 1e-6*abs(mean_step)))
+
+def column_tiles(columns, column_bytes, memory_MB, align = 1):
+    """
+    Split the columns of a plane into tiles using about memory_MB of RAM each
+
+    Parameters
+    ----------
+    columns : the number of columns
+    column_bytes : the memory needed for one column, in bytes
+    memory_MB : the RAM budget of a tile
+    align : the tiles are made of whole blocks of align columns (e.g, the HDF5 chunks) when the budget allows
+
+    Returns
+    -------
+    out : list of slices
+    """
+    width = max(1, int(memory_MB*2**20 // max(column_bytes, 1)))
+    if width > align:
+        width -= width % align
+    return [slice(start, min(start + width, columns)) for start in range(0, columns, width)]
+
+def ET_interp_columns(incident_Energy, emission_Energy, EE_intensity, energy_transfer):
+    """
+    Interpolate each incident energy column of an EE plane onto an energy transfer axis,
+    all the columns at once (see interp_stack()), for the axes RIXS_EE_to_ET() can not remap pixel by pixel
+
+    Parameters
+    ----------
+    incident_Energy : 1d ndarray, the incident energies of the columns
+    emission_Energy : 1d ndarray, the emission energies of the rows
+    EE_intensity : 2d ndarray (len(emission_Energy), len(incident_Energy))
+    energy_transfer : 1d ndarray, the energy transfer axis
+
+    Returns
+    -------
+    out : ndarray (len(energy_transfer), len(incident_Energy)), NaN outside of the measured EE plane
+    """
+    emission_npt, incident_npt = EE_intensity.shape
+    # Column i is a scan of intensity vs energy transfer incident_Energy[i] - emission_Energy
+    energy_transfer_stack = (incident_Energy[:, np.newaxis] - emission_Energy[np.newaxis, :]).ravel()
+    offsets = np.arange(incident_npt + 1)*emission_npt
+    return interp_stack(energy_transfer_stack, EE_intensity.T.ravel(), offsets, energy_transfer).T
+
+def same_step_axes(incident_Energy, emission_Energy):
+    """
+    True if both axes are uniform with the same step (within 10 %), 
+    i.e, the EE plane can be remapped to ET pixel by pixel (see RIXS_EE_to_ET())
+    """
+    if not uniform_axis(incident_Energy) or not uniform_axis(emission_Energy):
+        return False
+    if len(incident_Energy) < 2 or len(emission_Energy) < 2:
+        return True
+    incident_step = abs(incident_Energy[-1] - incident_Energy[0])/(len(incident_Energy) - 1)
+    emission_step = abs(emission_Energy[-1] - emission_Energy[0])/(len(emission_Energy) - 1)
+    return abs(incident_step - emission_step) <= 0.1*max(incident_step, emission_step)
+
+def RIXS_EE_to_ET(dataArray):
+    """
+    Remap a RIXS plane from incident energy & emission energy (EE) 
+    to incident energy & energy transfer (ET)
+    Incident energy and emission energy axes with the same step (the uniform grids of RIXS_data and RIXS_merge)
+    are remapped pixel by pixel, other axes (e.g, adaptive grids, see adaptive_grid()) are interpolated 
+    column by column onto the energy transfer axis (see ET_interp_columns())
+
+    Parameters
+    ----------
+    dataArray : the EE RIXSPlane or data ndarray [EE_XX, EE_YY, intensity], 
+                e.g, RIXS_data(choice = 'EE') output or RIXS_merge output
+
+    Returns
+    -------
+    out : RIXSPlane [ET_XX, ET_YY, ET_intensity]
+          ET_XX -----> incident energy
+          ET_YY -----> energy transfer
+          ET_intensity -----> intensity ndarray, NaN outside of the measured EE plane
+    """
+    plane = as_RIXS_plane(dataArray)
+    incident_Energy = plane.incident
+    emission_Energy = plane.emission
+    EE_intensity = plane.intensity
+    emission_npt, incident_npt = EE_intensity.shape
+    # The energy transfer axis comes from both axes
+    adaptive = (plane.adaptive[0], any(plane.adaptive))
+
+    # When it comes to ET, the length of new y axis(energy transfer) change
+    energy_transfer_min = incident_Energy.min() - emission_Energy.max()
+    energy_transfer_max = incident_Energy.max() - emission_Energy.min()
+    energy_transfer_length = emission_npt + incident_npt - 1
+    # Define our energy transfer axis
+    energy_transfer = np.linspace(energy_transfer_min, energy_transfer_max, energy_transfer_length)
+
+    if not same_step_axes(incident_Energy, emission_Energy):
+        ET_intensity = ET_interp_columns(incident_Energy, emission_Energy, EE_intensity, energy_transfer)
+        return RIXSPlane(incident_Energy, energy_transfer, ET_intensity.astype(EE_intensity.dtype, copy = False), 
+                         choice = 'ET', unit = plane.unit, adaptive = adaptive)
+
+    # Define our new intensity array filled with NaN
+    # And the new array has a shape of (emission_npt + incident_npt - 1, incident_npt)
+    ET_intensity = np.full((energy_transfer_length, incident_npt), np.nan, dtype = EE_intensity.dtype)
+
+    # The pixel [j, i] of the EE plane goes to the pixel [i-j+emission_npt-1, i] of the ET plane
+    # Build the row indexes of all the pixels at once and fill the ET plane in one go
+    ET_rows = np.arange(incident_npt) - np.arange(emission_npt)[:, np.newaxis] + emission_npt - 1
+    ET_columns = np.broadcast_to(np.arange(incident_npt), ET_rows.shape)
+    ET_intensity[ET_rows, ET_columns] = EE_intensity
+
+    return RIXSPlane(incident_Energy, energy_transfer, ET_intensity, choice = 'ET', unit = plane.unit, adaptive = adaptive)
+
+def spec_scan_offsets(data, start, end):
+    """
+    Byte offsets of the '#S' lines of data[start:end] (a SPEC file), start is the beginning of a line
+    Only a byte search, the data blocks are not parsed
+
+    Returns
+    -------
+    out : list of int
+    """
+    offsets = []
+    position = start if data[start:start + 3] == b'#S ' else data.find(b'\n#S ', start, end)
+    while 0 <= position < end:
+        if data[position:position + 1] == b'\n':
+            position += 1
+        offsets.append(position)
+        position = data.find(b'\n#S ', position, end)
+    return offsets
+
+def spec_scan_entry(data, offset, scan_end):
+    """
+    Entry of the scan of data[offset:scan_end] (a SPEC file): the '#S' and '#L' lines, the number of points
+    (newlines counted, the values are not parsed) and the first two and the last data lines
+
+    Returns
+    -------
+    out : dict(offset, data_start, end, header, labels, points, clean, first_rows, last_row), see SpecIndex
+    """
+    header_end = data.find(b'\n', offset, scan_end)
+    header_end = scan_end if header_end < 0 else header_end
+    header = data[offset:header_end].decode('ascii', 'replace').rstrip('\r')
+    # Column labels, separated by two spaces at least
+    labels_start = data.find(b'\n#L ', offset, scan_end)
+    if labels_start < 0:
+        labels = []
+        data_start = scan_end
+    else:
+        labels_end = data.find(b'\n', labels_start + 1, scan_end)
+        labels_end = scan_end if labels_end < 0 else labels_end
+        labels_line = data[labels_start + 4:labels_end].decode('ascii', 'replace').strip()
+        labels = re.split(r'\s{2,}', labels_line) if labels_line else []
+        data_start = min(labels_end + 1, scan_end)
+    block = data[data_start:scan_end]
+    # Only data lines (no comment or MCA lines) -----> fast parsing
+    clean = not (block.startswith(b'#') or block.startswith(b'@') or b'\n#' in block or b'\n@' in block)
+    if clean:
+        # One point per non empty line
+        newline = np.frombuffer(block.strip(), dtype = np.uint8) == 10
+        points = int(newline.sum() + 1 - (newline[1:] & newline[:-1]).sum()) if block.strip() else 0
+    else:
+        points = len(re.findall(rb'(?m)^[ \t]*[-+.0-9nNiI]', block))
+    first_rows, last_row = spec_edge_rows(block, len(labels))
+    return {'offset': offset, 'data_start': data_start, 'end': scan_end, 'header': header,
+            'labels': labels, 'points': points, 'clean': clean, 
+            'first_rows': first_rows, 'last_row': last_row}
+
+def spec_edge_rows(block, columns):
+    """
+    Return the first two and the last complete data lines of a scan block, ([row0, row1], last row)
+    """
+    def data_row(line):
+        line = line.strip()
+        if not line or line.startswith((b'#', b'@')):
+            return None
+        try:
+            row = [float(value) for value in line.split()]
+        except ValueError:
+            return None
+        # An incomplete line (the scan is being written) is skipped
+        return row if len(row) == columns else None
+
+    first_rows = []
+    position = 0
+    while len(first_rows) < 2 and position < len(block):
+        line_end = block.find(b'\n', position)
+        line_end = len(block) if line_end < 0 else line_end
+        row = data_row(block[position:line_end])
+        if row is not None:
+            first_rows.append(row)
+        position = line_end + 1
+    last_row = None
+    line_end = len(block)
+    while last_row is None and line_end > 0 and first_rows:
+        line_start = block.rfind(b'\n', 0, line_end - 1) + 1
+        last_row = data_row(block[line_start:line_end])
+        line_end = line_start
+    return first_rows, last_row
+
+def read_only(array):
+    """
+    Return a read only view of an array (the array itself stays writable)
+    """
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+def temporary_memmap(shape, dtype, prefix = 'tmp'):
+    """
+    Memory-mapped .npy array in a new file of the temporary directory (tempfile.gettempdir())
+    The file is removed when the array and all its views are released, or at the exit of Python
+
+    Returns
+    -------
+    out : numpy memmap, zero filled
+    """
+    file_handle, path = tempfile.mkstemp(suffix = '.npy', prefix = prefix)
+    os.close(file_handle)
+    try:
+        array = np.lib.format.open_memmap(path, mode = 'w+', dtype = dtype, shape = shape)
+    except Exception:
+        remove_file(path)
+        raise
+    # The views of the memmap keep its mmap alive, the file goes with the mmap
+    weakref.finalize(array._mmap, remove_file, path)
+    return array
+
+def remove_file(path):
+    """
+    Remove a file, nothing if it is already gone or cannot be removed (still mapped on Windows)
+    """
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def as_RIXS_plane(dataArray, choice = None, unit = None):
+    """
+    Get a RIXSPlane from a RIXSPlane or from a former [XX, YY, intensity] data ndarray (no copy)
+
+    Parameters
+    ----------
+    dataArray : RIXSPlane or data ndarray [XX, YY, intensity]
+    choice : 'EE' or 'ET' for a data ndarray, default None -----> 'EE'
+    unit : 'eV' or 'KeV' for a data ndarray, default None -----> guessed from the incident energy
+
+    Returns
+    -------
+    out : RIXSPlane
+    """
+    if isinstance(dataArray, RIXSPlane):
+        return dataArray
+    incident_Energy = np.asarray(dataArray[0])[0,:]
+    emission_Energy = np.asarray(dataArray[1])[:,0]
+    if unit is None:
+        # Incident energies are a few KeV, i.e, thousands of eV
+        unit = 'eV' if np.nanmax(np.abs(incident_Energy)) > 100 else 'KeV'
+    return RIXSPlane(incident_Energy, emission_Energy, dataArray[2], choice = choice or 'EE', unit = unit)
+
 def normalize_toArea(XANES_data, normalized_starting_energy = None):
     """
     Normalize XANES to area into unity(whole area or specified tail area)
@@ -968,14 +4154,18 @@ def normalize_toArea(XANES_data, normalized_starting_energy = None):
         normalized_starting_energy = XANES_data[0][0] * 1000
     postedge_index = np.where(XANES_data[0] >= normalized_starting_energy/1000)
     postedge_intensity = XANES_data[1][postedge_index[0]]
-    # Calculate the tail edge area
-    tail_edge_area = np.trapz(postedge_intensity, dx=1)
+    # Calculate the tail edge area (in points, see point_axis() for the non-uniform grids)
+    points = point_axis(XANES_data[0])
+    if points is None:
+        tail_edge_area = trapezoid(postedge_intensity, dx=1)
+    else:
+        tail_edge_area = trapezoid(postedge_intensity, x = points[postedge_index[0]])
     # Normalization to the whole area
     norm_intensity = 20*XANES_data[1]/tail_edge_area
     norm_dataArray = np.array([XANES_data[0],norm_intensity])
     return norm_dataArray
  
-def find_peaks(XANES_data, energy_range = None, accuracy = (3,30), plot = True):
+def find_peaks(XANES_data, energy_range = None, accuracy = (3,30), plot = False):
     """
     Find XANES peaks
     Parameters
@@ -985,6 +4175,7 @@ def find_peaks(XANES_data, energy_range = None, accuracy = (3,30), plot = True):
     An energy number, e.g, Incident Energy: 6600 eV, 
                                           -----> will do normalization from 6600 eV to the end of tail feature
                                 Not difine-----> Normalization to the whole area
+    plot: default False -----> no plotting (matplotlib is not imported), True -----> plot the peaks
     Returns
     -------
     out : A data ndarray of the maxima [peak_energy, peak_intensity]
@@ -992,12 +4183,13 @@ def find_peaks(XANES_data, energy_range = None, accuracy = (3,30), plot = True):
     """
     # Define the width of peaks that we want to detect
     peak_detect_width = np.arange(accuracy[0],accuracy[1])
-    # Find peaks for the whole XANES_data range
-    peak_index = signal.find_peaks_cwt(XANES_data[1],np.arange(accuracy[0],accuracy[1]))
+    # Find peaks for the whole XANES_data range (same peaks as scipy find_peaks_cwt, see cwt_peak_indexes())
+    peak_index = cwt_peak_indexes(XANES_data[1],np.arange(accuracy[0],accuracy[1]))[0]
     peak_dataList = np.array([XANES_data[0][peak_index],XANES_data[1][peak_index]])
     if energy_range == None:
         # plot the figures
         if plot == True:
+            import matplotlib.pyplot as plt
             plt.plot(XANES_data[0]*1000,XANES_data[1])
             plt.scatter(peak_dataList[0]*1000,peak_dataList[1],c='r')
             plt.xlabel('Energy [eV]')
@@ -1013,6 +4205,7 @@ def find_peaks(XANES_data, energy_range = None, accuracy = (3,30), plot = True):
 
         # plot the figures
         if plot == True:
+            import matplotlib.pyplot as plt
             plt.plot(XANES_data[0]*1000,XANES_data[1])
             plt.scatter(peak_dataList[0]*1000,peak_dataList[1],c='r')
             plt.xlim(e1,e2)
@@ -1023,7 +4216,183 @@ def find_peaks(XANES_data, energy_range = None, accuracy = (3,30), plot = True):
         return range_peak_dataList
 
 
-def XANES_area(XANES_data, energy_range):
+def find_peaks_batch(XANES_stack, energy_range = None, accuracy = (3,30), detector = 'cwt', prominence = None):
+    """
+    Find the peaks of many XANES spectra on a common incident energy grid, without plotting
+    Parameters
+    ----------
+    XANES_stack : data ndarray [incident energy, intensity 1, intensity 2, ...]
+                  e.g, np.vstack([XANES_data[0], spectrum1, spectrum2]) or the Radiation_damage_series() output
+                  (NaN intensities are taken as 0)
+    energy_range : default None -----> peaks of the whole energy range, otherwise (e1, e2) in eV
+    accuracy : the widths of the peaks (in points) detected by the wavelet transform, as in find_peaks()
+    detector : 'cwt'(default) -----> continuous wavelet transform, same peaks as find_peaks()
+                                     (scipy find_peaks_cwt), the wavelets are computed once for all the spectra
+               'prominence' -----> local maxima with a minimum prominence (scipy.signal.find_peaks), much faster
+    prominence : the minimum prominence of the 'prominence' detector, in intensity units
+                 default None -----> 5 % of the intensity range of each spectrum
+
+    Returns
+    -------
+    out : (peak_energy, peak_intensity, offsets), ragged table as scan_stack()
+          the peaks of spectrum k are peak_energy[offsets[k]:offsets[k+1]], peak_intensity[offsets[k]:offsets[k+1]]
+    """
+    XANES_stack = np.asarray(XANES_stack, dtype = float)
+    energy = XANES_stack[0]
+    intensity = np.nan_to_num(np.atleast_2d(XANES_stack[1:]))
+    if detector == 'cwt':
+        peak_indexes = cwt_peak_indexes(intensity, np.arange(accuracy[0], accuracy[1]))
+    elif detector == 'prominence':
+        from scipy import signal
+        peak_indexes = []
+        for spectrum in intensity:
+            spectrum_prominence = prominence if prominence is not None else 0.05*np.ptp(spectrum)
+            peak_indexes.append(signal.find_peaks(spectrum, prominence = spectrum_prominence)[0])
+    else:
+        raise ValueError("detector should be 'cwt' or 'prominence'")
+    if energy_range is not None:
+        e1, e2 = energy_range
+        # Pick out the peaks in the energy range
+        peak_indexes = [index[(energy[index]*1000 >= e1) & (energy[index]*1000 <= e2)] for index in peak_indexes]
+    offsets = np.zeros(len(peak_indexes) + 1, dtype = int)
+    offsets[1:] = np.cumsum([len(index) for index in peak_indexes])
+    spectrum_index = np.repeat(np.arange(len(peak_indexes)), np.diff(offsets))
+    peak_index = np.concatenate(peak_indexes).astype(int) if peak_indexes else np.zeros(0, dtype = int)
+    return energy[peak_index], intensity[spectrum_index, peak_index], offsets
+
+@functools.lru_cache(maxsize = 16)
+def cwt_kernels(npts, widths):
+    """
+    Ricker wavelets of scipy find_peaks_cwt for spectra of npts points (reversed, ready for the convolution)
+    Computed once for each (npts, widths) and reused for all the spectra
+
+    Returns
+    -------
+    out : tuple of 1d ndarray, one kernel per width
+    """
+    kernels = []
+    for width in widths:
+        length = int(min(10*width, npts))
+        # Ricker (mexican hat) wavelet
+        vec = np.arange(0, length) - (length - 1.0)/2
+        kernel = (2/(np.sqrt(3*width)*(np.pi**0.25)) * (1 - vec**2/width**2) * np.exp(-vec**2/(2*width**2)))[::-1].copy()
+        kernel.flags.writeable = False
+        kernels.append(kernel)
+    return tuple(kernels)
+
+def cwt_peak_indexes(intensity, widths, min_snr = 1, noise_perc = 10, chunk_MB = 64):
+    """
+    scipy find_peaks_cwt for a 2d stack of spectra (one spectrum per row)
+    The wavelets are computed once (see cwt_kernels()), the short wavelets are convolved with all the
+    spectra of a chunk at once, the relative maxima and the noise windows are vectorized over all the spectra, 
+    only the ridge lines are followed spectrum by spectrum
+
+    Returns
+    -------
+    out : list of the peak indexes of each spectrum
+    """
+    intensity = np.atleast_2d(np.asarray(intensity, dtype = float))
+    spectra, npts = intensity.shape
+    widths = tuple(float(width) for width in np.atleast_1d(widths))
+    from scipy import ndimage
+    kernels = cwt_kernels(npts, widths)
+    # Same defaults as find_peaks_cwt
+    max_distances = np.asarray(widths)/4.0
+    gap_thresh = np.ceil(widths[0])
+    min_length = np.ceil(len(widths)/4)
+    window_size = int(np.ceil(npts/20))
+    hf_window, odd = divmod(window_size, 2)
+    # Longest wavelet convolved with the whole chunk at once
+    block_kernel = 32
+
+    peak_indexes = []
+    # The spectra are done by chunks to bound the memory of the wavelet transforms
+    chunk = max(1, int(chunk_MB*2**20 // (8*npts*(len(widths) + window_size))))
+    for first in range(0, spectra, chunk):
+        block = intensity[first:first + chunk]
+        # Direct convolutions as find_peaks_cwt (an FFT would turn the rounding noise of the flat
+        # regions into ridge lines). A short wavelet is convolved with all the spectra of the chunk
+        # in one call (mode = 'same' of signal.convolve: zero padding, centred kernel shifted by one
+        # for even lengths), a long one spectrum by spectrum with np.convolve, the call behind
+        # signal.convolve, which is faster than convolve1d there
+        cwt = np.empty((block.shape[0], len(widths), npts))
+        for k, kernel in enumerate(kernels):
+            if len(kernel) <= block_kernel:
+                ndimage.convolve1d(block, kernel, axis = 1, output = cwt[:, k], mode = 'constant', 
+                                   origin = -1 if len(kernel) % 2 == 0 else 0)
+            else:
+                for n in range(block.shape[0]):
+                    cwt[n, k] = np.convolve(block[n], kernel, mode = 'same')
+        # Relative maxima along the energy axis (edges clipped, as argrelmax)
+        relmax = np.ones(cwt.shape, dtype = bool)
+        relmax[..., 1:] &= cwt[..., 1:] > cwt[..., :-1]
+        relmax[..., :-1] &= cwt[..., :-1] > cwt[..., 1:]
+        relmax[..., 0] = False
+        relmax[..., -1] = False
+        # Noise: percentile of the smallest width transform in a sliding window
+        row_one = cwt[:, 0]
+        noises = np.empty_like(row_one)
+        if npts >= window_size:
+            windows = np.lib.stride_tricks.sliding_window_view(row_one, window_size, axis = 1)
+            noises[:, hf_window:hf_window + windows.shape[1]] = np.percentile(windows, noise_perc, axis = 2)
+        for ind in list(range(0, hf_window)) + list(range(max(npts - hf_window - odd + 1, hf_window), npts)):
+            window_start = max(ind - hf_window, 0)
+            window_end = min(ind + hf_window + odd, npts)
+            noises[:, ind] = np.percentile(row_one[:, window_start:window_end], noise_perc, axis = 1)
+        for k in range(block.shape[0]):
+            peak_indexes.append(ridge_peaks(cwt[k], relmax[k], noises[k], max_distances, gap_thresh, 
+                                            min_length, min_snr))
+    return peak_indexes
+
+def ridge_peaks(cwt, relmax, noises, max_distances, gap_thresh, min_length, min_snr):
+    """
+    Ridge lines of the wavelet transform of one spectrum and their peaks, as scipy find_peaks_cwt
+    """
+    rows_with_max = np.flatnonzero(relmax.any(axis = 1))
+    if len(rows_with_max) == 0:
+        return np.zeros(0, dtype = int)
+    start_row = rows_with_max[-1]
+    # Each ridge line is [rows, cols, gap number]
+    ridge_lines = [[[start_row], [col], 0] for col in np.flatnonzero(relmax[start_row]).tolist()]
+    final_lines = []
+    for row in range(start_row - 1, -1, -1):
+        for line in ridge_lines:
+            line[2] += 1
+        # The first ridge line ending at each column, the columns sorted for a binary search
+        first_line = {}
+        for ind, line in enumerate(ridge_lines):
+            first_line.setdefault(line[1][-1], ind)
+        prev_ridge_cols = sorted(first_line)
+        for col in np.flatnonzero(relmax[row]).tolist():
+            # Connect the maximum to the closest ridge line (the first one for a tie), or start a new one
+            line = None
+            if prev_ridge_cols:
+                position = bisect.bisect_left(prev_ridge_cols, col)
+                candidates = prev_ridge_cols[max(position - 1, 0):position + 1]
+                distance = min(abs(col - prev_col) for prev_col in candidates)
+                if distance <= max_distances[row]:
+                    line = ridge_lines[min(first_line[prev_col] for prev_col in candidates 
+                                           if abs(col - prev_col) == distance)]
+            if line is not None:
+                line[0].append(row)
+                line[1].append(col)
+                line[2] = 0
+            else:
+                ridge_lines.append([[row], [col], 0])
+        for ind in range(len(ridge_lines) - 1, -1, -1):
+            if ridge_lines[ind][2] > gap_thresh:
+                final_lines.append(ridge_lines.pop(ind))
+    peaks = []
+    for rows, cols, gap in final_lines + ridge_lines:
+        # The rows of a line decrease, the peak is at the smallest width
+        if len(rows) < min_length:
+            continue
+        if abs(cwt[rows[-1], cols[-1]] / noises[cols[-1]]) < min_snr:
+            continue
+        peaks.append(cols[-1])
+    return np.sort(np.array(peaks, dtype = int))
+
+def XANES_area(XANES_data, energy_range, verbose = True):
     """
     Calculate XANES area
     Parameters
@@ -1032,15 +4401,22 @@ def XANES_area(XANES_data, energy_range):
     energy_range: (e1, e2)
               e1: The starting energy for calculating the area, in eV
               e2: The ending energy for calculating the area, in eV
+    verbose: default True, print the area (False -----> silent, e.g, for many areas see XANESAreaIndex)
     Returns
     -------
-    out : XANES_area, dtype = float
+    out : XANES_area, dtype = float, in points (dx = 1), in 0.05 eV steps on a non-uniform grid 
+          (see point_axis())
 
     """
     # Calculate pre-edge area
     edge_area_index = np.where((XANES_data[0] >= energy_range[0]/1000) & (XANES_data[0] <= energy_range[1]/1000))
     edge_area_intensity = XANES_data[1][edge_area_index[0]]
-    # Calculate the tail edge area
-    edge_area = np.trapz(edge_area_intensity, dx=1)
-    print('The edge area from %d eV to %d eV is :'%(energy_range[0], energy_range[1]) + str(edge_area) )
+    # Calculate the tail edge area (in points, see point_axis() for the non-uniform grids)
+    points = point_axis(XANES_data[0])
+    if points is None:
+        edge_area = trapezoid(edge_area_intensity, dx=1)
+    else:
+        edge_area = trapezoid(edge_area_intensity, x = points[edge_area_index[0]])
+    if verbose:
+        print('The edge area from %d eV to %d eV is :'%(energy_range[0], energy_range[1]) + str(edge_area) )
     return edge_area
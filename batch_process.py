@@ -0,0 +1,227 @@
+# coding: utf-8
+"""
+Batch processing of SPEC files with DataAnalysis
+
+The jobs are read from a JSON manifest, run over a process pool and every result is written
+into the output folder as <job name>.npz (arrays + job parameters). A job whose result is
+already there, computed with the same parameters from the same SPEC file, is not run again,
+so a batch interrupted by a crash is resumed by running the same command.
+
+Manifest
+--------
+{
+ "output": "results",                       (optional, output folder, relative to the manifest)
+ "defaults": {"file": "Compound_7"},        (optional, default parameters of all the jobs)
+ "jobs": [
+   {"name": "cmpd7_xanes", "method": "XANES_data", "firstScan": 2, "lastScan": 61, "skipScan": [5, 8]},
+   {"name": "cmpd7_rixs_ET", "method": "RIXS_data", "firstScan": 70, "lastScan": 145,
+    "concCorrecScan": 146, "choice": "ET", "interp_npt_1eV": 20},
+   {"file": "Compound_8", "method": "Radiation_damage", "firstScan": 0, "lastScan": 30, "scanStep": 3,
+    "channel": "IF2"}
+ ]
+}
+
+method : 'XANES_data', 'Radiation_damage', 'RIXS_data' or 'RIXS_data_constantET'
+the other keys are the parameters of the method (file and name excepted), the SPEC file paths are
+relative to the manifest, name defaults to <file>_<method>_<firstScan>_<lastScan>
+
+Usage: python batch_process.py manifest.json [--output results] [--workers 4] [--force]
+"""
+
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import DataAnalysis
+
+METHODS = ('XANES_data', 'Radiation_damage', 'RIXS_data', 'RIXS_data_constantET')
+
+# DataAnalysis objects of a worker process, the jobs of the same SPEC file share the column cache
+worker_data = {}
+
+
+def load_manifest(manifest_path, output = None):
+    """
+    Read the manifest
+
+    Returns
+    -------
+    out : (output folder, list of job dicts), each job has 'name', 'file' (absolute path), 'method'
+          and the parameters of the method
+    """
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    folder = os.path.dirname(os.path.abspath(manifest_path))
+    if output is None:
+        output = os.path.join(folder, manifest.get('output', 'results'))
+    jobs = []
+    names = set()
+    for entry in manifest['jobs']:
+        job = dict(manifest.get('defaults', {}))
+        job.update(entry)
+        if 'file' not in job or 'method' not in job:
+            raise ValueError('every job needs a file and a method: %s' % entry)
+        if job['method'] not in METHODS:
+            raise ValueError('unknown method %s, should be one of %s' % (job['method'], ', '.join(METHODS)))
+        job['file'] = os.path.join(folder, job['file'])
+        if 'name' not in job:
+            job['name'] = '%s_%s_%s_%s' % (os.path.basename(job['file']), job['method'],
+                                           job.get('firstScan'), job.get('lastScan'))
+        if job['name'] in names:
+            raise ValueError('two jobs are named %s' % job['name'])
+        names.add(job['name'])
+        # Unknown parameters are reported before anything is run
+        accepted = inspect.signature(getattr(DataAnalysis.DataAnalysis, job['method'])).parameters
+        unknown = [key for key in job_params(job) if key not in accepted]
+        if unknown:
+            raise ValueError('%s: unknown parameters of %s: %s' % (job['name'], job['method'], ', '.join(unknown)))
+        jobs.append(job)
+    return output, jobs
+
+
+def job_params(job):
+    return {key: value for key, value in job.items() if key not in ('name', 'file', 'method')}
+
+
+def job_key(job):
+    """
+    Identify the job: method, parameters and the SPEC file (path, size, modification time)
+    """
+    stat = os.stat(job['file'])
+    identity = {'file': os.path.abspath(job['file']), 'size': stat.st_size, 'mtime': stat.st_mtime_ns,
+                'method': job['method'], 'params': job_params(job)}
+    return hashlib.sha1(json.dumps(identity, sort_keys = True).encode()).hexdigest()
+
+
+def result_path(output, job):
+    return os.path.join(output, job['name'] + '.npz')
+
+
+def is_done(output, job):
+    """
+    True if the result of the job is in the output folder, computed with the same parameters and file
+    """
+    path = result_path(output, job)
+    if not os.path.exists(path):
+        return False
+    try:
+        with np.load(path) as stored:
+            return json.loads(str(stored['meta']))['key'] == job_key(job)
+    except Exception:
+        # An unreadable result is computed again
+        return False
+
+
+def save_result(output, job, key, result, timing):
+    """
+    Write the result into <output>/<job name>.npz, through a temporary file so that a crash
+    never leaves a truncated result behind
+    """
+    meta = {'key': key, 'name': job['name'], 'file': job['file'], 'method': job['method'],
+            'params': job_params(job), 'timing': timing}
+    if isinstance(result, DataAnalysis.RIXSPlane):
+        arrays = {'incident': result.incident, 'emission': result.emission, 'intensity': result.intensity}
+        meta.update(choice = result.choice, unit = result.unit)
+    else:
+        arrays = {'data': np.asarray(result)}
+    path = result_path(output, job)
+    temporary = path + '.%d.tmp' % os.getpid()
+    with open(temporary, 'wb') as f:
+        np.savez(f, meta = json.dumps(meta), **arrays)
+    os.replace(temporary, path)
+    return path
+
+
+def run_job(job, output):
+    """
+    Run one job in a worker process
+
+    Returns
+    -------
+    out : dict(name, status ('done' or 'failed'), elapsed, stages, error)
+    """
+    start = time.perf_counter()
+    try:
+        key = job_key(job)
+        data = worker_data.get(job['file'])
+        if data is None:
+            data = worker_data[job['file']] = DataAnalysis.DataAnalysis(job['file'])
+        timer = data.enable_timing()
+        result = getattr(data, job['method'])(**job_params(job))
+        data.disable_timing()
+        if result is None:
+            raise ValueError('%s returned None, check the parameters' % job['method'])
+        stages = {name: stage['total_s'] for name, stage in timer.report().items()}
+        save_result(output, job, key, result, stages)
+        return {'name': job['name'], 'status': 'done', 'elapsed': time.perf_counter() - start, 'stages': stages}
+    except Exception:
+        return {'name': job['name'], 'status': 'failed', 'elapsed': time.perf_counter() - start,
+                'error': traceback.format_exc()}
+
+
+def run_batch(jobs, output, workers = None, force = False, log = print):
+    """
+    Run the jobs which are not done yet over a process pool
+
+    Returns
+    -------
+    out : list of the job reports dict(name, status, elapsed, ...), status 'skipped' for the jobs already done
+    """
+    if not os.path.exists(output):
+        os.makedirs(output)
+    reports = []
+    todo = []
+    for job in jobs:
+        if not force and is_done(output, job):
+            reports.append({'name': job['name'], 'status': 'skipped', 'elapsed': 0.})
+            log('%-40s skipped (already done)' % job['name'])
+        else:
+            todo.append(job)
+    if todo:
+        with ProcessPoolExecutor(workers) as executor:
+            futures = [executor.submit(run_job, job, output) for job in todo]
+            for future in as_completed(futures):
+                report = future.result()
+                reports.append(report)
+                log('%-40s %-8s %8.2f s' % (report['name'], report['status'], report['elapsed']))
+                if report['status'] == 'failed':
+                    log(report['error'])
+    # The batch report is kept next to the results
+    order = {job['name']: k for k, job in enumerate(jobs)}
+    reports.sort(key = lambda report: order[report['name']])
+    with open(os.path.join(output, 'batch_report.json'), 'w') as f:
+        json.dump({'finished': time.strftime('%Y-%m-%d %H:%M:%S'), 'jobs': reports}, f, indent = 1)
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__.split('\n')[1])
+    parser.add_argument('manifest', help = 'JSON manifest of the jobs')
+    parser.add_argument('--output', help = 'output folder, default: the "output" of the manifest')
+    parser.add_argument('--workers', type = int, default = None, help = 'number of processes, default: number of CPUs')
+    parser.add_argument('--force', action = 'store_true', help = 'run again the jobs already done')
+    args = parser.parse_args()
+
+    output, jobs = load_manifest(args.manifest, args.output)
+    start = time.perf_counter()
+    reports = run_batch(jobs, output, args.workers, args.force)
+    failed = [report['name'] for report in reports if report['status'] == 'failed']
+    done = sum(report['status'] == 'done' for report in reports)
+    skipped = sum(report['status'] == 'skipped' for report in reports)
+    print('%d done, %d skipped, %d failed in %.2f s, results in %s' % (done, skipped, len(failed),
+                                                                        time.perf_counter() - start, output))
+    if failed:
+        print('failed: ' + ', '.join(failed))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+# coding: utf-8
+"""
+Benchmark: emission energy interpolation of a RIXS plane
+
+Compares resample_axis() (linear and cubic) with the former interp2d path.
+interp2d was removed from SciPy 1.14, on such versions RegularGridInterpolator,
+the replacement recommended by SciPy, is timed instead.
+
+Usage: python benchmarks/bench_emission_resample.py [--npt_1eV 20] [--repeat 5]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+import scipy.interpolate as interp
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import DataAnalysis
+
+
+def make_plane(npt_1eV, incident_span = 10, emission_span = 15, emission_scans = 76):
+    # Same layout as in RIXS_data: one row per emission energy scan,
+    # the incident energy axis already interpolated
+    incident_Energy = np.linspace(6.535, 6.535 + incident_span/1000, incident_span*npt_1eV)
+    emission_Energy = np.linspace(5.890, 5.890 + emission_span/1000, emission_scans)
+    intensity = np.random.default_rng(0).random((emission_scans, incident_Energy.size))
+    emission_Energy_interp = np.linspace(emission_Energy[0], emission_Energy[-1], emission_span*npt_1eV)
+    return incident_Energy, emission_Energy, intensity, emission_Energy_interp
+
+
+def legacy(incident_Energy, emission_Energy, intensity, emission_Energy_interp):
+    if hasattr(interp, 'interp2d'):
+        try:
+            f_interp2d = interp.interp2d(incident_Energy, emission_Energy, intensity)
+            return f_interp2d(incident_Energy, emission_Energy_interp)
+        except NotImplementedError:
+            pass
+    f_interp = interp.RegularGridInterpolator((emission_Energy, incident_Energy), intensity)
+    points = np.stack(np.meshgrid(emission_Energy_interp, incident_Energy, indexing = 'ij'), axis = -1)
+    return f_interp(points)
+
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__.split('\n')[1])
+    parser.add_argument('--npt_1eV', type = int, nargs = '+', default = [10, 20, 50, 100])
+    parser.add_argument('--repeat', type = int, default = 5)
+    args = parser.parse_args()
+
+    print('%8s %12s %12s %12s %10s' % ('npt_1eV', 'legacy [s]', 'linear [s]', 'cubic [s]', 'speedup'))
+    for npt_1eV in args.npt_1eV:
+        incident_Energy, emission_Energy, intensity, emission_Energy_interp = make_plane(npt_1eV)
+        t_legacy = min(timeit.repeat(lambda: legacy(incident_Energy, emission_Energy, intensity, emission_Energy_interp),
+                                     number = 1, repeat = args.repeat))
+        t_linear = min(timeit.repeat(lambda: DataAnalysis.resample_axis(emission_Energy, intensity, emission_Energy_interp),
+                                     number = 1, repeat = args.repeat))
+        t_cubic = min(timeit.repeat(lambda: DataAnalysis.resample_axis(emission_Energy, intensity, emission_Energy_interp,
+                                                                       kind = 'cubic'),
+                                    number = 1, repeat = args.repeat))
+        print('%8d %12.5f %12.5f %12.5f %9.1fx' % (npt_1eV, t_legacy, t_linear, t_cubic, t_legacy/t_linear))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+# coding: utf-8
+"""
+Benchmark: start-up cost of a headless worker
+
+Times `import DataAnalysis` in fresh interpreters, next to the modules the
+former eager imports pulled in (matplotlib.pyplot, matplotlib.cm, scipy.signal,
+scipy.ndimage and silx), and lists the heavy modules loaded by the import.
+
+Usage: python benchmarks/bench_import.py [--repeat 5]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+EAGER_IMPORTS = ('import numpy; import matplotlib.pyplot; from matplotlib import cm; '
+                 'from silx.io.specfile import SpecFile; import scipy.ndimage; from scipy import signal')
+
+HEAVY_MODULES = ['matplotlib', 'matplotlib.pyplot', 'scipy', 'scipy.signal', 'scipy.ndimage', 'silx']
+
+
+def import_time(statement):
+    # Wall time of the statement in a fresh interpreter, the interpreter start-up itself is not counted
+    code = ('import time; start = time.perf_counter(); %s; '
+            'print(time.perf_counter() - start)' % statement)
+    output = subprocess.check_output([sys.executable, '-c', code], cwd = ROOT, env = dict(os.environ, MPLBACKEND = 'Agg'))
+    return float(output.decode().split()[-1])
+
+
+def loaded_modules(statement):
+    code = '%s; import sys; print(" ".join(m for m in %r if m in sys.modules))' % (statement, HEAVY_MODULES)
+    output = subprocess.check_output([sys.executable, '-c', code], cwd = ROOT, env = dict(os.environ, MPLBACKEND = 'Agg'))
+    return output.decode().split()
+
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__.split('\n')[1])
+    parser.add_argument('--repeat', type = int, default = 5)
+    args = parser.parse_args()
+
+    print('%-28s %10s' % ('import', 'time [s]'))
+    for name, statement in (('numpy', 'import numpy'),
+                            ('former eager imports', EAGER_IMPORTS),
+                            ('DataAnalysis', 'import DataAnalysis')):
+        elapsed = min(import_time(statement) for repeat in range(args.repeat))
+        print('%-28s %10.3f' % (name, elapsed))
+    print('')
+    print('heavy modules loaded by import DataAnalysis: %s' % (', '.join(loaded_modules('import DataAnalysis')) or 'none'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# coding: utf-8
+"""
+Benchmark: speedup of the parallel scan loading versus the number of workers
+
+Times RIXS_data and XANES_data on a synthetic SPEC file, starting every run with a cold column cache.
+
+Usage: python benchmarks/bench_parallel_load.py [--rixs 150] [--npt 400] [--workers 1 2 4 8]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import DataAnalysis
+import synthetic_spec
+
+
+def run(path, method, scans, executor, workers):
+    data = DataAnalysis.DataAnalysis(path)
+    if executor is not None:
+        executor = executor(workers)
+    start = time.perf_counter()
+    try:
+        if method == 'RIXS_data':
+            data.RIXS_data(scans[0], scans[1], scans[2], executor = executor)
+        else:
+            data.XANES_data(scans[0], scans[1], executor = executor)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__.split('\n')[1])
+    parser.add_argument('--rixs', type = int, default = 150, help = 'number of RIXS scans')
+    parser.add_argument('--xanes', type = int, default = 150, help = 'number of XANES scans')
+    parser.add_argument('--npt', type = int, default = 400, help = 'points per scan')
+    parser.add_argument('--workers', type = int, nargs = '+', default = [1, 2, 4, 8])
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    path = os.path.join(folder, 'bench.spec')
+    scans = synthetic_spec.write_spec(path, xanes = args.xanes, rixs = args.rixs, npt = args.npt)
+
+    pools = [('thread', DataAnalysis.ThreadPoolExecutor), ('process', DataAnalysis.ProcessPoolExecutor)]
+    for method, method_scans in (('XANES_data', scans['xanes']), ('RIXS_data', scans['rixs'])):
+        serial = min(run(path, method, method_scans, None, None) for repeat in range(3))
+        print('%s, serial: %.3f s' % (method, serial))
+        print('%10s %8s %10s %8s' % ('executor', 'workers', 'time [s]', 'speedup'))
+        for name, pool in pools:
+            for workers in args.workers:
+                elapsed = min(run(path, method, method_scans, pool, workers) for repeat in range(3))
+                print('%10s %8d %10.3f %7.2fx' % (name, workers, elapsed, serial / elapsed))
+        print('')
+    os.remove(path)
+    os.rmdir(folder)
+
+
+if __name__ == '__main__':
+    main()
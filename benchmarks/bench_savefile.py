@@ -0,0 +1,72 @@
+# coding: utf-8
+"""
+Benchmark: write and read throughput of saveFile/loadFile for each file format
+
+A dense RIXS plane and a XANES spectrum are saved as .dat (former np.savetxt writer and
+the block text writer), .npy, .npz and .h5, then read back with loadFile().
+
+Usage: python benchmarks/bench_savefile.py [--npt_1eV 20 50 100] [--repeat 3]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import DataAnalysis
+
+
+def make_plane(npt_1eV, incident_span = 10, emission_span = 15):
+    incident_Energy = np.linspace(6535, 6535 + incident_span, incident_span*npt_1eV)
+    emission_Energy = np.linspace(5890, 5890 + emission_span, emission_span*npt_1eV)
+    intensity = np.random.default_rng(0).random((emission_Energy.size, incident_Energy.size))
+    return DataAnalysis.RIXSPlane(incident_Energy, emission_Energy, intensity, choice = 'EE', unit = 'eV')
+
+
+def savetxt(plane, folder):
+    # The former saveFile writer
+    path = os.path.join(folder, 'legacy.dat')
+    np.savetxt(path, plane.intensity, fmt = '%.12f', header = 'RIXS')
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__.split('\n')[1])
+    parser.add_argument('--npt_1eV', type = int, nargs = '+', default = [20, 50, 100])
+    parser.add_argument('--repeat', type = int, default = 3)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    try:
+        for npt_1eV in args.npt_1eV:
+            plane = make_plane(npt_1eV)
+            MB = plane.intensity.nbytes/2**20
+            print('RIXS plane %s, %.1f MB in memory' % (plane.shape, MB))
+            print('%16s %10s %10s %12s %12s %10s' % ('format', 'write [s]', 'read [s]', 'write [MB/s]',
+                                                    'read [MB/s]', 'file [MB]'))
+            cases = [('dat (savetxt)', lambda: savetxt(plane, folder),
+                      lambda path: np.loadtxt(path))]
+            for fileFormat in ('dat', 'npy', 'npz', 'h5'):
+                cases.append((fileFormat,
+                              lambda fileFormat = fileFormat: DataAnalysis.saveFile(plane, ['RIXS'], folder, 'bench',
+                                                                                    choice = 'RIXS',
+                                                                                    fileFormat = fileFormat),
+                              lambda path: DataAnalysis.loadFile(path, choice = 'RIXS')))
+            for name, write, read in cases:
+                path = write()
+                t_write = min(timeit.repeat(write, number = 1, repeat = args.repeat))
+                t_read = min(timeit.repeat(lambda: read(path), number = 1, repeat = args.repeat))
+                print('%16s %10.4f %10.4f %12.1f %12.1f %10.2f' % (name, t_write, t_read, MB/t_write, MB/t_read,
+                                                                   os.path.getsize(path)/2**20))
+            print('')
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+# coding: utf-8
+"""
+Benchmark: opening and reading a large SPEC file with silx and with the SpecIndex sidecar
+
+A synthetic SPEC file with many scans is opened with silx, indexed from scratch, opened again
+from its .idx file and re-indexed after a few scans are appended. Then the columns of the last
+scans are read with silx and through the memory-mapped index.
+
+Usage: python benchmarks/bench_spec_index.py [--scans 2000] [--npt 500] [--repeat 3]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import DataAnalysis
+import synthetic_spec
+
+LABELS = ('arr_hdh_ene', 'det_dtc', 'I02')
+
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__.split('\n')[1])
+    parser.add_argument('--scans', type = int, default = 2000)
+    parser.add_argument('--npt', type = int, default = 500)
+    parser.add_argument('--repeat', type = int, default = 3)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    try:
+        path = os.path.join(folder, 'large.spec')
+        synthetic_spec.write_spec(path, xanes = args.scans, rixs = 0, npt = args.npt)
+        print('SPEC file: %d scans, %.1f MB' % (args.scans, os.path.getsize(path)/2**20))
+
+        def build():
+            if os.path.exists(path + '.idx'):
+                os.remove(path + '.idx')
+            return DataAnalysis.SpecIndex(path)
+
+        t_silx = min(timeit.repeat(lambda: len(DataAnalysis.open_spec(path)), number = 1, repeat = args.repeat))
+        t_build = min(timeit.repeat(build, number = 1, repeat = args.repeat))
+        t_load = min(timeit.repeat(lambda: DataAnalysis.SpecIndex(path), number = 1, repeat = args.repeat))
+        index = DataAnalysis.SpecIndex(path)
+        synthetic_spec.append_xanes(path, args.scans + 1, scans = 5, npt = args.npt)
+        t_update = min(timeit.repeat(index.update, number = 1, repeat = 1))
+        print('%28s %10s' % ('', 'time [s]'))
+        print('%28s %10.4f' % ('open with silx', t_silx))
+        print('%28s %10.4f' % ('build the index', t_build))
+        print('%28s %10.4f' % ('open from the .idx file', t_load))
+        print('%28s %10.4f' % ('update after 5 new scans', t_update))
+
+        scans = range(len(index) - 100, len(index))
+        sf = DataAnalysis.open_spec(path)
+        t_read_silx = min(timeit.repeat(lambda: [sf[n].data_column_by_name(label) for n in scans for label in LABELS],
+                                        number = 1, repeat = args.repeat))
+        t_read_index = min(timeit.repeat(lambda: [index.read_columns(n, LABELS) for n in scans],
+                                         number = 1, repeat = args.repeat))
+        for n in scans:
+            assert all(np.array_equal(column, sf[n].data_column_by_name(label))
+                       for column, label in zip(index.read_columns(n, LABELS), LABELS))
+        print('%28s %10.4f' % ('read 100 scans with silx', t_read_silx))
+        print('%28s %10.4f' % ('read 100 scans (index)', t_read_index))
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+# coding: utf-8
+"""
+Benchmark suite: timing and peak memory of the DataAnalysis methods on synthetic SPEC files
+
+For every size, a synthetic SPEC file (benchmarks/synthetic_spec.py) is written with HERFD XANES
+scans, a constant emission energy RIXS map and a constant energy transfer RIXS map, then
+XANES_data, Radiation_damage, RIXS_data (EE and ET), RIXS_data_constantET, RIXS_merge,
+RIXS_cut, RIXS_integration and saveFile are timed (best of --repeat runs, cold column cache)
+and their peak memory is measured with tracemalloc in one more run.
+
+The results are written into a JSON report, which can be compared to a former report:
+
+    python benchmarks/bench_suite.py --output new.json --compare baseline.json
+
+Usage: python benchmarks/bench_suite.py [--sizes small medium] [--repeat 3] [--output report.json]
+                                        [--compare baseline.json] [--threshold 1.25]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import DataAnalysis
+import synthetic_spec
+
+# Number of scans and of points per scan of each size
+SIZES = {
+    'small': {'xanes': 10, 'rixs': 40, 'constantET': 20, 'npt': 115},
+    'medium': {'xanes': 50, 'rixs': 100, 'constantET': 60, 'npt': 400},
+    'large': {'xanes': 150, 'rixs': 200, 'constantET': 120, 'npt': 1000},
+}
+
+
+def benchmarks(path, scans, folder):
+    """
+    The benchmarks of one SPEC file, name -----> (setup, run)
+    setup() is not timed, its output is given to run()
+    """
+    xanes = scans['xanes']
+    rixs = scans['rixs']
+    constantET = scans['constantET']
+
+    def new_data():
+        # Every run starts with a cold column cache
+        return DataAnalysis.DataAnalysis(path)
+
+    def with_planes():
+        data = new_data()
+        return data, data.RIXS_data(*rixs, choice = 'EE'), data.RIXS_data(*rixs, choice = 'ET')
+
+    def with_xanes():
+        data = new_data()
+        return data.XANES_data(*xanes)
+
+    return [
+        ('XANES_data', new_data, lambda data: data.XANES_data(*xanes)),
+        ('Radiation_damage', new_data, lambda data: data.Radiation_damage(xanes[0], xanes[1], 2)),
+        ('RIXS_data EE', new_data, lambda data: data.RIXS_data(*rixs, choice = 'EE')),
+        ('RIXS_data ET', new_data, lambda data: data.RIXS_data(*rixs, choice = 'ET')),
+        ('RIXS_data_constantET', new_data, lambda data: data.RIXS_data_constantET(*constantET)),
+        ('RIXS_merge', with_planes, lambda planes: planes[0].RIXS_merge([planes[1], planes[1], planes[1]],
+                                                                        choice = 'average')),
+        ('RIXS_cut', with_planes, lambda planes: [planes[0].RIXS_cut(planes[2], 'CIE', 6540, plot = False),
+                                                  planes[0].RIXS_cut(planes[2], 'CET', 645, plot = False),
+                                                  planes[0].RIXS_cut(planes[1], 'CEE', 5898, plot = False)]),
+        ('RIXS_integration', with_planes, lambda planes: [planes[0].RIXS_integration(planes[2], 'IE', plot = False),
+                                                          planes[0].RIXS_integration(planes[2], 'ET', plot = False)]),
+        ('saveFile', with_xanes, lambda XANES: DataAnalysis.saveFile(list(XANES), ['Energy', 'Intensity'],
+                                                                     folderPath = folder + os.sep,
+                                                                     fileName = 'bench')),
+    ]
+
+
+def measure(setup, run, repeat):
+    # The progress messages of the methods are not printed
+    with contextlib.redirect_stdout(io.StringIO()):
+        return measure_quiet(setup, run, repeat)
+
+
+def measure_quiet(setup, run, repeat):
+    # Best wall time of repeat runs
+    times = []
+    for k in range(repeat):
+        argument = setup()
+        start = time.perf_counter()
+        run(argument)
+        times.append(time.perf_counter() - start)
+    # Peak memory of one more run, the setup is not counted
+    argument = setup()
+    tracemalloc.start()
+    try:
+        run(argument)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'time_s': min(times), 'mean_time_s': sum(times)/len(times), 'peak_MB': peak/2**20}
+
+
+def run_suite(sizes, repeat):
+    results = []
+    folder = tempfile.mkdtemp()
+    try:
+        for size in sizes:
+            path = os.path.join(folder, size + '.spec')
+            scans = synthetic_spec.write_spec(path, seed = 0, **SIZES[size])
+            print('%s: %s, %.1f MB' % (size, SIZES[size], os.path.getsize(path)/2**20))
+            print('%24s %10s %10s %10s' % ('benchmark', 'time [s]', 'mean [s]', 'peak [MB]'))
+            for name, setup, run in benchmarks(path, scans, folder):
+                result = measure(setup, run, repeat)
+                print('%24s %10.4f %10.4f %10.2f' % (name, result['time_s'], result['mean_time_s'], result['peak_MB']))
+                result.update({'size': size, 'benchmark': name})
+                results.append(result)
+            print('')
+    finally:
+        shutil.rmtree(folder)
+    return results
+
+
+def compare(results, baseline_results, threshold):
+    """
+    Print the ratios new/baseline, return the list of the regressions (time or peak memory ratio > threshold)
+    """
+    baseline = {(result['size'], result['benchmark']): result for result in baseline_results}
+    regressions = []
+    print('%8s %24s %10s %10s' % ('size', 'benchmark', 'time', 'memory'))
+    for result in results:
+        key = (result['size'], result['benchmark'])
+        if key not in baseline:
+            continue
+        time_ratio = result['time_s']/baseline[key]['time_s']
+        memory_ratio = result['peak_MB']/baseline[key]['peak_MB'] if baseline[key]['peak_MB'] else 1.
+        flag = ''
+        if time_ratio > threshold or memory_ratio > threshold:
+            regressions.append(key)
+            flag = '  <----- regression'
+        print('%8s %24s %9.2fx %9.2fx%s' % (key + (time_ratio, memory_ratio, flag)))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__.split('\n')[1])
+    parser.add_argument('--sizes', nargs = '+', default = ['small', 'medium'], choices = sorted(SIZES))
+    parser.add_argument('--repeat', type = int, default = 3)
+    parser.add_argument('--output', default = 'bench_report.json', help = 'JSON report to write')
+    parser.add_argument('--compare', help = 'former JSON report to compare with')
+    parser.add_argument('--threshold', type = float, default = 1.25,
+                        help = 'new/baseline ratio of time or peak memory counted as a regression')
+    args = parser.parse_args()
+
+    results = run_suite(args.sizes, args.repeat)
+    report = {'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+              'python': platform.python_version(),
+              'numpy': np.__version__,
+              'machine': platform.platform(),
+              'repeat': args.repeat,
+              'sizes': {size: SIZES[size] for size in args.sizes},
+              'results': results}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent = 1)
+    print('report written into %s' % args.output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print('')
+        regressions = compare(results, baseline['results'], args.threshold)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
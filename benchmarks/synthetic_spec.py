@@ -0,0 +1,145 @@
+# coding: utf-8
+"""
+Synthetic SPEC files for the benchmarks
+
+The files mimic ID26 measurements (energies in KeV):
+    HERFD XANES scans -----> columns arr_hdh_ene, xes_en, det_dtc, I02, IF2
+    RIXS map at constant emission energy -----> one XANES-like scan per emission energy,
+                                                followed by the concentration correction scan
+    RIXS map at constant energy transfer -----> columns mono.energy, Spec.Energy, det_dtc, I02,
+                                                one scan per incident energy,
+                                                followed by the concentration correction scan
+"""
+
+import numpy as np
+
+XANES_LABELS = ['arr_hdh_ene', 'xes_en', 'det_dtc', 'I02', 'IF2']
+CONSTANT_ET_LABELS = ['mono.energy', 'Spec.Energy', 'det_dtc', 'I02']
+
+
+def spec_header(path):
+    return ['#F %s' % path, '#E 1498000000', '#D Thu Jun 22 10:00:00 2017', '']
+
+
+def scan_block(number, command, labels, data):
+    """
+    Lines of one scan, data has the shape (points, len(labels))
+    """
+    lines = ['#S %d %s' % (number, command),
+             '#D Thu Jun 22 10:00:00 2017',
+             '#N %d' % len(labels),
+             '#L ' + '  '.join(labels)]
+    lines.extend(' '.join('%.8f' % value for value in row) for row in data)
+    lines.append('')
+    return lines
+
+
+def spectrum(incident_Energy, emission_Energy = 5.8975):
+    # A pre-edge peak, a white line and an edge step, the pre-edge follows the energy transfer
+    energy_transfer = incident_Energy - emission_Energy
+    pre_edge = 0.3 * np.exp(-((energy_transfer - 0.6435) / 0.0008)**2)
+    edge = 1 / (1 + np.exp(-(incident_Energy - 6.5405) / 0.0006))
+    white_line = 0.6 * np.exp(-((incident_Energy - 6.5415) / 0.0012)**2)
+    return pre_edge + edge + white_line
+
+
+def xanes_scans(first_number, scans, npt, rng):
+    lines = []
+    for k in range(scans):
+        # Every scan starts and ends at slightly different energies, with slightly different numbers of points
+        incident_Energy = np.linspace(6.5350 + rng.uniform(0, 2e-5), 6.5450 - rng.uniform(0, 2e-5),
+                                      npt + rng.integers(0, 3))
+        I02 = 1e5 * (1 + 0.01 * rng.standard_normal(incident_Energy.size))
+        det_dtc = I02 * 1e-3 * (spectrum(incident_Energy) + 0.01 * rng.standard_normal(incident_Energy.size))
+        data = np.column_stack([incident_Energy, np.full(incident_Energy.size, 5.8975), det_dtc, I02, det_dtc * 1.1])
+        lines += scan_block(first_number + k, 'fscan arr_hdh_ene 6.535 6.545', XANES_LABELS, data)
+    return lines
+
+
+def rixs_scans(first_number, scans, npt, rng):
+    lines = []
+    emission_Energies = np.linspace(5.8900, 5.9050, scans)
+    incident_Energy = np.linspace(6.5350, 6.5450, npt)
+    for k, emission_Energy in enumerate(emission_Energies):
+        I02 = 1e5 * (1 + 0.01 * rng.standard_normal(npt))
+        det_dtc = I02 * 1e-3 * (spectrum(incident_Energy, emission_Energy) + 0.01 * rng.standard_normal(npt))
+        data = np.column_stack([incident_Energy, np.full(npt, emission_Energy), det_dtc, I02, det_dtc])
+        lines += scan_block(first_number + k, 'fscan arr_hdh_ene 6.535 6.545', XANES_LABELS, data)
+    return lines
+
+
+def constantET_scans(first_number, scans, npt, rng):
+    lines = []
+    incident_Energies = np.linspace(6.5350, 6.5450, scans)
+    energy_transfer = np.linspace(0.6380, 0.6500, npt)
+    for k, incident_Energy in enumerate(incident_Energies):
+        emission_Energy = incident_Energy - energy_transfer
+        I02 = 1e5 * (1 + 0.01 * rng.standard_normal(npt))
+        det_dtc = I02 * 1e-3 * (spectrum(np.full(npt, incident_Energy), emission_Energy) +
+                                0.01 * rng.standard_normal(npt))
+        data = np.column_stack([np.full(npt, incident_Energy), emission_Energy, det_dtc, I02])
+        lines += scan_block(first_number + k, 'fscan Spec.Energy', CONSTANT_ET_LABELS, data)
+    return lines
+
+
+def concentration_scan(number, points, labels, rng):
+    # One point per RIXS scan, det_dtc/I02 is the concentration correction factor
+    data = np.ones((points, len(labels)))
+    data[:, labels.index('det_dtc')] = 1 + 0.02 * rng.standard_normal(points)
+    return scan_block(number, 'timescan 1', labels, data)
+
+
+def write_spec(path, xanes = 10, rixs = 76, constantET = 0, npt = 115, seed = 0):
+    """
+    Write a synthetic SPEC file
+
+    Parameters
+    ----------
+    path : the SPEC file to write
+    xanes : number of HERFD XANES scans
+    rixs : number of scans of the constant emission energy RIXS map (0 -----> no map)
+    constantET : number of scans of the constant energy transfer RIXS map (0 -----> no map)
+    npt : number of points per scan
+    seed : seed of the noise
+
+    Returns
+    -------
+    out : dict of the scan indexes (as used by DataAnalysis, first scan is 0)
+          'xanes' -----> (firstScan, lastScan)
+          'rixs' -----> (firstScan, lastScan, concCorrecScan)
+          'constantET' -----> (firstScan, lastScan, concCorrecScan)
+    """
+    rng = np.random.default_rng(seed)
+    lines = spec_header(path)
+    scans = {}
+    number = 1
+    if xanes:
+        lines += xanes_scans(number, xanes, npt, rng)
+        scans['xanes'] = (number - 1, number + xanes - 2)
+        number += xanes
+    if rixs:
+        lines += rixs_scans(number, rixs, npt, rng)
+        lines += concentration_scan(number + rixs, rixs, XANES_LABELS, rng)
+        scans['rixs'] = (number - 1, number + rixs - 2, number + rixs - 1)
+        number += rixs + 1
+    if constantET:
+        lines += constantET_scans(number, constantET, npt, rng)
+        lines += concentration_scan(number + constantET, constantET, CONSTANT_ET_LABELS, rng)
+        scans['constantET'] = (number - 1, number + constantET - 2, number + constantET - 1)
+        number += constantET + 1
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    return scans
+
+
+def append_xanes(path, first_number, scans = 1, npt = 115, seed = None):
+    """
+    Append HERFD XANES scans to a SPEC file, as during a beamtime
+
+    Parameters
+    ----------
+    first_number : the SPEC number of the first appended scan, e.g, 11 for '11.1'
+    """
+    rng = np.random.default_rng(seed if seed is not None else first_number)
+    with open(path, 'a') as f:
+        f.write('\n'.join(xanes_scans(first_number, scans, npt, rng)) + '\n')
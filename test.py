@@ -18,9 +18,9 @@ scan1_ET = compound7.RIXS_data(71, 146, 147, choice = 'ET')
 compound7.RIXS_display(scan1_ET,choice='ET')
 
 # RIXS Cut test
-compound7.RIXS_cut(scan1_ET,'CIE',6540)
-compound7.RIXS_cut(scan1_ET,'CET',645)
-compound7.RIXS_cut(scan1_ET,'CET',650)
-compound7.RIXS_cut(scan1,'CEE',5898)
+compound7.RIXS_cut(scan1_ET,'CIE',6540, plot = True)
+compound7.RIXS_cut(scan1_ET,'CET',645, plot = True)
+compound7.RIXS_cut(scan1_ET,'CET',650, plot = True)
+compound7.RIXS_cut(scan1,'CEE',5898, plot = True)
 # Integration Test
-compound7.RIXS_integration(scan1_ET)
+compound7.RIXS_integration(scan1_ET, plot = True)